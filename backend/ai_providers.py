@@ -0,0 +1,396 @@
+import os
+import re
+import json
+import random
+import asyncio
+import hashlib
+import logging
+from functools import lru_cache
+from dataclasses import dataclass
+from typing import List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Provider Selection: "gemini" (default) or "local" for offline load testing
+AI_PROVIDER = os.getenv("AI_PROVIDER", "gemini").lower()
+
+# Gemini Model Configuration
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash")
+GEMINI_GENERATION_CONFIG = {
+    "temperature": 0.4,
+    "top_p": 0.9,
+    "max_output_tokens": 4096,
+    "response_mime_type": "application/json"
+}
+
+# Local Provider Configuration
+LOCAL_PROVIDER_LATENCY_MS = float(os.getenv("LOCAL_PROVIDER_LATENCY_MS", "800"))
+LOCAL_PROVIDER_JITTER_MS = float(os.getenv("LOCAL_PROVIDER_JITTER_MS", "200"))
+LOCAL_PROVIDER_FAILURE_RATE = float(os.getenv("LOCAL_PROVIDER_FAILURE_RATE", "0"))
+LOCAL_PROVIDER_TRUNCATE_RATE = float(os.getenv("LOCAL_PROVIDER_TRUNCATE_RATE", "0"))
+LOCAL_PROVIDER_RATE_LIMIT_RATE = float(os.getenv("LOCAL_PROVIDER_RATE_LIMIT_RATE", "0"))
+LOCAL_PROVIDER_SEED = os.getenv("LOCAL_PROVIDER_SEED")
+
+
+@dataclass
+class GenerationRequest:
+    prompt: str
+    pitch_text: str
+    target_audience: str
+    # Pydantic model describing the expected JSON, restricted to `fields` when given
+    response_model: Optional[type] = None
+    fields: Optional[List[str]] = None
+    # Top-level fields the response must contain; None requires all of them
+    required: Optional[List[str]] = None
+    max_output_tokens: Optional[int] = None
+    # Groups requests of similar size for latency tracking, e.g. "analysis", "section:slides"
+    kind: str = "analysis"
+
+
+@dataclass
+class GenerationResponse:
+    text: str
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+
+
+class ProviderError(Exception):
+    pass
+
+
+class RateLimitedError(ProviderError):
+    """
+    The provider rejected the call with a 429; retry_after is its hint in seconds, if any.
+    """
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+RETRY_HINT_PATTERNS = (
+    re.compile(r"retry in ([0-9.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*([0-9]+)"),
+)
+
+def parse_retry_after(message: str) -> Optional[float]:
+    for pattern in RETRY_HINT_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class AIProvider:
+    """
+    Interface every model backend implements. `version` identifies the backend and
+    model and becomes part of the analysis cache key.
+    """
+    name = "base"
+    version = "base"
+
+    async def generate(self, request: GenerationRequest) -> GenerationResponse:
+        raise NotImplementedError
+
+    async def stream(self, request: GenerationRequest):
+        """
+        Yields the response text in chunks. Defaults to a single chunk.
+        """
+        response = await self.generate(request)
+        yield response.text
+
+
+# Keys the Gemini Schema proto understands; everything else in a JSON schema is dropped
+GEMINI_SCHEMA_KEYS = ("type", "format", "description", "nullable", "enum", "items", "properties", "required")
+
+def _to_gemini_schema_node(node: dict, defs: dict) -> dict:
+    if "$ref" in node:
+        node = defs[node["$ref"].split("/")[-1]]
+    if "anyOf" in node:
+        # Optional[X] is emitted as anyOf [X, null]
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        converted = _to_gemini_schema_node(options[0], defs)
+        converted["nullable"] = True
+        return converted
+
+    converted = {}
+    for key in GEMINI_SCHEMA_KEYS:
+        if key not in node:
+            continue
+        if key == "items":
+            converted["items"] = _to_gemini_schema_node(node["items"], defs)
+        elif key == "properties":
+            converted["properties"] = {
+                name: _to_gemini_schema_node(child, defs) for name, child in node["properties"].items()
+            }
+        else:
+            converted[key] = node[key]
+    if converted.get("type") == "object" and "properties" in converted and "required" not in converted:
+        converted["required"] = list(converted["properties"])
+    return converted
+
+@lru_cache(maxsize=64)
+def to_gemini_schema(response_model: type, fields: Optional[tuple] = None, required: Optional[tuple] = None) -> dict:
+    """
+    Converts a pydantic model's JSON schema into Gemini's structured-output schema
+    dialect, optionally keeping only `fields`. Every kept field is marked required
+    unless `required` names the top-level ones that are.
+    """
+    schema = response_model.model_json_schema()
+    defs = schema.get("$defs", {})
+    properties = {
+        name: node for name, node in schema["properties"].items() if fields is None or name in fields
+    }
+    node = {"type": "object", "properties": properties}
+    if required is not None:
+        node["required"] = list(required)
+    return _to_gemini_schema_node(node, defs)
+
+
+class GeminiProvider(AIProvider):
+    name = "gemini"
+
+    def __init__(self, model_name: str = GEMINI_MODEL_NAME, generation_config: dict = GEMINI_GENERATION_CONFIG):
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in .env file")
+
+        # Imported here so the local provider runs without the Google SDK configured
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.version = f"gemini:{model_name}"
+        self.model = genai.GenerativeModel(model_name, generation_config=generation_config)
+
+    def _generation_config(self, request: GenerationRequest):
+        # Merged by the SDK over the model's default generation_config
+        config = {}
+        if request.response_model is not None:
+            fields = tuple(request.fields) if request.fields else None
+            required = tuple(request.required) if request.required is not None else None
+            config["response_schema"] = to_gemini_schema(request.response_model, fields, required)
+        if request.max_output_tokens:
+            config["max_output_tokens"] = request.max_output_tokens
+        return config or None
+
+    @staticmethod
+    def _translate_error(e: Exception) -> Exception:
+        # google.api_core raises ResourceExhausted (code 429) with the retry hint in its message
+        if getattr(e, "code", None) == 429 or type(e).__name__ == "ResourceExhausted":
+            return RateLimitedError(str(e), parse_retry_after(str(e)))
+        return e
+
+    async def generate(self, request: GenerationRequest) -> GenerationResponse:
+        try:
+            response = await self.model.generate_content_async(
+                request.prompt, generation_config=self._generation_config(request)
+            )
+        except Exception as e:
+            raise self._translate_error(e) from e
+        try:
+            raw_text = response.text
+        except Exception:
+            try:
+                raw_text = response.candidates[0].content.parts[0].text
+            except Exception:
+                raw_text = ""
+
+        usage = getattr(response, "usage_metadata", None)
+        return GenerationResponse(
+            text=raw_text,
+            prompt_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", 0) or 0,
+        )
+
+    async def stream(self, request: GenerationRequest):
+        try:
+            response = await self.model.generate_content_async(
+                request.prompt, generation_config=self._generation_config(request), stream=True
+            )
+        except Exception as e:
+            raise self._translate_error(e) from e
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except Exception:
+                continue
+            yield text
+
+
+FILLER_WORDS = ["actually", "basically", "really", "just", "very", "literally", "like", "so"]
+SCORE_KEYWORDS = {
+    "clarity": [],
+    "problem_definition": ["problem", "pain", "struggle", "challenge", "today"],
+    "solution_explanation": ["solution", "we build", "platform", "our product", "we help"],
+    "technical_depth": ["api", "model", "architecture", "algorithm", "data", "infrastructure"],
+    "innovation": ["first", "novel", "unique", "patent", "new"],
+    "impact": ["impact", "save", "revenue", "growth", "users", "customers", "%"],
+    "logical_flow": ["because", "therefore", "so that", "which means", "first", "then"],
+    "persuasiveness": ["traction", "raised", "join", "invest", "ask", "proven"],
+}
+LOCAL_RESOURCES = [
+    {"title": "How to Pitch Your Startup (YC)", "url": "https://www.youtube.com/watch?v=17XZGUX_9iM", "category": "YouTube"},
+    {"title": "How to Build Your Seed Round Pitch Deck", "url": "https://www.ycombinator.com/library/2u-how-to-build-your-seed-round-pitch-deck", "category": "Blog"},
+    {"title": "Guy Kawasaki's 10/20/30 Rule", "url": "https://guykawasaki.com/the_102030_rule/", "category": "Blog"},
+    {"title": "Sequoia Pitch Deck Template", "url": "https://www.sequoiacap.com/article/writing-a-business-plan/", "category": "Pitch Deck"},
+]
+
+
+def _sentences(text: str) -> list:
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s.strip()]
+
+
+def build_local_analysis(pitch_text: str, target_audience: str) -> dict:
+    """
+    Derives a complete, schema-valid analysis from simple features of the pitch text.
+    The same input always produces the same output.
+    """
+    seed = int(hashlib.sha256(f"{target_audience}\x1f{pitch_text}".encode("utf-8")).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+    lowered = pitch_text.lower()
+    words = re.findall(r"[a-zA-Z']+", lowered)
+    sentences = _sentences(pitch_text) or [pitch_text.strip()]
+    avg_sentence_words = len(words) / max(len(sentences), 1)
+
+    scores = {}
+    for dimension, keywords in SCORE_KEYWORDS.items():
+        if dimension == "clarity":
+            # Shorter sentences read more clearly
+            base = 9 - int(max(avg_sentence_words - 15, 0) // 5)
+        else:
+            base = 4 + min(sum(lowered.count(k) for k in keywords), 4)
+        scores[dimension] = max(1, min(10, base + rng.randint(-1, 1)))
+    overall = round(sum(scores.values()) / len(scores), 1)
+    ranked = sorted(scores, key=scores.get)
+    weakest, strongest = ranked[:3], ranked[-3:]
+
+    def label(dimension):
+        return dimension.replace("_", " ").title()
+
+    filler_words = []
+    for word in FILLER_WORDS:
+        count = words.count(word)
+        if count:
+            filler_words.append({"word": word, "count": count})
+
+    improved = " ".join(
+        s for s in sentences if not any(f" {w} " in f" {s.lower()} " for w in ("basically", "literally"))
+    ) or pitch_text.strip()
+    headline = sentences[0][:140]
+
+    return {
+        "scores": scores,
+        "overall_score": overall,
+        "strengths": [f"Solid {label(d).lower()}" for d in reversed(strongest)],
+        "weaknesses": [f"Limited {label(d).lower()}" for d in weakest],
+        "suggestions": [f"Strengthen {label(d).lower()} for a {target_audience} audience" for d in weakest],
+        "improved_pitch": improved,
+        "improvement_metrics": {
+            "clarity_delta": max(0, 10 - scores["clarity"]) // 2,
+            "persuasion_delta": max(0, 10 - scores["persuasiveness"]) // 2,
+            "overall_delta": round((10 - overall) / 3, 1),
+        },
+        "checklist": [
+            {"label": "Problem defined", "status": scores["problem_definition"] >= 6},
+            {"label": "Solution explained", "status": scores["solution_explanation"] >= 6},
+            {"label": "Market or impact quantified", "status": any(c.isdigit() for c in pitch_text)},
+            {"label": "Technical approach", "status": scores["technical_depth"] >= 6},
+            {"label": "Clear ask", "status": "ask" in lowered or "invest" in lowered},
+        ],
+        "slides": [
+            {"title": title, "content": [sentences[i % len(sentences)][:160]]}
+            for i, title in enumerate(["Title", "Problem", "Solution", "Market", "Impact", "Close"])
+        ],
+        "summaries": {
+            "elevator": headline,
+            "linkedin": f"{headline} Here is why it matters to every {target_audience}.",
+            "email": f"Dear {target_audience},\n\n{headline}\n\nBest regards",
+        },
+        "confidence_score": max(0, min(100, 90 - 5 * sum(f["count"] for f in filler_words))),
+        "filler_words": filler_words,
+        "suggested_resources": [LOCAL_RESOURCES[(seed + i) % len(LOCAL_RESOURCES)] for i in range(len(LOCAL_RESOURCES))],
+        "practice_questions": [
+            f"How would you convince a skeptical {target_audience} about your {label(d).lower()}?" for d in weakest
+        ],
+        "personalized_roadmap": [
+            {"title": f"{label(d)} Drill", "description": f"Rewrite the parts of your pitch covering {label(d).lower()} in three sentences."}
+            for d in weakest
+        ],
+    }
+
+
+class LocalProvider(AIProvider):
+    """
+    Offline provider for load tests and benchmarks. Output is derived deterministically
+    from the pitch; latency, jitter, failures and truncated JSON are injected as configured.
+    """
+    name = "local"
+    version = "local:v1"
+
+    def __init__(self, latency_ms: float = LOCAL_PROVIDER_LATENCY_MS, jitter_ms: float = LOCAL_PROVIDER_JITTER_MS,
+                 failure_rate: float = LOCAL_PROVIDER_FAILURE_RATE, truncate_rate: float = LOCAL_PROVIDER_TRUNCATE_RATE,
+                 rate_limit_rate: float = LOCAL_PROVIDER_RATE_LIMIT_RATE, seed=LOCAL_PROVIDER_SEED):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.truncate_rate = truncate_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(seed)
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def _render(self, request: GenerationRequest) -> str:
+        if self._rng.random() < self.failure_rate:
+            raise ProviderError("Injected local provider failure")
+        if self.rate_limit_rate and self._rng.random() < self.rate_limit_rate:
+            raise RateLimitedError("Injected local provider rate limit", retry_after=0.5)
+        analysis = build_local_analysis(request.pitch_text, request.target_audience)
+        if request.fields:
+            analysis = {field: analysis[field] for field in request.fields if field in analysis}
+        if request.required is not None:
+            # Like a model leaving out what an incremental update does not change
+            analysis = {field: analysis[field] for field in request.required if field in analysis}
+        text = json.dumps(analysis)
+        if self._rng.random() < self.truncate_rate:
+            text = text[: self._rng.randint(len(text) // 4, len(text) - 1)]
+        return text
+
+    async def generate(self, request: GenerationRequest) -> GenerationResponse:
+        await asyncio.sleep(self._delay())
+        text = self._render(request)
+        return GenerationResponse(text=text, prompt_tokens=len(request.prompt) // 4, output_tokens=len(text) // 4)
+
+    async def stream(self, request: GenerationRequest):
+        delay = self._delay()
+        # Roughly a fifth of the latency goes to the first chunk, the rest is spread evenly
+        await asyncio.sleep(delay * 0.2)
+        text = self._render(request)
+        chunk_size = 256
+        chunk_count = max(1, -(-len(text) // chunk_size))
+        for i in range(0, len(text), chunk_size):
+            await asyncio.sleep(delay * 0.8 / chunk_count)
+            yield text[i:i + chunk_size]
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "local": LocalProvider,
+}
+
+_provider = None
+
+def get_provider() -> AIProvider:
+    """
+    Returns the provider selected by AI_PROVIDER, constructing it on first use.
+    """
+    global _provider
+    if _provider is None:
+        if AI_PROVIDER not in PROVIDERS:
+            raise ValueError(f"Unknown AI_PROVIDER '{AI_PROVIDER}'. Expected one of: {', '.join(PROVIDERS)}")
+        _provider = PROVIDERS[AI_PROVIDER]()
+        logger.info(f"Using AI provider: {_provider.version}")
+    return _provider
@@ -1,12 +1,28 @@
 import os
 import json
-import google.generativeai as genai
+import copy
+import hashlib
+from dataclasses import replace
 from fastapi import HTTPException
 from dotenv import load_dotenv
+import math
 import logging
 import asyncio
-from schemas import AnalysisResult
-from utils import clean_json_string, calculate_overall_score, validate_scores
+from pydantic import TypeAdapter, ValidationError
+from schemas import AnalysisResult, SCORE_DIMENSIONS, ANALYSIS_SECTIONS, LOCAL_SECTIONS
+from text_metrics import analyze_text
+from revisions import revision_delta
+from utils import parse_model_json, calculate_overall_score, validate_scores, IncrementalJSONObjectParser
+from cache import analysis_cache, ANALYSIS_CACHE_ENABLED
+from database import analysis_leases_collection
+from singleflight import SingleFlight, SharedFlight
+from ai_providers import get_provider, GenerationRequest
+from resilience import model_client, CircuitOpenError
+from fairshare import user_quotas, current_model_user
+from prompt_budget import (
+    compact_pitch, plan_output, estimate_tokens, prompt_budget_stats, DEFAULT_MAX_OUTPUT_TOKENS, PROMPT_PITCH_TOKEN_BUDGET
+)
+from metrics import MODEL_TOKENS, ANALYSIS_FALLBACKS
 
 load_dotenv()
 
@@ -14,24 +30,6 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in .env file")
-
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Gemini Model Configuration
-generation_config = {
-    "temperature": 0.4,
-    "top_p": 0.9,
-    "max_output_tokens": 4096,
-    "response_mime_type": "application/json"
-}
-
-
-model = genai.GenerativeModel("gemini-2.5-flash", generation_config=generation_config)
-
 PROMPT_TEMPLATE = """
 Act as an elite Startup Mentor & Pitch Architect. 
 Analyze the pitch below for the specific Target Audience: "{target_audience}".
@@ -41,8 +39,7 @@ MISSION:
 2. Refine the pitch into a "Top-Notch" version tailored EXACTLY for the {target_audience}.
 3. Calculate "Improvement Metrics" by comparing your Refined version against the Original.
 4. Detect missing components crucial for a high-stakes {target_audience} pitch.
-5. Project delivery metrics (Confidence Index, Filler Word prediction).
-6. Generate supporting materials:
+5. Generate supporting materials:
     - Slides & Summaries.
     - **Personalized Skill Roadmap**: 3 actionable exercises based on lowest scores (e.g., if Clarity < 7, suggest "Concise Framing").
 - **Curated Resources**: 4 high-value links. 
@@ -58,7 +55,6 @@ OUTPUT RULES:
 - summaries: elevator (30s), linkedin (hooky), email (formal).
 - slides: 6 key slides (Title, Problem, Solution, Market/Architecture, Impact, Close).
 - improvement_metrics: Clarity/Persuasion (0-10 scaled), Overall (score delta).
-- filler_words: Predict likely problematic words based on text structure.
 - practice_questions: 3 tough questions a {target_audience} would ask.
 - personalized_roadmap: 3 steps with "title" and "description".
 
@@ -79,68 +75,594 @@ Response Schema:
     "checklist": [{{ "label": str, "status": bool }}],
     "slides": [{{ "title": str, "content": [str] }}],
     "summaries": {{ "elevator": str, "linkedin": str, "email": str }},
-    "confidence_score": int,
-    "filler_words": [{{ "word": str, "count": int }}],
     "suggested_resources": [{{ "title": str, "url": str, "category": "YouTube|Blog|Documentation|Pitch Deck" }}],
     "practice_questions": [str],
     "personalized_roadmap": [{{ "title": str, "description": str }}]
 }}
 """
 
-async def analyze_pitch_with_gemini(pitch_text: str, target_audience: str = "General Investor") -> dict:
-    prompt = PROMPT_TEMPLATE.format(pitch_text=pitch_text, target_audience=target_audience)
-    
-    retries = 2
-    for attempt in range(retries):
+# Prompt for one section of the analysis, also used to repair individual fields
+SECTION_TEMPLATE = """
+Act as an elite Startup Mentor & Pitch Architect.
+Analyze the pitch below for the specific Target Audience: "{target_audience}".
+Generate ONLY these JSON keys: {fields}.
+
+RULES:
+{rules}
+
+Pitch Text:
+"{pitch_text}"
+
+Return VALID RAW JSON ONLY: one object containing exactly the keys above.
+"""
+
+# Prompt updating the user's analysis of an earlier version of the pitch from a diff
+REVISION_TEMPLATE = """
+Act as an elite Startup Mentor & Pitch Architect.
+You analyzed an earlier version of a pitch for the Target Audience: "{target_audience}".
+The pitch has since been revised. Update your analysis for the revised pitch.
+Return ONLY the JSON keys out of {fields} whose value changes because of the revision.
+Always return "scores"; leave out every other key that stays the same.
+
+RULES:
+{rules}
+
+Previous analysis:
+{previous}
+
+Revision (@ where in the revised pitch, - removed words, + added words):
+{changes}
+
+Return VALID RAW JSON ONLY.
+"""
+
+# Per-field instructions reused by targeted repair prompts
+FIELD_RULES = {
+    "scores": f"- scores: integers 0-10 for {', '.join(SCORE_DIMENSIONS)}.",
+    "overall_score": "- overall_score: average of the scores.",
+    "strengths": "- strengths: 3 concise strengths.",
+    "weaknesses": "- weaknesses: 3 concise weaknesses.",
+    "suggestions": "- suggestions: 3 concrete suggestions.",
+    "improved_pitch": "- improved_pitch: a refined version tailored to the audience, internal quotes escaped.",
+    "improvement_metrics": "- improvement_metrics: clarity_delta, persuasion_delta (0-10 scaled) and overall_delta.",
+    "checklist": "- checklist: 5 components crucial for this audience, status=true if present.",
+    "slides": "- slides: 6 key slides (Title, Problem, Solution, Market/Architecture, Impact, Close).",
+    "summaries": "- summaries: elevator (30s), linkedin (hooky), email (formal).",
+    "suggested_resources": '- suggested_resources: 4 links, category one of "YouTube", "Blog", "Documentation", "Pitch Deck".',
+    "practice_questions": "- practice_questions: 3 tough questions this audience would ask.",
+    "personalized_roadmap": "- personalized_roadmap: 3 steps with title and description based on the lowest scores.",
+}
+
+# Fields the model generates; the remaining AnalysisResult fields are set by the backend
+# (filler_words, confidence_score and text_metrics are computed exactly by text_metrics.py)
+GENERATED_FIELDS = list(FIELD_RULES)
+# Fields re-evaluated for a revised pitch; the heavy generated text is carried over from the previous version
+REVISED_FIELDS = [
+    "scores", "overall_score", "strengths", "weaknesses", "suggestions",
+    "checklist", "practice_questions", "personalized_roadmap",
+]
+CARRIED_FIELDS = [field for field in GENERATED_FIELDS if field not in REVISED_FIELDS]
+FIELD_ADAPTERS = {name: TypeAdapter(AnalysisResult.model_fields[name].annotation) for name in GENERATED_FIELDS}
+
+REPAIR_MAX_OUTPUT_TOKENS = int(os.getenv("REPAIR_MAX_OUTPUT_TOKENS", "1536"))
+# Model calls for individual sections allowed in flight at once, across all requests
+ANALYSIS_SECTION_CONCURRENCY = int(os.getenv("ANALYSIS_SECTION_CONCURRENCY", "8"))
+# Cross-worker coalescing waits on the shared analysis cache, so it needs the cache enabled
+ANALYSIS_LEASE_ENABLED = os.getenv("ANALYSIS_LEASE_ENABLED", "true").lower() == "true" and ANALYSIS_CACHE_ENABLED
+ANALYSIS_LEASE_SECONDS = float(os.getenv("ANALYSIS_LEASE_SECONDS", "120"))
+ANALYSIS_LEASE_POLL_SECONDS = float(os.getenv("ANALYSIS_LEASE_POLL_SECONDS", "0.25"))
+
+# Any edit to the prompts changes the version and therefore the cache key
+PROMPT_VERSION = hashlib.sha256(f"{PROMPT_TEMPLATE}{SECTION_TEMPLATE}{REVISION_TEMPLATE}".encode("utf-8")).hexdigest()[:12]
+
+
+class GenerationStats:
+    """
+    Token usage of full generations and of targeted field repairs.
+    """
+    def __init__(self):
+        self.generations = 0
+        self.output_tokens = 0
+        self.repair_calls = 0
+        self.repair_output_tokens = 0
+        self.repaired_fields = 0
+        self.fallback_fields = 0
+        self.full_fallbacks = 0
+
+    def record_generation(self, response, kind: str):
+        self.generations += 1
+        self.output_tokens += response.output_tokens
+        self._record_tokens(response, kind)
+
+    def record_repair(self, response, field_count: int):
+        self._record_tokens(response, "repair")
+        self.repair_calls += 1
+        self.repair_output_tokens += response.output_tokens
+        self.repaired_fields += field_count
+
+    @staticmethod
+    def _record_tokens(response, kind: str):
+        MODEL_TOKENS.labels(kind, "prompt").inc(response.prompt_tokens)
+        MODEL_TOKENS.labels(kind, "output").inc(response.output_tokens)
+        user_quotas.record_tokens(current_model_user(), response.prompt_tokens + response.output_tokens)
+
+    def record_fallback(self, field_count: int, full: bool = False):
+        if full:
+            self.full_fallbacks += 1
+            ANALYSIS_FALLBACKS.labels("analysis").inc()
+        else:
+            self.fallback_fields += field_count
+            ANALYSIS_FALLBACKS.labels("field").inc(field_count)
+
+    def stats(self) -> dict:
+        return {
+            "generations": self.generations,
+            "avg_output_tokens": round(self.output_tokens / self.generations, 1) if self.generations else 0.0,
+            "repair_calls": self.repair_calls,
+            "avg_repair_output_tokens": round(self.repair_output_tokens / self.repair_calls, 1) if self.repair_calls else 0.0,
+            "repaired_fields": self.repaired_fields,
+            "fallback_fields": self.fallback_fields,
+            "full_fallbacks": self.full_fallbacks,
+        }
+
+
+generation_stats = GenerationStats()
+
+# Identical requests that arrive while a generation is running share its result
+analysis_flights = SingleFlight()
+# ...and so do identical requests being generated by another worker process
+analysis_leases = SharedFlight(
+    analysis_leases_collection,
+    lease_seconds=ANALYSIS_LEASE_SECONDS,
+    poll_interval=ANALYSIS_LEASE_POLL_SECONDS,
+    enabled=ANALYSIS_LEASE_ENABLED,
+)
+
+section_slots = asyncio.Semaphore(ANALYSIS_SECTION_CONCURRENCY)
+
+def _cache_key(pitch_text: str, target_audience: str, section: str = None) -> str:
+    version = f"{get_provider().version}:{PROMPT_VERSION}"
+    if section:
+        version = f"{version}:{section}"
+    return analysis_cache.make_key(pitch_text, target_audience, version)
+
+async def _compact_pitch(pitch_text: str):
+    if estimate_tokens(pitch_text) <= PROMPT_PITCH_TOKEN_BUDGET:
+        return compact_pitch(pitch_text)
+    # Several milliseconds of CPU work for the longest pitches, kept off the event loop like the local metrics
+    return await asyncio.to_thread(compact_pitch, pitch_text)
+
+def _section_prompt(pitch_text: str, target_audience: str, fields: list) -> str:
+    return SECTION_TEMPLATE.format(
+        target_audience=target_audience,
+        fields=", ".join(fields),
+        rules="\n".join(FIELD_RULES[field] for field in fields),
+        pitch_text=pitch_text,
+    )
+
+async def _generation_request(pitch_text: str, target_audience: str) -> GenerationRequest:
+    # Long pitches are compacted; optional sections left out to fit the budget are generated on first read
+    compaction = await _compact_pitch(pitch_text)
+    prompt = PROMPT_TEMPLATE.format(pitch_text=compaction.text, target_audience=target_audience)
+    budget = plan_output(prompt, compaction.tokens, GENERATED_FIELDS, optional=True)
+    if budget.dropped_sections:
+        # The full template asks for every section: ask for just the fields that stay
+        prompt = _section_prompt(compaction.text, target_audience, budget.fields)
+        budget = replace(plan_output(prompt, compaction.tokens, budget.fields), dropped_sections=budget.dropped_sections)
+    prompt_budget_stats.record("analysis", budget, compaction)
+    return GenerationRequest(
+        prompt=prompt, pitch_text=pitch_text, target_audience=target_audience,
+        response_model=AnalysisResult, fields=budget.fields, max_output_tokens=budget.max_output_tokens,
+    )
+
+def validate_analysis_fields(data: dict, fields: list = GENERATED_FIELDS):
+    """
+    Validates each generated field on its own. Returns the normalized valid fields and
+    the names of fields that are missing, empty or do not match the schema.
+    """
+    valid, failed = {}, []
+    for field in fields:
+        value = data.get(field)
+        if value in (None, "", [], {}):
+            failed.append(field)
+            continue
         try:
-            response = await asyncio.wait_for(
-                model.generate_content_async(prompt),
-                timeout=45.0 
-            )
-            
+            valid[field] = FIELD_ADAPTERS[field].dump_python(FIELD_ADAPTERS[field].validate_python(value), mode="json")
+        except ValidationError:
+            failed.append(field)
+    return valid, failed
+
+async def _fields_request(pitch_text: str, target_audience: str, fields: list, kind: str, max_output_tokens: int = None) -> GenerationRequest:
+    compaction = await _compact_pitch(pitch_text)
+    prompt = _section_prompt(compaction.text, target_audience, fields)
+    budget = plan_output(prompt, compaction.tokens, fields, max_output_tokens=max_output_tokens or DEFAULT_MAX_OUTPUT_TOKENS)
+    prompt_budget_stats.record(kind, budget, compaction)
+    return GenerationRequest(
+        prompt=prompt,
+        pitch_text=pitch_text,
+        target_audience=target_audience,
+        response_model=AnalysisResult,
+        fields=fields,
+        max_output_tokens=budget.max_output_tokens,
+        kind=kind,
+    )
+
+async def _repair_fields(pitch_text: str, target_audience: str, fields: list) -> dict:
+    """
+    Re-requests only the failed fields with a small targeted prompt and schema.
+    """
+    request = await _fields_request(pitch_text, target_audience, fields, "repair", max_output_tokens=REPAIR_MAX_OUTPUT_TOKENS)
+    try:
+        # A single attempt: the caller already has fallback data for these fields
+        response = await model_client.generate(request, attempts=1)
+        repaired, _ = validate_analysis_fields(parse_model_json(response.text), fields)
+        generation_stats.record_repair(response, len(repaired))
+        return repaired
+    except Exception as e:
+        logger.error(f"Field repair failed for {fields}: {e}")
+        return {}
+
+async def _complete_analysis(pitch_text: str, target_audience: str, data: dict, fields: list = GENERATED_FIELDS) -> dict:
+    """
+    Turns a possibly partial model response into a complete set of `fields`: invalid fields
+    are re-requested once, anything still missing comes from fallback data and is flagged.
+    """
+    valid, failed = validate_analysis_fields(data, fields)
+    if failed:
+        logger.warning(f"Repairing analysis fields: {failed}")
+        valid.update(await _repair_fields(pitch_text, target_audience, failed))
+        failed = [field for field in failed if field not in valid]
+
+    if failed:
+        logger.warning(f"Using fallback data for fields: {failed}")
+        generation_stats.record_fallback(len(failed))
+
+    analysis = {}
+    for field in fields:
+        analysis[field] = valid[field] if field in valid else copy.deepcopy(MOCK_ANALYSIS_RESULT[field])
+
+    if "scores" in analysis:
+        analysis["scores"] = validate_scores(analysis["scores"])
+        analysis["overall_score"] = calculate_overall_score(analysis["scores"])
+    analysis["used_fallback"] = bool(failed)
+    analysis["fallback_fields"] = failed
+    analysis["sections"] = _sections_of(fields)
+    return analysis
+
+def _fallback_analysis(fields: list = GENERATED_FIELDS) -> dict:
+    generation_stats.record_fallback(len(fields), full=True)
+    analysis = {field: copy.deepcopy(MOCK_ANALYSIS_RESULT[field]) for field in fields}
+    analysis["used_fallback"] = True
+    analysis["fallback_fields"] = list(fields)
+    analysis["sections"] = _sections_of(fields)
+    return analysis
+
+def _sections_of(fields) -> list:
+    return [section for section, names in ANALYSIS_SECTIONS.items() if set(names) <= set(fields)]
+
+async def _local_metrics(pitch_text: str) -> dict:
+    # A few milliseconds of pure CPU work, run off the event loop so it overlaps the model call.
+    # Callers that fail early just drop the future: cancelling it would not stop the thread.
+    return await asyncio.to_thread(analyze_text, pitch_text)
+
+def _merge_local_metrics(analysis: dict, metrics: dict) -> dict:
+    analysis.update(metrics)
+    analysis["sections"] = _sections_of(analysis)
+    return analysis
+
+async def analyze_pitch_with_gemini(pitch_text: str, target_audience: str = "General Investor", bypass_cache: bool = False) -> dict:
+    """
+    Returns the analysis for a pitch, served from the analysis cache when possible.
+    bypass_cache skips the lookup but still refreshes the cached entry.
+    Concurrent identical requests are coalesced into a single Gemini call.
+    """
+    cache_key = _cache_key(pitch_text, target_audience)
+    if bypass_cache:
+        analysis_cache.record_bypass()
+    else:
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Analysis cache hit.")
+            return cached
+
+    async def generate_and_store():
+        data = await _generate_analysis(pitch_text, target_audience)
+        # Never cache fallback data, the next request should try the model again
+        if not data.get("used_fallback"):
+            await analysis_cache.set(cache_key, data)
+        return data
+
+    async def coalesced():
+        return await analysis_leases.do(cache_key, generate_and_store, lambda: analysis_cache.get(cache_key))
+
+    data = await analysis_flights.do(cache_key, coalesced)
+    # Coalesced callers all receive the same object, give each its own copy
+    return copy.deepcopy(data)
+
+async def stream_pitch_analysis(pitch_text: str, target_audience: str = "General Investor"):
+    """
+    Streams the analysis as (field, value) pairs, yielding each top-level field of the
+    JSON document as soon as Gemini finishes generating it. A field may be yielded again
+    when a later field changes it (overall_score is recomputed once scores arrive).
+    """
+    cache_key = _cache_key(pitch_text, target_audience)
+    cached = await analysis_cache.get(cache_key)
+    if cached is not None:
+        logger.info("Analysis cache hit (stream).")
+        for field, value in cached.items():
+            yield field, value
+        return
+
+    request = await _generation_request(pitch_text, target_audience)
+    parser = IncrementalJSONObjectParser()
+    merged = {}
+
+    def postprocess(field, value):
+        adapter = FIELD_ADAPTERS.get(field)
+        if adapter is not None:
             try:
-                raw_text = response.text
-            except Exception:
-                 try:
-                     raw_text = response.candidates[0].content.parts[0].text
-                 except:
-                     raw_text = ""
-                     
-            cleaned_text = clean_json_string(raw_text)
-            
+                value = adapter.dump_python(adapter.validate_python(value), mode="json")
+            except ValidationError:
+                # Not sent; _complete_analysis re-requests fields that are missing or invalid
+                return []
+        if field == "scores" and isinstance(value, dict):
+            value = validate_scores(value)
+            merged["scores"] = value
+            pending = [(field, value)]
+            if "overall_score" in merged:
+                merged["overall_score"] = calculate_overall_score(value)
+                pending.append(("overall_score", merged["overall_score"]))
+            return pending
+        if field == "overall_score" and isinstance(merged.get("scores"), dict):
+            value = calculate_overall_score(merged["scores"])
+        merged[field] = value
+        return [(field, value)]
+
+    # Delivery metrics are computed alongside and sent as soon as they are ready
+    local = asyncio.ensure_future(_local_metrics(pitch_text))
+    metrics = None
+    chunks = model_client.stream(request)
+    try:
+        # Drained to the end so the breaker sees the stream complete
+        while True:
+            # Only provider failures are absorbed; errors handling the output reach the caller
             try:
-                # clean_json_string now uses json_repair internally
-                repaired_json = clean_json_string(raw_text)
-                data = json.loads(repaired_json)
-                
-                # Recalculate score logic
-                if "scores" in data:
-                     data["scores"] = validate_scores(data["scores"])
-                     data["overall_score"] = calculate_overall_score(data["scores"])
-                
-                return data
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON Parse Error (Attempt {attempt+1}): {e}")
-                logger.debug(f"RAW TEXT: {raw_text[:500]}... (truncated)")
-                if attempt == retries - 1:
-                    # Final attempt fallback
-                    return MOCK_ANALYSIS_RESULT
-                continue 
-                
-        except asyncio.TimeoutError:
-            logger.error(f"Gemini API Timeout (Attempt {attempt+1})")
-            if attempt == retries - 1:
-                 raise HTTPException(status_code=504, detail="AI processing timed out.")
-            continue
-            
-        except Exception as e:
-            logger.error(f"Gemini API Error: {e}")
-            if attempt == retries - 1:
-                return MOCK_ANALYSIS_RESULT
-            continue
+                text = await chunks.__anext__()
+            except StopAsyncIteration:
+                break
+            except CircuitOpenError as e:
+                raise _unavailable(e)
+            except Exception as e:
+                logger.error(f"AI Streaming Error: {e}")
+                break
+            if metrics is None and local.done():
+                metrics = local.result()
+                merged.update(metrics)
+                for item in metrics.items():
+                    yield item
+            if parser.done:
+                continue
+            for field, value in parser.feed(text):
+                for item in postprocess(field, value):
+                    yield item
+    finally:
+        await chunks.aclose()
+    if metrics is None:
+        metrics = await local
+        merged.update(metrics)
+        for item in metrics.items():
+            yield item
+    # Streams carry no usage metadata; charge the quota with the usual ~4 characters per token
+    user_quotas.record_tokens(current_model_user(), (len(request.prompt) + len(parser.buffer)) // 4)
+
+    if not parser.done and parser.buffer:
+        # The stream broke off or the JSON never closed: keep whatever can be repaired
+        try:
+            recovered = parse_model_json(parser.buffer)
+        except json.JSONDecodeError:
+            recovered = {}
+        for field, value in recovered.items():
+            if field not in merged:
+                for item in postprocess(field, value):
+                    yield item
+
+    # Re-request or back-fill fields that are missing or invalid, then send what changed
+    analysis = _merge_local_metrics(await _complete_analysis(pitch_text, target_audience, merged, request.fields), metrics)
+    for field, value in analysis.items():
+        if field not in merged or merged[field] != value:
+            yield field, value
+
+    if not analysis["used_fallback"]:
+        await analysis_cache.set(cache_key, analysis)
+
+def _revision_request(pitch_text: str, target_audience: str, base: dict) -> GenerationRequest:
+    previous = {field: base["analysis"][field] for field in REVISED_FIELDS if field in base["analysis"]}
+    prompt = REVISION_TEMPLATE.format(
+        target_audience=target_audience,
+        fields=", ".join(REVISED_FIELDS),
+        rules="\n".join(FIELD_RULES[field] for field in REVISED_FIELDS),
+        previous=json.dumps(previous, separators=(",", ":")),
+        changes=base["diff"]["text"],
+    )
+    prompt_budget_stats.record("revision", plan_output(prompt, 0, REVISED_FIELDS))
+    return GenerationRequest(
+        prompt=prompt,
+        pitch_text=pitch_text,
+        target_audience=target_audience,
+        response_model=AnalysisResult,
+        fields=REVISED_FIELDS,
+        required=["scores"],
+        kind="revision",
+    )
+
+async def analyze_pitch_revision(pitch_text: str, target_audience: str, base: dict) -> dict:
+    """
+    Analyzes a revised pitch incrementally from `base`, the user's analysis of an earlier
+    version (see analysis_store.find_revision_base). The model sees the previous
+    evaluation and the diff instead of the whole pitch, and returns only the fields
+    that change. Falls back to a full analysis when the model call fails.
+    """
+    # Carried fields come from the base's pitch: the result is only reused for this same
+    # base, never served as a full analysis of the text (or to another user)
+    cache_key = _cache_key(pitch_text, target_audience, f"revision:{base['id']}")
+    cached = await analysis_cache.get(cache_key)
+    if cached is not None:
+        logger.info("Analysis cache hit (revision).")
+        return cached
+
+    local = asyncio.ensure_future(_local_metrics(pitch_text))
+    response = await _call_model(_revision_request(pitch_text, target_audience, base))
+    if response is None:
+        return await analyze_pitch_with_gemini(pitch_text, target_audience)
+
+    previous = base["analysis"]
+    updates = _parse_response(response)
+    # overall_score is recomputed from the scores whenever they are updated
+    updated_fields = [
+        field for field in REVISED_FIELDS
+        if field in updates or (field == "overall_score" and "scores" in updates)
+    ]
+    data = {field: previous[field] for field in REVISED_FIELDS if field in previous}
+    data.update({field: updates[field] for field in updated_fields if field in updates})
+    analysis = await _complete_analysis(pitch_text, target_audience, data, REVISED_FIELDS)
+    for field in CARRIED_FIELDS:
+        analysis[field] = copy.deepcopy(previous[field])
+    analysis = _merge_local_metrics(analysis, await local)
+
+    analysis["revision"] = {
+        "base_analysis_id": base["id"],
+        "similarity": round(base["diff"]["similarity"], 4),
+        "changed_words": base["diff"]["changed_words"],
+        "updated_fields": updated_fields,
+        "carried_fields": [field for field in GENERATED_FIELDS if field not in updated_fields],
+        "delta": revision_delta(previous, analysis),
+    }
+    if not analysis["used_fallback"]:
+        # Resubmitting this exact text against the same base is then a cache hit
+        await analysis_cache.set(cache_key, analysis)
+    logger.info(f"Revised analysis {base['id']} incrementally, model updated {updated_fields}.")
+    return analysis
+
+def _unavailable(e: CircuitOpenError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="AI service is temporarily unavailable.",
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+    )
+
+async def _call_model(request: GenerationRequest):
+    """
+    Runs one generation through the resilient model client. Returns None when the
+    provider keeps failing; an open circuit is a 503 and a final timeout a 504.
+    """
+    try:
+        response = await model_client.generate(request)
+    except CircuitOpenError as e:
+        raise _unavailable(e)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="AI processing timed out.")
+    except Exception as e:
+        logger.error(f"AI Provider gave up: {e}")
+        return None
+    generation_stats.record_generation(response, request.kind)
+    prompt_budget_stats.record_usage(request.prompt, response.prompt_tokens)
+    return response
+
+def _parse_response(response) -> dict:
+    try:
+        # Tiered: plain json.loads first, json_repair only as a last resort
+        return parse_model_json(response.text)
+    except json.JSONDecodeError as e:
+        # Nothing usable: every field goes through targeted repair instead of a blind retry
+        logger.error(f"JSON Parse Error: {e}")
+        logger.debug(f"RAW TEXT: {response.text[:500]}... (truncated)")
+        return {}
+
+async def _generate_analysis(pitch_text: str, target_audience: str) -> dict:
+    local = asyncio.ensure_future(_local_metrics(pitch_text))
+    request = await _generation_request(pitch_text, target_audience)
+    response = await _call_model(request)
+    if response is None:
+        analysis = _fallback_analysis(request.fields)
+    else:
+        analysis = await _complete_analysis(pitch_text, target_audience, _parse_response(response), request.fields)
+    return _merge_local_metrics(analysis, await local)
+
+async def _generate_section(pitch_text: str, target_audience: str, section: str) -> dict:
+    if section in LOCAL_SECTIONS:
+        analysis = await _local_metrics(pitch_text)
+        analysis.update(used_fallback=False, fallback_fields=[], sections=[section])
+        return analysis
+    fields = ANALYSIS_SECTIONS[section]
+    request = await _fields_request(pitch_text, target_audience, fields, f"section:{section}")
+    async with section_slots:
+        response = await _call_model(request)
+    if response is None:
+        return _fallback_analysis(fields)
+    return await _complete_analysis(pitch_text, target_audience, _parse_response(response), fields)
+
+async def _section_result(pitch_text: str, target_audience: str, section: str, full: dict, bypass_cache: bool):
+    if section in LOCAL_SECTIONS:
+        # Cheaper to recompute than to look up
+        return section, await _generate_section(pitch_text, target_audience, section)
+    if full is not None and section in full.get("sections", ANALYSIS_SECTIONS):
+        return section, {field: full[field] for field in ANALYSIS_SECTIONS[section]}
+
+    cache_key = _cache_key(pitch_text, target_audience, section)
+    if not bypass_cache:
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            return section, cached
+
+    async def generate_and_store():
+        data = await _generate_section(pitch_text, target_audience, section)
+        if not data["used_fallback"]:
+            await analysis_cache.set(cache_key, data)
+        return data
+
+    async def coalesced():
+        return await analysis_leases.do(cache_key, generate_and_store, lambda: analysis_cache.get(cache_key))
+
+    return section, copy.deepcopy(await analysis_flights.do(cache_key, coalesced))
+
+async def iter_pitch_sections(pitch_text: str, target_audience: str, sections: list, bypass_cache: bool = False):
+    """
+    Generates the requested sections as concurrent, smaller model calls and yields
+    (section, fields, fallback_fields) in completion order. Sections are cached individually and
+    served from a cached full analysis when one exists.
+    """
+    full = None
+    if bypass_cache:
+        analysis_cache.record_bypass()
+    else:
+        full = await analysis_cache.get(_cache_key(pitch_text, target_audience))
+
+    tasks = [
+        asyncio.ensure_future(_section_result(pitch_text, target_audience, section, full, bypass_cache))
+        for section in sections
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            section, data = await next_done
+            yield section, {
+                field: value for field, value in data.items()
+                if field not in ("used_fallback", "fallback_fields", "sections")
+            }, data.get("fallback_fields", [])
+    finally:
+        for task in tasks:
+            task.cancel()
 
-    raise HTTPException(status_code=500, detail="Failed to analyze pitch.")
+async def analyze_pitch_sections(pitch_text: str, target_audience: str, sections: list, bypass_cache: bool = False) -> dict:
+    """
+    Returns an analysis containing only the requested sections, merged into one document.
+    """
+    analysis = {"used_fallback": False, "fallback_fields": [], "sections": []}
+    async for section, data, fallback_fields in iter_pitch_sections(pitch_text, target_audience, sections, bypass_cache):
+        analysis.update(data)
+        analysis["fallback_fields"].extend(fallback_fields)
+    analysis["used_fallback"] = bool(analysis["fallback_fields"])
+    analysis["sections"] = [section for section in ANALYSIS_SECTIONS if section in sections]
+    return analysis
 
 # Mock Data for Fallback/Demo Mode
 MOCK_ANALYSIS_RESULT = {
@@ -0,0 +1,373 @@
+import os
+import re
+import json
+import asyncio
+import zlib
+import logging
+from datetime import datetime
+from bson import Binary
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from database import analyses_collection
+from schemas import ANALYSIS_SECTIONS
+from ai_service import analyze_pitch_sections
+from text_metrics import METRICS_VERSION
+from progress import record_analyses
+from revisions import (
+    REVISION_REUSE_ENABLED, REVISION_MIN_RESEMBLANCE, REVISION_MIN_SIMILARITY, REVISION_CANDIDATES,
+    minhash_sketch, resemblance, pitch_diff, revision_stats,
+)
+
+logger = logging.getLogger(__name__)
+
+# Characters of the original pitch kept inline for history listings
+PITCH_PREVIEW_CHARS = 200
+
+# Fields read for history listings; the heavy generated payload is never fetched
+SUMMARY_PROJECTION = {
+    "created_at": 1,
+    "pitch_preview": 1,
+    "analysis.overall_score": 1,
+    "analysis.scores": 1,
+    "version": 1,
+}
+
+# Storage Configuration
+ANALYSIS_COMPRESSION_LEVEL = int(os.getenv("ANALYSIS_COMPRESSION_LEVEL", "6"))
+
+# Version 2 moves the heavy text fields into zlib-compressed `blobs`; the scoring summary stays inline.
+# Documents without storage_version keep every field inline and are read as they are.
+STORAGE_VERSION = 2
+COMPRESSED_ANALYSIS_FIELDS = ("improved_pitch", "slides", "summaries")
+COMPRESSED_FIELDS = ("original_pitch",) + COMPRESSED_ANALYSIS_FIELDS
+
+# Leading byte of every blob, so another codec can be introduced without a migration
+CODEC_ZLIB = b"z"
+
+
+def compress_value(value) -> Binary:
+    payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    return Binary(CODEC_ZLIB + zlib.compress(payload, ANALYSIS_COMPRESSION_LEVEL))
+
+def decompress_value(blob: bytes):
+    codec, payload = bytes(blob[:1]), blob[1:]
+    if codec != CODEC_ZLIB:
+        raise ValueError(f"Unknown analysis blob codec {codec!r}")
+    return json.loads(zlib.decompress(payload))
+
+def _pack_field(field: str) -> str:
+    return f"blobs.{field}"
+
+def _analysis_path(field: str) -> str:
+    return field if field == "original_pitch" else f"analysis.{field}"
+
+def analysis_projection(fields: list = None):
+    """
+    Mongo projection for reading `fields` (AnalysisResult field names or original_pitch)
+    of both storage layouts. None reads the whole document.
+    """
+    if not fields:
+        return None
+    projection = {"user_id": 1, "created_at": 1, "storage_version": 1, "version": 1, "target_audience": 1, "analysis.sections": 1}
+    for field in fields:
+        projection[_analysis_path(field)] = 1
+        if field in COMPRESSED_FIELDS:
+            projection[_pack_field(field)] = 1
+    return projection
+
+def unpack_document(document: dict) -> dict:
+    """
+    Restores compressed fields of a stored document in place, so callers always see the
+    inline layout. Legacy documents pass through unchanged.
+    """
+    blobs = document.pop("blobs", None) or {}
+    document.setdefault("analysis", {})
+    for field, blob in blobs.items():
+        value = decompress_value(blob)
+        if field == "original_pitch":
+            document["original_pitch"] = value
+        else:
+            document["analysis"][field] = value
+    return document
+
+
+def build_analysis_document(user_id: str, pitch_text: str, analysis_data: dict, target_audience: str = "General Investor") -> dict:
+    """
+    Builds the document stored in analyses_collection for a finished analysis.
+    """
+    analysis = {field: value for field, value in analysis_data.items() if field not in COMPRESSED_ANALYSIS_FIELDS}
+    if "confidence_score" in analysis:
+        analysis["metrics_version"] = METRICS_VERSION
+    blobs = {"original_pitch": compress_value(pitch_text)}
+    for field in COMPRESSED_ANALYSIS_FIELDS:
+        if field in analysis_data:
+            blobs[field] = compress_value(analysis_data[field])
+    return {
+        "user_id": user_id,
+        "target_audience": target_audience,
+        "pitch_preview": pitch_text[:PITCH_PREVIEW_CHARS],
+        "analysis": analysis,
+        "blobs": blobs,
+        "storage_version": STORAGE_VERSION,
+        # Indexed with user_id to find the user's earlier versions of this pitch
+        "minhash": minhash_sketch(pitch_text),
+        # Bumped whenever missing sections are filled in later
+        "version": 1,
+        "created_at": datetime.utcnow()
+    }
+
+def storage_update(document: dict, values: dict) -> dict:
+    """
+    $set operations writing `values` (analysis field names or original_pitch) in the
+    layout `document` is stored in.
+    """
+    update = {}
+    for field, value in values.items():
+        if document.get("storage_version") == STORAGE_VERSION and field in COMPRESSED_FIELDS:
+            update[_pack_field(field)] = compress_value(value)
+        else:
+            update[_analysis_path(field)] = value
+    return update
+
+def _owned(analysis_id, user_id: str = None) -> dict:
+    query = {"_id": analysis_id}
+    if user_id is not None:
+        query["user_id"] = user_id
+    return query
+
+async def get_analysis_document(analysis_id, fields: list = None, sections: list = None, fill: bool = True, user_id: str = None):
+    """
+    Reads a stored analysis, restricted to `fields` when given. With fill, the sections
+    it needs that were skipped when it was created are generated first. Returns None if
+    the analysis does not exist or, with user_id, belongs to another user.
+    """
+    document = await analyses_collection.find_one(_owned(analysis_id, user_id), analysis_projection(fields))
+    if document is None:
+        return None
+    if not fill:
+        return unpack_document(document)
+    sections = required_sections(fields, sections)
+    if sections == []:
+        return unpack_document(document)
+    return unpack_document(await fill_missing_sections(document, sections, fields))
+
+async def get_analysis_revision(analysis_id, user_id: str = None):
+    """
+    Reads just what decides whether a cached copy of an analysis is still current, and
+    which sections a read would have to generate.
+    """
+    return await analyses_collection.find_one(_owned(analysis_id, user_id), {"version": 1, "analysis.sections": 1})
+
+def required_sections(fields: list = None, sections: list = None):
+    """
+    Sections a read of `fields` needs present: the explicit list if given, else the
+    sections producing the requested fields. None means all sections.
+    """
+    if sections is not None or not fields:
+        return sections
+    return [name for name, names in ANALYSIS_SECTIONS.items() if set(names) & set(fields)]
+
+async def save_analysis(user_id: str, pitch_text: str, analysis_data: dict, target_audience: str = "General Investor") -> dict:
+    """
+    Persists an analysis, adds it to the user's progress rollup and returns the document
+    with its string id attached.
+    """
+    document = build_analysis_document(user_id, pitch_text, analysis_data, target_audience)
+    result = await analyses_collection.insert_one(document)
+    document["id"] = str(result.inserted_id)
+    await record_analyses(user_id, [document])
+    return unpack_document(document)
+
+async def save_analyses(documents: list) -> list:
+    """
+    Persists several analyses with one unordered insert_many. Returns one entry per
+    document: None when it was saved (its string id is attached), else the error message.
+    """
+    errors = [None] * len(documents)
+    try:
+        await analyses_collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            errors[write_error["index"]] = "Failed to save analysis."
+    except Exception as e:
+        logger.error(f"Batch insert of {len(documents)} analyses failed: {e}")
+        errors = ["Failed to save analysis."] * len(documents)
+
+    saved_by_user = {}
+    for document, error in zip(documents, errors):
+        if error is None:
+            document["id"] = str(document["_id"])
+            unpack_document(document)
+            saved_by_user.setdefault(document["user_id"], []).append(document)
+    for user_id, saved in saved_by_user.items():
+        await record_analyses(user_id, saved)
+    return errors
+
+async def list_analysis_summaries(user_id: str, limit: int, after=None, search=None) -> list:
+    """
+    Returns up to `limit` lightweight summaries for a user, newest first, starting after
+    the (created_at, _id) position `after`. `search` keeps analyses whose pitch preview or
+    target audience contains it, ignoring case. Uses the (user_id, created_at, _id) index.
+    """
+    query, conditions = {"user_id": user_id}, []
+    if after:
+        created_at, last_id = after
+        conditions.append({"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+        ]})
+    if search:
+        pattern = {"$regex": re.escape(search), "$options": "i"}
+        # Documents written before pitch_preview existed keep the pitch uncompressed
+        conditions.append({"$or": [
+            {"pitch_preview": pattern}, {"target_audience": pattern}, {"original_pitch": pattern},
+        ]})
+    if conditions:
+        query["$and"] = conditions
+
+    cursor = analyses_collection.find(query, SUMMARY_PROJECTION).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).limit(limit)
+    documents = await cursor.to_list(length=limit)
+
+    # Documents written before pitch_preview existed need one extra narrow read
+    legacy_ids = [doc["_id"] for doc in documents if "pitch_preview" not in doc]
+    if legacy_ids:
+        previews = {}
+        async for doc in analyses_collection.find({"_id": {"$in": legacy_ids}}, {"original_pitch": 1}):
+            previews[doc["_id"]] = doc.get("original_pitch", "")[:PITCH_PREVIEW_CHARS]
+        for doc in documents:
+            if "pitch_preview" not in doc:
+                doc["pitch_preview"] = previews.get(doc["_id"], "")
+
+    summaries = []
+    for doc in documents:
+        analysis = doc.get("analysis", {})
+        summaries.append({
+            "id": str(doc["_id"]),
+            "created_at": doc["created_at"],
+            "overall_score": analysis.get("overall_score", 0.0),
+            "scores": analysis.get("scores", {}),
+            "pitch_preview": doc["pitch_preview"],
+            # Documents written before versioning count as revision 0
+            "version": doc.get("version", 0),
+        })
+    return summaries
+
+async def find_revision_base(user_id: str, pitch_text: str, target_audience: str):
+    """
+    Looks for the user's analysis of an earlier version of this pitch that a revision can
+    be derived from: a complete, fallback-free analysis for the same audience whose
+    pitch resembles this one (MinHash sketches, via the (user_id, minhash) index) and
+    passes a word-level diff. Returns {id, analysis, diff} or None.
+    """
+    if not REVISION_REUSE_ENABLED:
+        return None
+    sketch = minhash_sketch(pitch_text)
+    candidates = await analyses_collection.find(
+        {"user_id": user_id, "minhash": {"$in": sketch}, "target_audience": target_audience},
+        {"minhash": 1, "created_at": 1, "analysis.sections": 1, "analysis.used_fallback": 1},
+    ).sort("created_at", -1).limit(REVISION_CANDIDATES).to_list(length=REVISION_CANDIDATES)
+    candidates = [
+        candidate for candidate in candidates
+        if not missing_sections(candidate) and not candidate.get("analysis", {}).get("used_fallback")
+    ]
+    if not candidates:
+        revision_stats.record("no_candidate")
+        return None
+
+    # Newest first, so ties go to the latest version
+    best = max(candidates, key=lambda candidate: resemblance(sketch, candidate["minhash"]))
+    score = resemblance(sketch, best["minhash"])
+    if score < REVISION_MIN_RESEMBLANCE:
+        revision_stats.record("low_resemblance", resemblance=score)
+        return None
+
+    document = await get_analysis_document(best["_id"], fill=False)
+    if document is None:
+        revision_stats.record("no_candidate")
+        return None
+    diff = await asyncio.to_thread(pitch_diff, document.get("original_pitch", ""), pitch_text)
+    if diff["changed_words"] == 0:
+        # Same wording: the analysis cache serves it without a model call
+        revision_stats.record("identical", resemblance=score, similarity=diff["similarity"])
+        return None
+    if diff["similarity"] < REVISION_MIN_SIMILARITY:
+        revision_stats.record("low_similarity", resemblance=score, similarity=diff["similarity"])
+        return None
+
+    revision_stats.record("reused", resemblance=score, similarity=diff["similarity"])
+    return {"id": str(best["_id"]), "analysis": document["analysis"], "diff": diff}
+
+def missing_sections(document: dict, sections: list = None) -> list:
+    # Documents without a sections list predate sectioned analyses and are complete
+    present = document.get("analysis", {}).get("sections", list(ANALYSIS_SECTIONS))
+    wanted = list(ANALYSIS_SECTIONS) if sections is None else sections
+    return [section for section in ANALYSIS_SECTIONS if section in wanted and section not in present]
+
+async def _load_pitch(document: dict) -> str:
+    if "original_pitch" in document:
+        return document["original_pitch"]
+    if "original_pitch" in document.get("blobs", {}):
+        return decompress_value(document["blobs"]["original_pitch"])
+    stored = await analyses_collection.find_one(
+        {"_id": document["_id"]}, {"original_pitch": 1, "blobs.original_pitch": 1}
+    )
+    return unpack_document(stored).get("original_pitch", "")
+
+def _overlay(document: dict, values: dict, fields: list = None) -> dict:
+    # Serves generated values with this read without storing them
+    analysis = document.setdefault("analysis", {})
+    for field, value in values.items():
+        if fields is None or field in fields:
+            analysis[field] = value
+    analysis["used_fallback"] = True
+    analysis["fallback_fields"] = list(dict.fromkeys((analysis.get("fallback_fields") or []) + list(values)))
+    return document
+
+async def fill_missing_sections(document: dict, sections: list = None, fields: list = None) -> dict:
+    """
+    Generates the requested sections a stored (still packed) analysis does not have yet
+    and persists them. Returns the updated document restricted to `fields`; concurrent
+    fills of the same section are coalesced by the generation layer, and only the first
+    write lands, so the progress rollup counts each section once. Sections the model
+    fell back on are returned but not stored, so a later read generates them again.
+    """
+    missing = missing_sections(document, sections)
+    if not missing:
+        return document
+
+    generated = await analyze_pitch_sections(
+        await _load_pitch(document), document.get("target_audience") or "General Investor", missing
+    )
+    fallback_fields = set(generated["fallback_fields"])
+    stored = [section for section in missing if not fallback_fields & set(ANALYSIS_SECTIONS[section])]
+    stored_fields = [field for section in stored for field in ANALYSIS_SECTIONS[section] if field in generated]
+    failed = [section for section in missing if section not in stored]
+    fallback = {field: generated[field] for section in failed for field in ANALYSIS_SECTIONS[section] if field in generated}
+    if failed:
+        logger.warning(f"Not storing fallback sections {failed} of analysis {document['_id']}.")
+    if not stored:
+        return _overlay(document, fallback, fields)
+
+    values = {field: generated[field] for field in stored_fields}
+    if "confidence_score" in values:
+        values["metrics_version"] = METRICS_VERSION
+    updated = await analyses_collection.find_one_and_update(
+        {"_id": document["_id"], "analysis.sections": {"$nin": stored}},
+        {
+            "$set": storage_update(document, values),
+            "$addToSet": {"analysis.sections": {"$each": stored}},
+            "$inc": {"version": 1},
+        },
+        projection=analysis_projection(fields),
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated is None:
+        # Another read stored some of these sections first: continue from its result
+        current = await analyses_collection.find_one({"_id": document["_id"]}, analysis_projection(fields))
+        return await fill_missing_sections(current, sections, fields) if current else document
+    logger.info(f"Filled sections {stored} of analysis {document['_id']}.")
+    if updated.get("user_id"):
+        await record_analyses(updated["user_id"], [{"analysis": values, "created_at": updated["created_at"]}], new=False)
+    return _overlay(updated, fallback, fields) if fallback else updated
@@ -1,19 +1,41 @@
 import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi import HTTPException
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from dotenv import load_dotenv
+from cache import TTLCache
+from metrics import PASSWORD_HASH_DURATION
 
 load_dotenv()
 
 import bcrypt
 
+logger = logging.getLogger(__name__)
+
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7 # 1 week
 
+# Principal Cache Configuration
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "1024"))
+# Each worker caches on its own, so role changes and revoked tokens reach all workers within this
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+
+DEFAULT_ROLE = "user"
+ADMIN_ROLE = "admin"
+
+# Password Hashing Configuration
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "32"))
+
 def verify_password(plain_password: str, hashed_password: str):
     try:
         return bcrypt.checkpw(
@@ -21,15 +43,115 @@ def verify_password(plain_password: str, hashed_password: str):
             hashed_password.encode('utf-8')
         )
     except Exception as e:
-        print(f"Bcrypt verification failed: {e}")
+        logger.warning(f"Bcrypt verification failed: {e}")
         return False
 
 def get_password_hash(password: str):
     # bcrypt.hashpw expects bytes
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    True when a stored hash was made with a different cost factor than BCRYPT_ROUNDS.
+    """
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool so hashing never blocks the event loop.
+    bcrypt releases the GIL, so threads give real parallelism here. Calls beyond the
+    workers plus the queue limit fail fast with 503 instead of piling up.
+    """
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.capacity = workers + queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self.calls = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, fn, *args):
+        if self._pending >= self.capacity:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Authentication service is busy, please retry.",
+                headers={"Retry-After": "1"},
+            )
+
+        def timed():
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started, time.perf_counter()
+
+        self._pending += 1
+        submitted = time.perf_counter()
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self._pending -= 1
+
+        wait, latency = started - submitted, finished - started
+        PASSWORD_HASH_DURATION.observe(latency)
+        self.calls += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self._pending,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "latency_ms_avg": round(self.total_latency / self.calls * 1000, 2) if self.calls else 0.0,
+            "latency_ms_max": round(self.max_latency * 1000, 2),
+            "queue_wait_ms_avg": round(self.total_wait / self.calls * 1000, 2) if self.calls else 0.0,
+            "queue_wait_ms_max": round(self.max_wait * 1000, 2),
+        }
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run(get_password_hash, password)
+
+# Authenticated users keyed by token subject, so most requests skip the users lookup
+principal_cache = TTLCache(PRINCIPAL_CACHE_MAX_ENTRIES, PRINCIPAL_CACHE_TTL_SECONDS)
+
+def invalidate_principal(email: str):
+    """
+    Drops a cached principal in this worker. Other workers refresh theirs within
+    PRINCIPAL_CACHE_TTL_SECONDS; changes that must reach them (role changes, revoking
+    tokens) also increment the user's token_version.
+    """
+    principal_cache.invalidate(email)
+
+def build_token_claims(user: dict) -> dict:
+    # The role is read from the user document, so role changes apply without a new token
+    return {
+        "sub": user["email"],
+        "uid": str(user["_id"]),
+        "ver": user.get("token_version", 0),
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
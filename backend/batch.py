@@ -0,0 +1,131 @@
+import os
+import json
+import asyncio
+import logging
+from pydantic import ValidationError
+from schemas import PitchRequest, AnalysisResponse
+from ai_service import analyze_pitch_with_gemini, analyze_pitch_sections
+from analysis_store import build_analysis_document, save_analyses
+
+logger = logging.getLogger(__name__)
+
+# Batch Analysis Configuration
+ANALYSIS_BATCH_MAX_ITEMS = int(os.getenv("ANALYSIS_BATCH_MAX_ITEMS", "100"))
+ANALYSIS_BATCH_CONCURRENCY = int(os.getenv("ANALYSIS_BATCH_CONCURRENCY", "4"))
+ANALYSIS_BATCH_WRITE_SIZE = int(os.getenv("ANALYSIS_BATCH_WRITE_SIZE", "10"))
+ANALYSIS_BATCH_FLUSH_SECONDS = float(os.getenv("ANALYSIS_BATCH_FLUSH_SECONDS", "0.5"))
+
+
+class BatchFormatError(ValueError):
+    pass
+
+
+def parse_batch_items(body: bytes, ndjson: bool) -> list:
+    """
+    Parses a JSON array or NDJSON body into raw items. Only a malformed body as a whole
+    is an error; items are validated one by one by validate_batch_items.
+    """
+    try:
+        text = body.decode("utf-8")
+        if ndjson:
+            items = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            items = json.loads(text)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise BatchFormatError(f"Malformed batch body: {e}")
+
+    if not isinstance(items, list):
+        raise BatchFormatError("Batch body must be a JSON array or NDJSON lines.")
+    if not items:
+        raise BatchFormatError("Batch is empty.")
+    if len(items) > ANALYSIS_BATCH_MAX_ITEMS:
+        raise BatchFormatError(f"Batch has {len(items)} items, the limit is {ANALYSIS_BATCH_MAX_ITEMS}.")
+    return items
+
+def validate_batch_items(items: list) -> list:
+    """
+    Validates raw items one by one: each becomes a PitchRequest, or the list of its
+    validation errors.
+    """
+    validated = []
+    for raw in items:
+        try:
+            validated.append(PitchRequest.model_validate(raw))
+        except ValidationError as e:
+            validated.append(e.errors(include_url=False, include_context=False))
+    return validated
+
+def _ndjson(data: dict) -> str:
+    return json.dumps(data, default=str) + "\n"
+
+def _error_line(index: int, detail) -> str:
+    return _ndjson({"index": index, "status": "error", "detail": detail})
+
+async def run_analysis_batch(user_id: str, items: list, sections: list = None):
+    """
+    Analyzes items (as returned by validate_batch_items) with at most
+    ANALYSIS_BATCH_CONCURRENCY in flight and yields one NDJSON line per item in
+    completion order, tagged with the item's index. Finished analyses are persisted in
+    insert_many batches; a failing item never aborts the batch. A final line summarizes
+    the counts.
+    """
+    window = asyncio.Semaphore(ANALYSIS_BATCH_CONCURRENCY)
+    succeeded = failed = 0
+
+    async def analyze(index: int, item: PitchRequest):
+        async with window:
+            if sections:
+                analysis = await analyze_pitch_sections(item.pitch_text, item.target_audience, sections)
+            else:
+                analysis = await analyze_pitch_with_gemini(item.pitch_text, item.target_audience)
+        return index, build_analysis_document(user_id, item.pitch_text, analysis, item.target_audience)
+
+    tasks = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, PitchRequest):
+            failed += 1
+            yield _error_line(index, item)
+            continue
+        tasks[asyncio.ensure_future(analyze(index, item))] = index
+
+    pending = set(tasks)
+    buffered = []
+    loop = asyncio.get_running_loop()
+    flush_at = None
+    try:
+        while pending or buffered:
+            timeout = None if flush_at is None else max(0.0, flush_at - loop.time())
+            if pending:
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                done = set()
+
+            for task in done:
+                try:
+                    buffered.append(task.result())
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"Batch item {tasks[task]} failed: {e}")
+                    yield _error_line(tasks[task], str(getattr(e, "detail", e)))
+            if buffered and flush_at is None:
+                flush_at = loop.time() + ANALYSIS_BATCH_FLUSH_SECONDS
+
+            # Write when the buffer is full, the oldest result waited long enough or nothing is left
+            if buffered and (len(buffered) >= ANALYSIS_BATCH_WRITE_SIZE or loop.time() >= flush_at or not pending):
+                documents = [document for _, document in buffered]
+                errors = await save_analyses(documents)
+                for (index, document), error in zip(buffered, errors):
+                    if error:
+                        failed += 1
+                        yield _error_line(index, error)
+                    else:
+                        succeeded += 1
+                        result = AnalysisResponse.model_validate(document).model_dump(mode="json")
+                        yield _ndjson({"index": index, "status": "ok", "result": result})
+                buffered, flush_at = [], None
+    finally:
+        # The client went away: stop the remaining analyses
+        for task in pending:
+            task.cancel()
+
+    yield _ndjson({"done": True, "total": len(items), "succeeded": succeeded, "failed": failed})
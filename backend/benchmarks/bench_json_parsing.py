@@ -0,0 +1,133 @@
+"""
+Micro-benchmark for the model-output JSON parsing pipeline.
+
+Compares the legacy path (clean_json_string + json.loads, as analyze_pitch_with_gemini
+used to run it) against the tiered parse_model_json over a corpus of well-formed,
+fenced, truncated and malformed model outputs of up to ~15k characters.
+
+The built-in corpus is synthesized from the local provider's analyses. Captured real
+model responses can be added with --corpus DIR (every *.txt / *.json file is a sample).
+
+Usage (from backend/):
+    python benchmarks/bench_json_parsing.py
+    python benchmarks/bench_json_parsing.py --corpus captured_responses/ --repeat 500
+"""
+import os
+import sys
+import json
+import glob
+import timeit
+import argparse
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from ai_providers import build_local_analysis
+from utils import clean_json_string, parse_model_json, json_parse_stats
+
+PARAGRAPH = (
+    "Our platform turns messy clinical paperwork into structured records in minutes. "
+    "We already serve 40 clinics, grew revenue 18% month over month, and ask you to join our $1.5M round. "
+)
+
+
+def synthesize_corpus() -> dict:
+    """
+    Builds named samples at roughly 2k, 6k and 15k characters in several failure modes.
+    """
+    corpus = {}
+    for size, repeats in (("4k", 1), ("6k", 12), ("15k", 55)):
+        analysis = build_local_analysis(PARAGRAPH * repeats, "Investor")
+        analysis["improved_pitch"] = PARAGRAPH * repeats
+        valid = json.dumps(analysis, indent=2)
+        corpus[f"valid_{size}"] = valid
+        corpus[f"fenced_preamble_{size}"] = f"Here is the analysis you asked for:\n```json\n{valid}\n```"
+        corpus[f"truncated_90_{size}"] = valid[: int(len(valid) * 0.9)]
+        corpus[f"truncated_50_{size}"] = valid[: len(valid) // 2]
+        corpus[f"trailing_commas_{size}"] = valid.replace("\n  ]", ",\n  ]").replace("\n  }", ",\n  }")
+        corpus[f"unescaped_quote_{size}"] = valid.replace("clinical paperwork", 'clinical "paperwork', 1)
+    return corpus
+
+
+def load_corpus(directory: str) -> dict:
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.txt")) + glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            corpus[os.path.basename(path)] = f.read()
+    return corpus
+
+
+def legacy_parse(text: str):
+    return json.loads(clean_json_string(text))
+
+
+def tiered_parse(text: str):
+    return parse_model_json(text)
+
+
+def recovered_fields(fn, text: str) -> int:
+    try:
+        return len(fn(text))
+    except ValueError:
+        return 0
+
+
+def time_call(fn, text: str, repeat: int) -> float:
+    """
+    Median microseconds per call over `repeat` runs; failures are timed too.
+    """
+    def call():
+        try:
+            fn(text)
+        except ValueError:
+            pass
+    runs = timeit.repeat(call, number=1, repeat=repeat)
+    return statistics.median(runs) * 1_000_000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of captured model outputs to include.")
+    parser.add_argument("--repeat", type=int, default=200, help="Timed runs per sample and parser.")
+    parser.add_argument("--output", help="Write the JSON result to this file.")
+    args = parser.parse_args(argv)
+
+    corpus = synthesize_corpus()
+    if args.corpus:
+        corpus.update(load_corpus(args.corpus))
+
+    results = {}
+    print(f"{'sample':<28}{'chars':>8}{'legacy us':>12}{'tiered us':>12}{'speedup':>9}{'fields':>9}  tier")
+    for name, text in corpus.items():
+        before = dict(json_parse_stats.counts)
+        try:
+            parse_model_json(text)
+        except ValueError:
+            pass
+        tier = next(t for t in json_parse_stats.TIERS if json_parse_stats.counts[t] != before[t])
+
+        legacy_us = time_call(legacy_parse, text, args.repeat)
+        tiered_us = time_call(tiered_parse, text, args.repeat)
+        results[name] = {
+            "chars": len(text),
+            "tier": tier,
+            "legacy_us": round(legacy_us, 1),
+            "tiered_us": round(tiered_us, 1),
+            "speedup": round(legacy_us / tiered_us, 2) if tiered_us else 0.0,
+            # Top-level fields recovered, so speed is never bought with lost data
+            "legacy_fields": recovered_fields(legacy_parse, text),
+            "tiered_fields": recovered_fields(tiered_parse, text),
+        }
+        row = results[name]
+        fields = f"{row['legacy_fields']}/{row['tiered_fields']}"
+        print(f"{name:<28}{row['chars']:>8}{row['legacy_us']:>12}{row['tiered_us']:>12}{row['speedup']:>8}x{fields:>9}  {tier}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
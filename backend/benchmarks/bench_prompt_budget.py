@@ -0,0 +1,100 @@
+"""
+Benchmark for prompt budgeting (prompt_budget.py).
+
+For pitches of roughly 1k, 5k, 10k and 15k characters (the PitchRequest maximum),
+reports the estimated tokens of the pitch before and after compaction, the stages that
+ran and their time, and the output plan of the full-analysis prompt: expected output
+tokens, max_output_tokens, predicted generation time and dropped sections. The deck
+sample repeats slide headers and footers like pitches pasted from exported slides.
+
+Usage (from backend/):
+    python benchmarks/bench_prompt_budget.py
+    python benchmarks/bench_prompt_budget.py --budget 1500 --output benchmarks/results/prompt_budget.json
+"""
+import os
+import sys
+import json
+import timeit
+import random
+import argparse
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from prompt_budget import compact_pitch, plan_output, FIELD_OUTPUT_TOKENS, PROMPT_PITCH_TOKEN_BUDGET
+
+# The prompt templates live in ai_service, which needs a database; this mirrors their size
+PROMPT_OVERHEAD = "x" * 2400
+GENERATED_FIELDS = list(FIELD_OUTPUT_TOKENS)
+SENTENCES = [
+    "Small clinics lose hours every week reconciling paper records.",
+    "Our platform turns scanned forms into structured data in minutes.",
+    "We already serve {n} clinics and grew revenue {p}% month over month.",
+    "The market for clinic software is worth ${b} billion.",
+    "Unlike incumbents, we price per seat at ${s} per month.",
+    "Our team previously built health record systems used by {n} hospitals.",
+    "Staff in {city} spend {h} hours a week on insurance claims.",
+    "Pilots in {city} cut billing errors by {p}% within a quarter.",
+]
+CITIES = ["Austin", "Leeds", "Pune", "Lagos", "Lyon", "Osaka", "Denver", "Porto"]
+
+
+def sample_pitch(chars: int, deck: bool, rng: random.Random) -> str:
+    parts, page = [], 1
+    while sum(len(part) for part in parts) < chars:
+        body = " ".join(
+            rng.choice(SENTENCES).format(
+                n=rng.randint(5, 90), p=rng.randint(5, 40), b=rng.randint(2, 9), s=rng.randint(20, 90),
+                h=rng.randint(2, 12), city=rng.choice(CITIES),
+            )
+            for _ in range(4)
+        )
+        parts.append(f"Acme Health  |  Confidential\n\n{body}\n\nSlide {page} of 30\n" if deck else f"{body} ")
+        page += 1
+    return "".join(parts)[:chars]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50, help="Timed runs per sample.")
+    parser.add_argument("--budget", type=int, default=PROMPT_PITCH_TOKEN_BUDGET, help="Pitch token budget.")
+    parser.add_argument("--output", help="Write the JSON result to this file.")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(7)
+    results = {}
+    print(f"{'sample':>12}{'tokens':>8}{'->':>7}{'ratio':>7}{'ms':>7}{'output':>8}{'max out':>9}{'est s':>7}  stages / dropped")
+    for deck in (False, True):
+        for chars in (1000, 5000, 10000, 15000):
+            text = sample_pitch(chars, deck, rng)
+            compaction = compact_pitch.__wrapped__(text, args.budget)
+            ms = statistics.median(timeit.repeat(lambda: compact_pitch.__wrapped__(text, args.budget), number=1, repeat=args.repeat)) * 1000
+            budget = plan_output(PROMPT_OVERHEAD + compaction.text, compaction.tokens, GENERATED_FIELDS, optional=True)
+            name = f"{'deck' if deck else 'prose'}-{chars // 1000}k"
+            results[name] = {
+                "original_tokens": compaction.original_tokens,
+                "compacted_tokens": compaction.tokens,
+                "compaction_ratio": compaction.ratio,
+                "stages": list(compaction.stages),
+                "compaction_ms": round(ms, 3),
+                "prompt_tokens": budget.prompt_tokens,
+                "expected_output_tokens": budget.output_tokens,
+                "max_output_tokens": budget.max_output_tokens,
+                "estimated_seconds": budget.estimated_seconds,
+                "dropped_sections": budget.dropped_sections,
+            }
+            print(f"{name:>12}{compaction.original_tokens:>8}{compaction.tokens:>7}{compaction.ratio:>7.2f}{ms:>7.2f}"
+                  f"{budget.output_tokens:>8}{budget.max_output_tokens:>9}{budget.estimated_seconds:>7.1f}"
+                  f"  {','.join(compaction.stages) or '-'} / {','.join(budget.dropped_sections) or '-'}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
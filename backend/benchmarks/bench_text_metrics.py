@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for the local text-metrics engine (text_metrics.py).
+
+Times analyze_text on pitches of roughly 1k, 5k and 15k characters (the PitchRequest
+maximum) and compares the token-trie filler matcher with the straightforward
+alternative of one regex scan per lexicon phrase.
+
+Usage (from backend/):
+    python benchmarks/bench_text_metrics.py
+    python benchmarks/bench_text_metrics.py --repeat 500 --output benchmarks/results/text_metrics.json
+"""
+import os
+import re
+import sys
+import json
+import timeit
+import argparse
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from text_metrics import analyze_text, filler_matcher, tokenize, DEFAULT_FILLER_WORDS
+
+PARAGRAPH = (
+    "Um, so basically small clinics lose hours every week reconciling paper records, you know. "
+    "Our platform turns scanned forms into structured data in minutes, and I think it could maybe "
+    "become the standard. We already serve 40 clinics, grew revenue 18% month over month, and we "
+    "are raising a $1.5M seed round to expand to three new regions. "
+)
+
+PER_PHRASE_PATTERNS = [re.compile(rf"\b{re.escape(phrase)}\b") for phrase in DEFAULT_FILLER_WORDS]
+
+
+def per_phrase_regex_count(text: str) -> dict:
+    lowered = text.lower()
+    counts = {}
+    for phrase, pattern in zip(DEFAULT_FILLER_WORDS, PER_PHRASE_PATTERNS):
+        found = len(pattern.findall(lowered))
+        if found:
+            counts[phrase] = found
+    return counts
+
+
+def time_call(fn, repeat: int) -> tuple:
+    """
+    Median and p99 milliseconds per call over `repeat` runs.
+    """
+    runs = sorted(timeit.repeat(fn, number=1, repeat=repeat))
+    return statistics.median(runs) * 1000, runs[min(len(runs) - 1, int(len(runs) * 0.99))] * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Timed runs per sample.")
+    parser.add_argument("--output", help="Write the JSON result to this file.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'chars':>7}{'words':>7}{'metrics p50':>13}{'p99':>8}{'trie ms':>9}{'regex ms':>10}")
+    for chars in (1000, 5000, 15000):
+        text = (PARAGRAPH * (chars // len(PARAGRAPH) + 1))[:chars]
+        tokens = tokenize(text)
+        analyze_text(text)
+        p50, p99 = time_call(lambda: analyze_text(text), args.repeat)
+        trie_ms, _ = time_call(lambda: filler_matcher.count(tokenize(text)), args.repeat)
+        regex_ms, _ = time_call(lambda: per_phrase_regex_count(text), args.repeat)
+        results[chars] = {
+            "words": len(tokens),
+            "analyze_text_p50_ms": round(p50, 3),
+            "analyze_text_p99_ms": round(p99, 3),
+            "filler_trie_ms": round(trie_ms, 3),
+            "filler_per_phrase_regex_ms": round(regex_ms, 3),
+        }
+        print(f"{chars:>7}{len(tokens):>7}{p50:>13.2f}{p99:>8.2f}{trie_ms:>9.2f}{regex_ms:>10.2f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
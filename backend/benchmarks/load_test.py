@@ -0,0 +1,276 @@
+"""
+End-to-end load and latency benchmark for the FastAPI backend.
+
+Drives the real `main.app` in-process over an ASGI transport with N concurrent
+simulated users. Each user registers, logs in, analyzes pitches, lists their
+history and fetches an analysis. MongoDB is replaced by mongomock-motor and the
+model by the deterministic local AI provider, so no network is needed.
+
+Usage (from backend/):
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/load_test.py --users 50 --iterations 3 --output benchmarks/results/latest.json
+    python benchmarks/load_test.py --baseline benchmarks/results/baseline.json
+
+With --baseline the run is compared against a previous result file and the
+process exits with status 1 when a route's p95 latency or the overall
+throughput regresses by more than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import resource
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PITCH_SENTENCES = [
+    "Today small clinics basically lose hours every week reconciling paper records.",
+    "Our platform uses a lightweight model to turn scanned forms into structured data.",
+    "We already serve 40 clinics and grew revenue 18% month over month.",
+    "The architecture runs on-device so patient data never leaves the building.",
+    "We are raising $1.5M to expand to three new regions and we ask you to join us.",
+    "Competitors need six weeks of onboarding while we go live in a single afternoon.",
+    "Actually, the market is worth $12B and nobody has solved the last mile problem.",
+    "Our team built the data infrastructure at two unicorns before starting this company.",
+]
+
+
+def configure_environment(args):
+    """
+    Points the backend at in-memory stand-ins. Must run before the app is imported.
+    """
+    os.environ["MONGO_URI"] = "mongodb://benchmark.invalid:27017"
+    os.environ["AI_PROVIDER"] = "local"
+    os.environ["LOCAL_PROVIDER_LATENCY_MS"] = str(args.model_latency_ms)
+    os.environ["LOCAL_PROVIDER_JITTER_MS"] = str(args.model_jitter_ms)
+    os.environ["LOCAL_PROVIDER_SEED"] = str(args.seed)
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    sys.path.insert(0, BACKEND_DIR)
+
+    import motor.motor_asyncio
+    from mongomock_motor import AsyncMongoMockClient
+    motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50), 2),
+        "p95_ms": round(percentile(ordered, 95), 2),
+        "p99_ms": round(percentile(ordered, 99), 2),
+        "max_ms": round(ordered[-1], 2) if ordered else 0.0,
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client, route: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[route].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+
+async def sample_loop_lag(interval: float, samples: list, stop: asyncio.Event):
+    """
+    Measures how late the event loop wakes a sleeping task; blocking work shows up as lag.
+    """
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, (loop.time() - expected) * 1000))
+
+
+async def simulate_user(client, recorder: Recorder, user_index: int, args, rng: random.Random):
+    email = f"bench-user-{user_index}@example.com"
+    password = "benchmark-password"
+    await recorder.call(client, "POST /api/auth/register", "POST", "/api/auth/register",
+                        json={"email": email, "full_name": f"Bench User {user_index}", "password": password})
+    response = await recorder.call(client, "POST /api/auth/login", "POST", "/api/auth/login",
+                                   json={"email": email, "password": password})
+    if response.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    analysis_id = None
+    for iteration in range(args.iterations):
+        # A share of submissions repeat an earlier pitch, as practice-mode users do
+        if iteration and rng.random() < args.repeat_ratio:
+            variant = 0
+        else:
+            variant = iteration
+        sentences = rng.sample(PITCH_SENTENCES, k=4)
+        pitch = " ".join(sentences) if variant else " ".join(PITCH_SENTENCES[:4])
+        pitch = f"{pitch} (user {user_index}, draft {variant})"
+
+        response = await recorder.call(client, "POST /api/analyze", "POST", "/api/analyze",
+                                       json={"pitch_text": pitch, "target_audience": "Investor"}, headers=headers)
+        if response.status_code == 201:
+            analysis_id = response.json()["id"]
+
+        await recorder.call(client, "GET /api/my-analyses", "GET", "/api/my-analyses", headers=headers)
+        if analysis_id:
+            await recorder.call(client, "GET /api/analysis/{id}", "GET", f"/api/analysis/{analysis_id}", headers=headers)
+
+
+async def admin_headers(client) -> dict:
+    # /api/system/stats is admin-only, so the benchmark promotes an account of its own
+    from auth import ADMIN_ROLE
+    from database import users_collection
+
+    credentials = {"email": "bench-admin@example.com", "password": "benchmark-password"}
+    await client.post("/api/auth/register", json={**credentials, "full_name": "Bench Admin"})
+    await users_collection.update_one({"email": credentials["email"]}, {"$set": {"role": ADMIN_ROLE}})
+    response = await client.post("/api/auth/login", json=credentials)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_benchmark(args) -> dict:
+    import httpx
+    from main import app
+
+    recorder = Recorder()
+    lag_samples = []
+    stop = asyncio.Event()
+    rng = random.Random(args.seed)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+            lag_task = asyncio.create_task(sample_loop_lag(args.lag_interval_ms / 1000, lag_samples, stop))
+            started = time.perf_counter()
+            await asyncio.gather(*[
+                simulate_user(client, recorder, i, args, random.Random(rng.random())) for i in range(args.users)
+            ])
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await lag_task
+            system_stats = (await client.get("/api/system/stats", headers=await admin_headers(client))).json()
+
+    total_requests = sum(len(v) for v in recorder.latencies.values())
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+
+    return {
+        "config": {
+            "users": args.users,
+            "iterations": args.iterations,
+            "repeat_ratio": args.repeat_ratio,
+            "model_latency_ms": args.model_latency_ms,
+            "model_jitter_ms": args.model_jitter_ms,
+            "bcrypt_rounds": args.bcrypt_rounds,
+            "seed": args.seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "duration_s": round(elapsed, 3),
+        "total_requests": total_requests,
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0.0,
+        "routes": {route: {**summarize(samples), "errors": recorder.errors[route]}
+                   for route, samples in sorted(recorder.latencies.items())},
+        "event_loop_lag": summarize(lag_samples),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "system_stats": system_stats,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    """
+    Returns human-readable regressions of `result` against `baseline`. Latency changes
+    smaller than min_delta_ms are ignored so sub-millisecond routes do not flap.
+    """
+    regressions = []
+    base_rps, rps = baseline.get("throughput_rps", 0), result["throughput_rps"]
+    if base_rps and rps < base_rps * (1 - tolerance):
+        regressions.append(f"throughput {rps} rps < baseline {base_rps} rps")
+    for route, base in baseline.get("routes", {}).items():
+        current = result["routes"].get(route)
+        if not current:
+            regressions.append(f"{route}: missing from this run")
+            continue
+        p95_delta = current["p95_ms"] - base["p95_ms"]
+        if p95_delta > min_delta_ms and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {current['p95_ms']} ms > baseline {base['p95_ms']} ms")
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{route}: {current['errors']} errors (baseline {base.get('errors', 0)})")
+    return regressions
+
+
+def print_report(result: dict):
+    print(f"\n{result['total_requests']} requests in {result['duration_s']} s "
+          f"-> {result['throughput_rps']} req/s, peak RSS {result['peak_rss_mb']} MB")
+    print(f"{'route':<28}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>8}")
+    for route, stats in result["routes"].items():
+        print(f"{route:<28}{stats['count']:>7}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['errors']:>8}")
+    lag = result["event_loop_lag"]
+    print(f"event loop lag: p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="Concurrent simulated users.")
+    parser.add_argument("--iterations", type=int, default=3, help="Analyses submitted per user.")
+    parser.add_argument("--repeat-ratio", type=float, default=0.3, help="Share of resubmitted identical pitches.")
+    parser.add_argument("--model-latency-ms", type=float, default=300, help="Mean latency of the stubbed model.")
+    parser.add_argument("--model-jitter-ms", type=float, default=100, help="Uniform jitter of the stubbed model.")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="bcrypt cost factor used for the run.")
+    parser.add_argument("--lag-interval-ms", type=float, default=10, help="Event loop lag sampling interval.")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for pitches and model jitter.")
+    parser.add_argument("--output", help="Write the JSON result to this file.")
+    parser.add_argument("--baseline", help="Compare against this earlier result file.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%).")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="Ignore p95 increases smaller than this.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_environment(args)
+    result = asyncio.run(run_benchmark(args))
+    print_report(result)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+        print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
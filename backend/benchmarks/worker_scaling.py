@@ -0,0 +1,174 @@
+"""
+Multi-worker scaling benchmark for the gunicorn serving mode.
+
+Starts the backend with `gunicorn -c gunicorn.conf.py` at each requested worker count,
+waits for /ready and drives the same simulated users as load_test.py over real HTTP.
+Throughput per worker count shows how far CPU-bound work (bcrypt, JSON repair,
+serialization) scales past one event loop. The model is the deterministic local AI
+provider, but the workers share state through MongoDB, so a real server is required.
+
+Usage (from backend/):
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/worker_scaling.py --mongo-uri mongodb://localhost:27017/vakyaai_bench --workers 1,2,4
+    python benchmarks/worker_scaling.py --workers 1,2,4,8 --users 64 --output benchmarks/results/scaling.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+
+from load_test import BACKEND_DIR, Recorder, simulate_user, summarize
+
+READY_TIMEOUT_SECONDS = 60
+
+
+def server_environment(args, workers: int) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "MONGO_URI": args.mongo_uri,
+        "AI_PROVIDER": "local",
+        "LOCAL_PROVIDER_LATENCY_MS": str(args.model_latency_ms),
+        "LOCAL_PROVIDER_JITTER_MS": str(args.model_jitter_ms),
+        "LOCAL_PROVIDER_SEED": str(args.seed),
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "WEB_CONCURRENCY": str(workers),
+        "PORT": str(args.port),
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join("/tmp", f"vakyaai-bench-prometheus-{args.port}"),
+    })
+    return env
+
+
+async def wait_until_ready(client, process):
+    deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server not ready after {READY_TIMEOUT_SECONDS}s")
+
+
+async def run_level(args, workers: int) -> dict:
+    import httpx
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        cwd=BACKEND_DIR, env=server_environment(args, workers),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL if not args.verbose else None,
+    )
+    recorder = Recorder()
+    # Fresh accounts per level so earlier runs never turn registrations into conflicts
+    run_tag = uuid.uuid4().hex[:8]
+    rng = random.Random(args.seed)
+    try:
+        limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120, limits=limits) as client:
+            await wait_until_ready(client, process)
+            started = time.perf_counter()
+            await asyncio.gather(*[
+                simulate_user(client, recorder, f"{run_tag}-{i}", args, random.Random(rng.random()))
+                for i in range(args.users)
+            ])
+            elapsed = time.perf_counter() - started
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    total_requests = sum(len(v) for v in recorder.latencies.values())
+    return {
+        "workers": workers,
+        "duration_s": round(elapsed, 3),
+        "total_requests": total_requests,
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0.0,
+        "errors": sum(recorder.errors.values()),
+        "routes": {route: {**summarize(samples), "errors": recorder.errors[route]}
+                   for route, samples in sorted(recorder.latencies.items())},
+    }
+
+
+async def run_benchmark(args) -> dict:
+    levels = []
+    for workers in args.workers:
+        print(f"Running with {workers} worker(s)...")
+        levels.append(await run_level(args, workers))
+    return {
+        "config": {
+            "users": args.users,
+            "iterations": args.iterations,
+            "repeat_ratio": args.repeat_ratio,
+            "model_latency_ms": args.model_latency_ms,
+            "model_jitter_ms": args.model_jitter_ms,
+            "bcrypt_rounds": args.bcrypt_rounds,
+            "seed": args.seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "levels": levels,
+    }
+
+
+def print_report(result: dict):
+    base_rps = result["levels"][0]["throughput_rps"] if result["levels"] else 0
+    print(f"\n{'workers':>8}{'req/s':>10}{'speedup':>9}{'login p95':>11}{'analyze p95':>13}{'errors':>8}")
+    for level in result["levels"]:
+        routes = level["routes"]
+        login = routes.get("POST /api/auth/login", {}).get("p95_ms", 0.0)
+        analyze = routes.get("POST /api/analyze", {}).get("p95_ms", 0.0)
+        speedup = level["throughput_rps"] / base_rps if base_rps else 0.0
+        print(f"{level['workers']:>8}{level['throughput_rps']:>10}{speedup:>8.2f}x{login:>11}{analyze:>13}{level['errors']:>8}")
+    print(f"(cpu_count={result['environment']['cpu_count']}; speedup is relative to the first level)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"), help="MongoDB shared by the workers.")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to measure.")
+    parser.add_argument("--users", type=int, default=32, help="Concurrent simulated users.")
+    parser.add_argument("--iterations", type=int, default=3, help="Analyses submitted per user.")
+    parser.add_argument("--repeat-ratio", type=float, default=0.3, help="Share of resubmitted identical pitches.")
+    parser.add_argument("--model-latency-ms", type=float, default=300, help="Mean latency of the stubbed model.")
+    parser.add_argument("--model-jitter-ms", type=float, default=100, help="Uniform jitter of the stubbed model.")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="bcrypt cost factor used for the run.")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for pitches and model jitter.")
+    parser.add_argument("--port", type=int, default=8099, help="Port the benchmarked server listens on.")
+    parser.add_argument("--output", help="Write the JSON result to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Show the server's log output.")
+    args = parser.parse_args(argv)
+    if not args.mongo_uri:
+        parser.error("--mongo-uri (or MONGO_URI) is required: workers share state through MongoDB")
+    args.workers = [int(n) for n in args.workers.split(",") if n.strip()]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = asyncio.run(run_benchmark(args))
+    print_report(result)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+        print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
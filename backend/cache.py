@@ -0,0 +1,173 @@
+import os
+import copy
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from database import analysis_cache_collection
+
+logger = logging.getLogger(__name__)
+
+# Cache Configuration
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "512"))
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(60 * 60)))  # 1 hour in-process
+ANALYSIS_CACHE_REMOTE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_REMOTE_TTL_SECONDS", str(60 * 60 * 24 * 7)))  # 1 week in Mongo
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache where every entry also expires after a fixed TTL.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        return self._data.pop(key, None) is not None
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class AnalysisCache:
+    """
+    Two-tier cache for analysis results: a TTLCache in front of a Mongo collection
+    with a TTL index, so results survive restarts and are shared between workers.
+    """
+    def __init__(self, collection, max_entries: int, ttl_seconds: int, remote_ttl_seconds: int, enabled: bool = True):
+        self.collection = collection
+        self.local = TTLCache(max_entries, ttl_seconds)
+        self.remote_ttl_seconds = remote_ttl_seconds
+        self.enabled = enabled
+        self.remote_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.stores = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(pitch_text: str, target_audience: str, version: str) -> str:
+        """
+        Content address for a request: whitespace-normalized pitch, case-folded audience and
+        the prompt/model version, so editing the prompt never serves stale results.
+        """
+        normalized_pitch = " ".join((pitch_text or "").split())
+        normalized_audience = " ".join((target_audience or "").split()).casefold()
+        material = "\x1f".join([version, normalized_audience, normalized_pitch])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str):
+        if not self.enabled:
+            return None
+
+        value = self.local.get(key)
+        if value is not None:
+            return copy.deepcopy(value)
+
+        try:
+            document = await self.collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.utcnow()}}
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Analysis cache lookup failed: {e}")
+            document = None
+
+        if not document:
+            self.misses += 1
+            return None
+
+        self.remote_hits += 1
+        self.local.set(key, document["value"])
+        return copy.deepcopy(document["value"])
+
+    async def set(self, key: str, value: dict):
+        if not self.enabled:
+            return
+
+        self.local.set(key, copy.deepcopy(value))
+        now = datetime.utcnow()
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "value": value,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.remote_ttl_seconds),
+                }},
+                upsert=True,
+            )
+            self.stores += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Analysis cache store failed: {e}")
+
+    def record_bypass(self):
+        self.bypasses += 1
+
+    def stats(self) -> dict:
+        local = self.local.stats()
+        lookups = local["hits"] + self.remote_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "local": local,
+            "remote_hits": self.remote_hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "stores": self.stores,
+            "errors": self.errors,
+            "hit_rate": round((local["hits"] + self.remote_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+analysis_cache = AnalysisCache(
+    analysis_cache_collection,
+    max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANALYSIS_CACHE_TTL_SECONDS,
+    remote_ttl_seconds=ANALYSIS_CACHE_REMOTE_TTL_SECONDS,
+    enabled=ANALYSIS_CACHE_ENABLED,
+)
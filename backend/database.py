@@ -1,5 +1,5 @@
 import os
-import motor.motor_asyncio
+import threading
 from dotenv import load_dotenv
 import logging
 
@@ -48,8 +48,19 @@ def hyper_clean_uri(uri: str) -> str:
 
 MONGO_URI = hyper_clean_uri(RAW_URI)
 
-# Diagnostic Logging (Safely Masked)
-if MONGO_URI:
+if not MONGO_URI:
+    raise ValueError("MONGO_URI not found in environment variables")
+
+DATABASE_NAME = "vakyaai_db"
+
+# Connection Pool Configuration (per worker process)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+
+_client = None
+_client_lock = threading.Lock()
+
+def _log_uri_diagnostics():
     # Check for hidden characters in the first 30 chars
     chars_debug = [f"{ord(c)}" for c in RAW_URI[:10]]
     logging.info(f"URI Diagnostic - Prefix Char Codes: {', '.join(chars_debug)}")
@@ -62,20 +73,82 @@ if MONGO_URI:
     if sys.version_info.major == 3 and sys.version_info.minor >= 14:
         logging.warning("CRITICAL: Python 3.14 detected. This experimental version often breaks MongoDB/Pymongo. PLEASE DOWNGRADE TO 3.11 IN RENDER SETTINGS.")
 
-if not MONGO_URI:
-    raise ValueError("MONGO_URI not found in environment variables")
+def get_client():
+    """
+    Returns the shared Motor client, importing the driver and building the client on
+    first use. Startup warms this in a thread so no request pays for it.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Importing motor/pymongo is a large share of the process's import time
+                import motor.motor_asyncio
+                from metrics import mongo_command_listener
+                _log_uri_diagnostics()
+                _client = motor.motor_asyncio.AsyncIOMotorClient(
+                    MONGO_URI,
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    event_listeners=[mongo_command_listener()],
+                )
+    return _client
+
+def get_database():
+    return get_client()[DATABASE_NAME]
+
+class LazyCollection:
+    """
+    Stands in for a Motor collection and resolves it on first attribute access, so
+    modules can keep importing collections at load time without creating the client.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._collection = None
+
+    def __getattr__(self, attr):
+        if self._collection is None:
+            self._collection = get_database().get_collection(self.name)
+        return getattr(self._collection, attr)
 
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
-db = client.vakyaai_db
 # Collection names
-analyses_collection = db.get_collection("analyses")
-users_collection = db.get_collection("users")
+analyses_collection = LazyCollection("analyses")
+users_collection = LazyCollection("users")
+analysis_cache_collection = LazyCollection("analysis_cache")
+analysis_jobs_collection = LazyCollection("analysis_jobs")
+analysis_leases_collection = LazyCollection("analysis_leases")
+user_quotas_collection = LazyCollection("user_quotas")
+# One progress rollup per user, keyed by user id
+user_stats_collection = LazyCollection("user_stats")
 
 async def check_database_connection():
     try:
         # Send a ping to confirm a successful connection
-        await client.admin.command('ping')
+        await get_client().admin.command('ping')
         logging.info("Pinged your deployment. You successfully connected to MongoDB!")
     except Exception as e:
         logging.error(f"MongoDB Not Connected: {e}")
         raise e
+
+async def ensure_indexes():
+    """
+    Creates the indexes the backend relies on. Safe to run on every startup.
+    """
+    # History listings page through a user's analyses newest first
+    await analyses_collection.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+    # Revision lookups match any value of a user's MinHash sketches (multikey)
+    await analyses_collection.create_index([("user_id", 1), ("minhash", 1)])
+    try:
+        await users_collection.create_index("email", unique=True)
+    except Exception as e:
+        # Existing duplicate accounts must be cleaned up before the index can be built
+        logging.error(f"Could not create unique index on users.email: {e}")
+    # Mongo's TTL monitor drops cached analyses once expires_at has passed
+    await analysis_cache_collection.create_index("expires_at", expireAfterSeconds=0)
+    # Workers claim the oldest queued job; finished jobs expire after their result TTL
+    await analysis_jobs_collection.create_index([("status", 1), ("created_at", 1)])
+    await analysis_jobs_collection.create_index("expires_at", expireAfterSeconds=0)
+    # Leases of crashed workers are taken over once expired; the TTL monitor cleans them up later
+    await analysis_leases_collection.create_index("expires_at", expireAfterSeconds=0)
+    # Daily token usage documents are only needed for the day they count
+    await user_quotas_collection.create_index("expires_at", expireAfterSeconds=0)
@@ -0,0 +1,142 @@
+import os
+import io
+import csv
+import json
+import logging
+from datetime import datetime, timezone
+from database import analyses_collection
+from schemas import AnalysisResult, SCORE_DIMENSIONS
+from analysis_store import analysis_projection, unpack_document, PITCH_PREVIEW_CHARS
+from utils import encode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Export Configuration
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "200"))  # documents per cursor round trip
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", "65536"))  # response bytes buffered per write
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+# Stored next to the analysis rather than in it
+DOCUMENT_FIELDS = ["target_audience", "original_pitch", "pitch_preview"]
+EXPORTABLE_FIELDS = DOCUMENT_FIELDS + [field for field in AnalysisResult.model_fields if field != "sections"]
+DEFAULT_EXPORT_FIELDS = ["target_audience", "overall_score", "scores", "confidence_score"]
+
+
+def to_utc(value: datetime) -> datetime:
+    # Stored timestamps are naive UTC
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def export_query(user_id: str, since: datetime = None, until: datetime = None, after=None) -> dict:
+    """
+    Filter for a user's analyses created in [since, until), after the (created_at, _id)
+    position `after` of an interrupted export.
+    """
+    query = {"user_id": user_id}
+    created_at = {}
+    if since:
+        created_at["$gte"] = to_utc(since)
+    if until:
+        created_at["$lt"] = to_utc(until)
+    if created_at:
+        query["created_at"] = created_at
+    if after:
+        last_created_at, last_id = after
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$gt": last_created_at}},
+            {"created_at": last_created_at, "_id": {"$gt": last_id}},
+        ]}]}
+    return query
+
+def export_projection(fields: list) -> dict:
+    analysis_fields = [field for field in fields if field not in ("target_audience", "pitch_preview")]
+    projection = analysis_projection(analysis_fields) or {"created_at": 1, "target_audience": 1}
+    if "pitch_preview" in fields:
+        # Documents written before pitch_preview existed keep the whole pitch inline
+        projection.update({"pitch_preview": 1, "original_pitch": 1})
+    return projection
+
+def export_row(document: dict, fields: list) -> dict:
+    document = unpack_document(document)
+    analysis = document["analysis"]
+    row = {"id": str(document["_id"]), "created_at": document["created_at"].isoformat()}
+    for field in fields:
+        if field == "target_audience":
+            row[field] = document.get("target_audience")
+        elif field == "original_pitch":
+            row[field] = document.get("original_pitch", "")
+        elif field == "pitch_preview":
+            row[field] = document.get("pitch_preview") or document.get("original_pitch", "")[:PITCH_PREVIEW_CHARS]
+        else:
+            # Sections never generated for this analysis are exported as null
+            row[field] = analysis.get(field)
+    # Passed back as `cursor` to resume after this row
+    row["cursor"] = encode_cursor(document["created_at"], document["_id"])
+    return row
+
+def csv_columns(fields: list) -> list:
+    columns = ["id", "created_at"]
+    for field in fields:
+        if field == "scores":
+            columns.extend(f"scores.{dimension}" for dimension in SCORE_DIMENSIONS)
+        else:
+            columns.append(field)
+    return columns + ["cursor"]
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+def csv_values(row: dict, columns: list) -> list:
+    scores = row.get("scores") or {}
+    return [
+        _csv_cell(scores.get(column[len("scores."):]) if column.startswith("scores.") else row.get(column))
+        for column in columns
+    ]
+
+
+async def stream_export(user_id: str, export_format: str, fields: list, since: datetime = None,
+                        until: datetime = None, after=None, limit: int = 0):
+    """
+    Streams a user's analyses oldest first as NDJSON lines or CSV rows, straight from a
+    Mongo cursor read EXPORT_BATCH_SIZE documents at a time. Output is flushed in chunks
+    of about EXPORT_CHUNK_BYTES, so memory stays constant whatever the size of the
+    export. Every row carries the cursor to resume from after it.
+    """
+    cursor = analyses_collection.find(
+        export_query(user_id, since, until, after), export_projection(fields)
+    ).sort([("created_at", 1), ("_id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    buffer = io.StringIO()
+    writer = None
+    if export_format == "csv":
+        columns = csv_columns(fields)
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+
+    rows = 0
+    try:
+        async for document in cursor:
+            row = export_row(document, fields)
+            if writer:
+                writer.writerow(csv_values(row, columns))
+            else:
+                buffer.write(json.dumps(row, separators=(",", ":"), default=str))
+                buffer.write("\n")
+            rows += 1
+            if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        logger.info(f"Exported {rows} analyses of user {user_id} as {export_format}.")
+    finally:
+        # Frees the server-side cursor at once when the client goes away mid-export
+        await cursor.close()
@@ -0,0 +1,377 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from database import user_quotas_collection
+from metrics import MODEL_QUEUE_WAIT, MODEL_QUEUE_DEPTH, QUOTA_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Fair-Share Scheduling Configuration
+# Concurrent model calls across the deployment; each of the WEB_CONCURRENCY workers gets its share
+MODEL_CONCURRENCY_LIMIT = int(os.getenv("MODEL_CONCURRENCY_LIMIT", "8"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+WORKER_MODEL_CONCURRENCY = max(1, MODEL_CONCURRENCY_LIMIT // max(1, WEB_CONCURRENCY))
+# Relative share of model slots by account role, e.g. "user:1,premium:2"
+MODEL_FAIR_SHARE_WEIGHTS = os.getenv("MODEL_FAIR_SHARE_WEIGHTS", "user:1")
+
+# Quota Configuration
+USER_ANALYSIS_RPM = float(os.getenv("USER_ANALYSIS_RPM", "20"))
+USER_DAILY_TOKEN_LIMIT = int(os.getenv("USER_DAILY_TOKEN_LIMIT", "500000"))  # 0 disables the daily quota
+USER_QUOTA_SYNC_SECONDS = float(os.getenv("USER_QUOTA_SYNC_SECONDS", "30"))
+
+ANONYMOUS_USER = "anonymous"
+RATE_WINDOW_SECONDS = 60
+WAIT_SAMPLES_PER_USER = 50
+MAX_TRACKED_USERS = 10000
+
+# The account a model call is made for, set per request (and per job) so the scheduler
+# and token accounting deep in the call stack know whom to charge
+_model_user = ContextVar("model_user", default=(ANONYMOUS_USER, None))
+
+def set_model_user(user_id: str, role: str = None):
+    _model_user.set((user_id or ANONYMOUS_USER, role))
+
+def current_model_user() -> str:
+    return _model_user.get()[0]
+
+def parse_weights(spec: str) -> dict:
+    weights = {}
+    for part in spec.split(","):
+        role, _, weight = part.partition(":")
+        if role.strip() and weight.strip():
+            weights[role.strip()] = max(0.01, float(weight))
+    return weights
+
+
+class QuotaExceededError(Exception):
+    def __init__(self, detail: str, retry_after: float, scope: str):
+        super().__init__(detail)
+        self.retry_after = retry_after
+        self.scope = scope
+
+
+class FairScheduler:
+    """
+    Caps concurrent model calls and hands free slots out by weighted fair queueing:
+    each waiting call gets a virtual finish tag of max(virtual time, the user's last
+    tag) + 1/weight and the smallest tag runs next. A user flooding the queue only
+    pushes their own tags further out, so other users' calls keep getting slots.
+    """
+    def __init__(self, limit: int, weights: dict):
+        self.limit = limit
+        self.weights = weights
+        self.in_flight = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish = {}
+        self._waits = {}
+        self.dispatched = 0
+        self.queued = 0
+
+    def _weight(self, role) -> float:
+        return self.weights.get(role, 1.0)
+
+    def _tag(self, user: str, role) -> float:
+        finish = max(self._virtual_time, self._last_finish.get(user, 0.0)) + 1.0 / self._weight(role)
+        self._last_finish[user] = finish
+        if len(self._last_finish) > MAX_TRACKED_USERS:
+            # Tags behind the virtual clock no longer affect ordering
+            self._last_finish = {u: f for u, f in self._last_finish.items() if f > self._virtual_time}
+        return finish
+
+    @asynccontextmanager
+    async def slot(self):
+        user, role = _model_user.get()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        finish = self._tag(user, role)
+        if self.in_flight < self.limit and not self._queue:
+            self.in_flight += 1
+        else:
+            self.queued += 1
+            future = loop.create_future()
+            heapq.heappush(self._queue, (finish, next(self._sequence), future))
+            MODEL_QUEUE_DEPTH.inc()
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Handed a slot just as the caller went away: pass it on
+                if future.done() and not future.cancelled():
+                    self._release()
+                raise
+            finally:
+                MODEL_QUEUE_DEPTH.dec()
+        self.dispatched += 1
+        self._record_wait(user, loop.time() - started)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def try_acquire(self) -> bool:
+        """
+        Takes a slot only if one is free and nobody is queued, for extra work that is
+        worth doing on idle capacity alone (hedged requests). Pair with release().
+        """
+        if self.in_flight < self.limit and not self._queue:
+            self.in_flight += 1
+            self.dispatched += 1
+            return True
+        return False
+
+    def release(self):
+        self._release()
+
+    def _release(self):
+        while self._queue:
+            finish, _, future = heapq.heappop(self._queue)
+            if future.cancelled():
+                continue
+            # The slot moves to the next call directly, in_flight stays the same
+            self._virtual_time = max(self._virtual_time, finish)
+            future.set_result(None)
+            return
+        self.in_flight -= 1
+
+    def _record_wait(self, user: str, seconds: float):
+        MODEL_QUEUE_WAIT.observe(seconds)
+        samples = self._waits.get(user)
+        if samples is None:
+            if len(self._waits) >= MAX_TRACKED_USERS:
+                self._waits.pop(next(iter(self._waits)))
+            samples = self._waits[user] = deque(maxlen=WAIT_SAMPLES_PER_USER)
+        samples.append(seconds)
+
+    def user_wait(self, user: str) -> dict:
+        ordered = sorted(self._waits.get(user, ()))
+        if not ordered:
+            return {"samples": 0, "avg_ms": 0.0, "p95_ms": 0.0}
+        return {
+            "samples": len(ordered),
+            "avg_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+        }
+
+    def stats(self, top: int = 10) -> dict:
+        waits = {user: self.user_wait(user) for user in self._waits}
+        slowest = sorted(waits.items(), key=lambda item: item[1]["p95_ms"], reverse=True)[:top]
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": sum(1 for _, _, future in self._queue if not future.cancelled()),
+            "dispatched": self.dispatched,
+            "queued": self.queued,
+            "slowest_users": dict(slowest),
+        }
+
+
+class UserQuotas:
+    """
+    Per-user analysis quotas shared by all workers through Mongo: a requests-per-minute
+    sliding window, and a daily model token budget. Requests are counted with an atomic
+    $inc on one document per user and minute, weighted with the previous minute's count.
+    Daily usage is counted in memory and synced (pending usage pushed with $inc, other
+    workers' usage read back) at most every sync_seconds, so checks rarely wait on it.
+    """
+    def __init__(self, collection, rpm: float, daily_tokens: int, sync_seconds: float):
+        self.collection = collection
+        self.rpm = rpm
+        self.daily_tokens = daily_tokens
+        self.sync_seconds = sync_seconds
+        self._usage = {}
+        self.rejections = {"rpm": 0, "daily_tokens": 0}
+        self.errors = 0
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.utcnow().strftime("%Y-%m-%d")
+
+    @staticmethod
+    def _seconds_until_tomorrow() -> float:
+        now = datetime.utcnow()
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (tomorrow - now).total_seconds()
+
+    @staticmethod
+    def _windows(user_id: str):
+        # Ids of the current and previous minute's counters, and how far into the minute we are
+        now = time.time()
+        minute = int(now // RATE_WINDOW_SECONDS)
+        elapsed = (now % RATE_WINDOW_SECONDS) / RATE_WINDOW_SECONDS
+        return f"{user_id}:rpm:{minute}", f"{user_id}:rpm:{minute - 1}", elapsed
+
+    async def _rate_counts(self, user_id: str, cost: float = 0):
+        """
+        Adds `cost` to the current minute's counter and returns it with the previous
+        minute's count and the elapsed share of the current minute. Without a cost the
+        counters are only read.
+        """
+        from pymongo import ReturnDocument
+
+        current_id, previous_id, elapsed = self._windows(user_id)
+        if cost:
+            charge = self.collection.find_one_and_update(
+                {"_id": current_id},
+                {
+                    "$inc": {"requests": cost},
+                    "$setOnInsert": {"user_id": user_id, "expires_at": datetime.utcnow() + timedelta(minutes=3)},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        else:
+            charge = self.collection.find_one({"_id": current_id}, {"requests": 1})
+        current, previous = await asyncio.gather(
+            charge, self.collection.find_one({"_id": previous_id}, {"requests": 1}),
+        )
+        return (current or {}).get("requests", 0), (previous or {}).get("requests", 0), elapsed
+
+    def _rate_estimate(self, current: float, previous: float, elapsed: float) -> float:
+        # Requests in the last 60 s, assuming the previous minute's were spread evenly
+        return current + previous * (1 - elapsed)
+
+    def _rate_retry_after(self, current: float, previous: float, elapsed: float, cost: float) -> float:
+        # `current` includes this request's cost
+        room = self.rpm - current
+        if previous and room >= 0:
+            # Until enough of the previous minute has slid out of the window
+            return max(1.0, (1 - room / previous - elapsed) * RATE_WINDOW_SECONDS)
+        return (1 - elapsed) * RATE_WINDOW_SECONDS + 1
+
+    async def _refund(self, user_id: str, cost: float):
+        try:
+            await self.collection.update_one({"_id": self._windows(user_id)[0]}, {"$inc": {"requests": -cost}})
+        except Exception as e:
+            logger.warning(f"Could not refund rate quota of user {user_id}: {e}")
+
+    def _daily(self, user_id: str) -> dict:
+        usage = self._usage.get(user_id)
+        if usage is None or usage["day"] != self._today():
+            usage = self._usage[user_id] = {"day": self._today(), "persisted": 0, "pending": 0, "synced_at": 0.0}
+        return usage
+
+    async def _sync(self, user_id: str, usage: dict):
+        from pymongo import ReturnDocument
+
+        pending = usage["pending"]
+        try:
+            document = await self.collection.find_one_and_update(
+                {"_id": f"{user_id}:{usage['day']}"},
+                {
+                    "$inc": {"tokens": pending},
+                    "$setOnInsert": {"user_id": user_id, "expires_at": datetime.utcnow() + timedelta(days=2)},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except Exception as e:
+            # Keep counting locally; the usage is pushed again on the next sync
+            self.errors += 1
+            logger.warning(f"Could not sync token usage of user {user_id}: {e}")
+            return
+        usage["pending"] -= pending
+        usage["persisted"] = document["tokens"]
+        usage["synced_at"] = time.monotonic()
+
+    @property
+    def max_cost(self) -> float:
+        # More than a minute's allowance could never be charged, however long the caller waited
+        return self.rpm if self.rpm > 0 else math.inf
+
+    async def check(self, user_id: str, cost: float = 1):
+        """
+        Charges `cost` analysis requests. Raises QuotaExceededError when the user is over
+        their per-minute rate or has spent the day's model tokens.
+        """
+        if self.rpm > 0:
+            try:
+                current, previous, elapsed = await self._rate_counts(user_id, cost)
+            except Exception as e:
+                # Fail open: an unreachable database must not stop every analysis
+                self.errors += 1
+                logger.warning(f"Could not count requests of user {user_id}: {e}")
+            else:
+                if self._rate_estimate(current, previous, elapsed) > self.rpm:
+                    # Refused requests do not count against the window
+                    await self._refund(user_id, cost)
+                    self.rejections["rpm"] += 1
+                    QUOTA_REJECTIONS.labels("rpm").inc()
+                    raise QuotaExceededError(
+                        f"Rate limit of {self.rpm:g} analyses per minute exceeded.",
+                        self._rate_retry_after(current, previous, elapsed, cost), "rpm",
+                    )
+
+        if self.daily_tokens > 0:
+            usage = self._daily(user_id)
+            if time.monotonic() - usage["synced_at"] >= self.sync_seconds:
+                await self._sync(user_id, usage)
+            if usage["persisted"] + usage["pending"] >= self.daily_tokens:
+                self.rejections["daily_tokens"] += 1
+                QUOTA_REJECTIONS.labels("daily_tokens").inc()
+                # The request was refused, so it does not count against the rate either
+                if self.rpm > 0:
+                    await self._refund(user_id, cost)
+                raise QuotaExceededError(
+                    "Daily model token quota exhausted.", self._seconds_until_tomorrow(), "daily_tokens"
+                )
+
+    async def refund(self, user_id: str, cost: float = 1):
+        """
+        Gives back requests charged by check() that were not served after all.
+        """
+        if self.rpm > 0:
+            await self._refund(user_id, cost)
+
+    def record_tokens(self, user_id: str, tokens: int):
+        if self.daily_tokens > 0 and user_id != ANONYMOUS_USER and tokens:
+            self._daily(user_id)["pending"] += tokens
+
+    async def flush(self):
+        # Pushes usage not yet persisted, e.g. on shutdown
+        for user_id, usage in list(self._usage.items()):
+            if usage["pending"] and usage["day"] == self._today():
+                await self._sync(user_id, usage)
+
+    async def usage(self, user_id: str) -> dict:
+        daily = self._usage.get(user_id)
+        used = daily["persisted"] + daily["pending"] if daily and daily["day"] == self._today() else 0
+        available = self.rpm
+        if self.rpm > 0:
+            try:
+                available = max(0.0, self.rpm - self._rate_estimate(*await self._rate_counts(user_id)))
+            except Exception as e:
+                logger.warning(f"Could not read request counts of user {user_id}: {e}")
+        return {
+            "requests_per_minute": self.rpm,
+            "requests_available": round(available, 2),
+            "daily_token_limit": self.daily_tokens,
+            "daily_tokens_used": used,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "requests_per_minute": self.rpm,
+            "daily_token_limit": self.daily_tokens,
+            "tracked_users": len(self._usage),
+            "rejections": dict(self.rejections),
+            "errors": self.errors,
+        }
+
+
+model_scheduler = FairScheduler(WORKER_MODEL_CONCURRENCY, parse_weights(MODEL_FAIR_SHARE_WEIGHTS))
+
+user_quotas = UserQuotas(
+    user_quotas_collection,
+    rpm=USER_ANALYSIS_RPM,
+    daily_tokens=USER_DAILY_TOKEN_LIMIT,
+    sync_seconds=USER_QUOTA_SYNC_SECONDS,
+)
@@ -0,0 +1,46 @@
+"""
+Multi-process serving: a gunicorn master supervising WEB_CONCURRENCY uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Every worker is a separate process with its own event loop and Mongo connection pool
+(MONGO_MAX_POOL_SIZE each). State that must agree across workers lives in MongoDB: the
+analysis cache, analysis leases, the job queue and per-user quotas. The model
+concurrency limit is split over the workers. Send SIGHUP to the master for a
+graceful reload; workers finish in-flight requests within graceful_timeout.
+"""
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Size to the container: one worker per core, within its memory limit
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Model calls and streamed analyses can legitimately take a while
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Recycle workers now and then to bound memory growth; jitter keeps them from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# Each worker imports the app itself: the Mongo client must not be shared across a fork,
+# and job workers identify themselves by pid
+preload_app = False
+
+# Prometheus metrics from all workers are aggregated through files in this directory.
+# prometheus_client reads it at import time, so it is set before any worker starts.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/vakyaai-prometheus")
+
+
+def on_starting(server):
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    # Files left by a previous run would be summed into the new one
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
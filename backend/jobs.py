@@ -0,0 +1,277 @@
+import os
+import socket
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from bson import ObjectId
+from database import analysis_jobs_collection
+from ai_service import analyze_pitch_with_gemini, analyze_pitch_sections
+from analysis_store import save_analysis
+from fairshare import set_model_user
+
+logger = logging.getLogger(__name__)
+
+# Job Queue Configuration
+ANALYSIS_JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "2"))
+ANALYSIS_JOB_MAX_QUEUE_DEPTH = int(os.getenv("ANALYSIS_JOB_MAX_QUEUE_DEPTH", "100"))
+ANALYSIS_JOB_LEASE_SECONDS = int(os.getenv("ANALYSIS_JOB_LEASE_SECONDS", "120"))
+ANALYSIS_JOB_POLL_INTERVAL_SECONDS = float(os.getenv("ANALYSIS_JOB_POLL_INTERVAL_SECONDS", "2"))
+ANALYSIS_JOB_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_JOB_MAX_ATTEMPTS", "3"))
+ANALYSIS_JOB_RESULT_TTL_SECONDS = int(os.getenv("ANALYSIS_JOB_RESULT_TTL_SECONDS", str(60 * 60 * 24)))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+TERMINAL_STATUSES = (JOB_DONE, JOB_FAILED)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class AnalysisJobQueue:
+    """
+    Durable analysis queue stored in Mongo and drained by a fixed-size pool of asyncio
+    workers. Jobs are claimed with a lease that running workers keep extending, so jobs
+    held by a crashed worker are reclaimed once their lease expires.
+    """
+    def __init__(self, collection, workers: int, max_depth: int, lease_seconds: int, poll_interval: float):
+        self.collection = collection
+        self.workers = workers
+        self.max_depth = max_depth
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._job_events = {}
+        self._wait_times = deque(maxlen=500)
+        self.enqueued = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.reclaimed = 0
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+        logger.info(f"Started {self.workers} analysis job workers ({self.worker_id}).")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Hand our unfinished jobs back to the queue instead of waiting for the lease to expire
+        try:
+            result = await self.collection.update_many(
+                {"status": JOB_RUNNING, "worker_id": self.worker_id},
+                {"$set": {"status": JOB_QUEUED, "worker_id": None, "lease_expires_at": None}},
+            )
+            if result.modified_count:
+                logger.info(f"Requeued {result.modified_count} unfinished analysis jobs.")
+        except Exception as e:
+            logger.error(f"Failed to requeue analysis jobs on shutdown: {e}")
+
+    async def enqueue(self, user_id: str, pitch_text: str, target_audience: str, sections: list = None) -> dict:
+        depth = await self.collection.count_documents({"status": JOB_QUEUED})
+        if depth >= self.max_depth:
+            self.rejected += 1
+            raise QueueFullError(f"Analysis queue is full ({depth} jobs waiting).")
+
+        job = {
+            "user_id": user_id,
+            "pitch_text": pitch_text,
+            "target_audience": target_audience,
+            "sections": sections,
+            "status": JOB_QUEUED,
+            "attempts": 0,
+            "created_at": datetime.utcnow(),
+        }
+        result = await self.collection.insert_one(job)
+        job["id"] = str(result.inserted_id)
+        self.enqueued += 1
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str, user_id: str):
+        job = await self.collection.find_one({"_id": ObjectId(job_id), "user_id": user_id})
+        if job:
+            job["id"] = str(job["_id"])
+        return job
+
+    async def wait(self, job_id: str, user_id: str, timeout: float):
+        """
+        Long-polls a job: returns as soon as it reaches a terminal status or timeout elapses.
+        Jobs finished by this process wake waiters immediately, others are picked up by polling.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Concurrent long-polls of a job share one event; the last to leave removes it
+        waiting = self._job_events.setdefault(job_id, {"event": asyncio.Event(), "waiters": 0})
+        waiting["waiters"] += 1
+        try:
+            while True:
+                job = await self.get(job_id, user_id)
+                remaining = deadline - loop.time()
+                if not job or job["status"] in TERMINAL_STATUSES or remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(waiting["event"].wait(), timeout=min(self.poll_interval, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            waiting["waiters"] -= 1
+            if not waiting["waiters"]:
+                self._job_events.pop(job_id, None)
+
+    async def _claim(self):
+        # pymongo is loaded with the client by now; a top-level import would slow down startup
+        from pymongo import ReturnDocument
+
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"status": JOB_QUEUED},
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "worker_id": self.worker_id,
+                    "started_at": now,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _worker(self, n: int):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Job worker {n} failed to claim a job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._wait_times.append((job["started_at"] - job["created_at"]).total_seconds())
+            try:
+                await self._process(job)
+            except Exception as e:
+                # The lease will expire and the reaper will hand the job to another worker
+                logger.error(f"Job worker {n} failed to record job {job['_id']}: {e}")
+
+    async def _process(self, job: dict):
+        job_id = job["_id"]
+        set_model_user(job["user_id"])
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            if job.get("sections"):
+                analysis_data = await analyze_pitch_sections(job["pitch_text"], job["target_audience"], job["sections"])
+            else:
+                analysis_data = await analyze_pitch_with_gemini(job["pitch_text"], job["target_audience"])
+            document = await save_analysis(job["user_id"], job["pitch_text"], analysis_data, job["target_audience"])
+            update = {"status": JOB_DONE, "analysis_id": document["id"]}
+            self.completed += 1
+        except Exception as e:
+            logger.error(f"Analysis job {job_id} failed: {e}")
+            update = {"status": JOB_FAILED, "error": str(getattr(e, "detail", e))}
+            self.failed += 1
+        finally:
+            heartbeat.cancel()
+
+        now = datetime.utcnow()
+        update.update({
+            "finished_at": now,
+            "lease_expires_at": None,
+            "expires_at": now + timedelta(seconds=ANALYSIS_JOB_RESULT_TTL_SECONDS),
+        })
+        await self.collection.update_one({"_id": job_id, "worker_id": self.worker_id}, {"$set": update})
+
+        waiting = self._job_events.get(str(job_id))
+        if waiting:
+            waiting["event"].set()
+
+    async def _heartbeat(self, job_id):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.collection.update_one(
+                    {"_id": job_id, "worker_id": self.worker_id, "status": JOB_RUNNING},
+                    {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}},
+                )
+            except Exception as e:
+                logger.warning(f"Failed to extend lease of analysis job {job_id}: {e}")
+
+    async def _reaper(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 2)
+            try:
+                await self.reclaim_stale_jobs()
+            except Exception as e:
+                logger.error(f"Failed to reclaim stale analysis jobs: {e}")
+
+    async def reclaim_stale_jobs(self):
+        """
+        Requeues running jobs whose lease expired (their worker died), failing jobs
+        that already used up their attempts.
+        """
+        now = datetime.utcnow()
+        stale = {"status": JOB_RUNNING, "lease_expires_at": {"$lt": now}}
+        failed = await self.collection.update_many(
+            {**stale, "attempts": {"$gte": ANALYSIS_JOB_MAX_ATTEMPTS}},
+            {"$set": {
+                "status": JOB_FAILED,
+                "error": "Job exceeded its retry budget after worker failures.",
+                "finished_at": now,
+                "expires_at": now + timedelta(seconds=ANALYSIS_JOB_RESULT_TTL_SECONDS),
+            }},
+        )
+        requeued = await self.collection.update_many(
+            stale, {"$set": {"status": JOB_QUEUED, "worker_id": None, "lease_expires_at": None}}
+        )
+        if requeued.modified_count or failed.modified_count:
+            logger.warning(f"Reclaimed {requeued.modified_count} stale jobs, failed {failed.modified_count}.")
+            self.reclaimed += requeued.modified_count
+            self._wakeup.set()
+
+    async def stats(self) -> dict:
+        queued = await self.collection.count_documents({"status": JOB_QUEUED})
+        running = await self.collection.count_documents({"status": JOB_RUNNING})
+        oldest = await self.collection.find_one({"status": JOB_QUEUED}, sort=[("created_at", 1)])
+        waits = sorted(self._wait_times)
+        return {
+            "workers": self.workers,
+            "queue_depth": queued,
+            "max_queue_depth": self.max_depth,
+            "running": running,
+            "oldest_queued_seconds": round((datetime.utcnow() - oldest["created_at"]).total_seconds(), 2) if oldest else 0.0,
+            "wait_seconds_avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "wait_seconds_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "reclaimed": self.reclaimed,
+        }
+
+
+analysis_jobs = AnalysisJobQueue(
+    analysis_jobs_collection,
+    workers=ANALYSIS_JOB_WORKERS,
+    max_depth=ANALYSIS_JOB_MAX_QUEUE_DEPTH,
+    lease_seconds=ANALYSIS_JOB_LEASE_SECONDS,
+    poll_interval=ANALYSIS_JOB_POLL_INTERVAL_SECONDS,
+)
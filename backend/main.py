@@ -1,27 +1,43 @@
+import time
+_import_started = time.perf_counter()
+
 import os
+import asyncio
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware, DEFAULT_EXCLUDED_CONTENT_TYPES
 from contextlib import asynccontextmanager
-from database import check_database_connection
+from jobs import analysis_jobs
+from startup import startup_state, warmup, readiness
+from fairshare import user_quotas
+from metrics import MetricsMiddleware, monitor_event_loop_lag, render_metrics
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Response Compression Configuration
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_COMPRESSION_LEVEL = int(os.getenv("RESPONSE_COMPRESSION_LEVEL", "6"))
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up VākyaAI Backend...")
-    try:
-        await check_database_connection()
-    except Exception as e:
-        logger.critical(f"Failed to connect to database: {e}")
+    # Connecting and indexing can take seconds on a cold start; serve meanwhile and warm up in the background
+    warmup_task = asyncio.create_task(warmup())
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
     yield
     # Shutdown
     logger.info("Shutting down VākyaAI Backend...")
+    lag_monitor.cancel()
+    warmup_task.cancel()
+    await asyncio.gather(warmup_task, return_exceptions=True)
+    await analysis_jobs.stop()
+    await user_quotas.flush()
 
 app = FastAPI(title="VākyaAI API", version="1.0.0", lifespan=lifespan)
 
@@ -42,6 +58,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Streamed SSE and NDJSON responses are excluded: gzip would hold chunks back until its buffer fills
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=RESPONSE_COMPRESSION_MIN_BYTES,
+    compresslevel=RESPONSE_COMPRESSION_LEVEL,
+    exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/x-ndjson",),
+)
+
+# Outermost, so the timing includes every other middleware and error handling
+app.add_middleware(MetricsMiddleware)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global Error: {exc}", exc_info=True)
@@ -61,5 +88,22 @@ async def root():
         "api_v1": "/api"
     }
 
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    # Liveness: the process serves requests. Never touches dependencies.
+    return {"status": "ok"}
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    is_ready, report = await readiness()
+    return JSONResponse(status_code=200 if is_ready else 503, content={"ready": is_ready, **report})
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 from routes import router as api_router
 app.include_router(api_router, prefix="/api")
+
+startup_state.record("import", _import_started)
@@ -0,0 +1,169 @@
+import os
+import time
+import asyncio
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess, CONTENT_TYPE_LATEST
+)
+
+# Set (by gunicorn.conf.py) when several worker processes serve the app: metrics are
+# then written to files in this directory and /metrics aggregates all workers
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Latency buckets in seconds; model calls and streamed responses run far longer than DB calls
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 45.0, 90.0)
+
+# --- HTTP ---
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status code.", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time until the full response was sent.", ["method", "route"],
+    buckets=REQUEST_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ["method"], multiprocess_mode="livesum"
+)
+
+# --- Model ---
+MODEL_CALL_DURATION = Histogram(
+    "model_call_duration_seconds", "Latency of single model call attempts.", ["kind", "outcome"],
+    buckets=REQUEST_BUCKETS,
+)
+MODEL_RETRIES = Counter("model_retries_total", "Model call attempts that were retried.", ["kind"])
+MODEL_TIMEOUTS = Counter("model_timeouts_total", "Model call attempts that timed out.", ["kind"])
+MODEL_TOKENS = Counter("model_tokens_total", "Tokens reported by the provider's usage metadata.", ["kind", "direction"])
+ANALYSIS_FALLBACKS = Counter(
+    "analysis_fallbacks_total", "Analysis fields or whole analyses served from fallback data.", ["scope"]
+)
+MODEL_QUEUE_WAIT = Histogram(
+    "model_queue_wait_seconds", "Time model calls waited for a fair-share slot.", buckets=REQUEST_BUCKETS
+)
+MODEL_QUEUE_DEPTH = Gauge(
+    "model_queue_depth", "Model calls waiting for a fair-share slot.", multiprocess_mode="livesum"
+)
+QUOTA_REJECTIONS = Counter("quota_rejections_total", "Requests refused by per-user quotas.", ["scope"])
+JSON_PARSES = Counter("model_json_parse_total", "Model outputs parsed, by parse_model_json tier.", ["tier"])
+PROMPT_TOKENS = Histogram(
+    "prompt_budget_tokens", "Estimated tokens per model call before it is sent.", ["kind", "direction"],
+    buckets=(100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000),
+)
+PROMPT_COMPACTION_RATIO = Histogram(
+    "prompt_compaction_ratio", "Pitch tokens inlined into a prompt relative to the submitted pitch.", ["kind"],
+    buckets=(0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0),
+)
+PROMPT_BUDGET_ACTIONS = Counter(
+    "prompt_budget_actions_total", "Pitches compacted, output limits raised and sections dropped to fit the budget.", ["action"]
+)
+REVISION_LOOKUPS = Counter(
+    "revision_lookups_total", "Searches for an earlier version of a submitted pitch, by outcome.", ["outcome"]
+)
+REVISION_RESEMBLANCE = Histogram(
+    "revision_resemblance_ratio", "Estimated trigram resemblance to the closest earlier pitch of the user.",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+REVISION_SIMILARITY = Histogram(
+    "revision_similarity_ratio", "Word-level similarity to the closest earlier pitch of the user.",
+    buckets=(0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 0.98, 1.0),
+)
+
+# --- Infrastructure ---
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds", "Latency of MongoDB commands.", ["command", "outcome"], buckets=FAST_BUCKETS
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "bcrypt time on the hashing pool, excluding queue wait.",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0),
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping task.", buckets=FAST_BUCKETS
+)
+
+EVENT_LOOP_LAG_INTERVAL_SECONDS = 0.5
+
+
+def route_template(scope) -> str:
+    """
+    The matched route's path template, e.g. /api/analysis/{id}, read from the scope the
+    router filled in. Unmatched paths share one label.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = getattr(route, "path_format", None) or getattr(route, "path", "")
+    # Newer FastAPI versions keep include_router() prefixes on the included router, not the route
+    included = scope.get("fastapi", {}).get("included_router")
+    prefix = getattr(getattr(included, "include_context", None), "prefix", "")
+    return f"{prefix}{path}"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request until its last body chunk is sent.
+    Requests are labelled with the matched route template, never the raw path, so
+    label cardinality stays bounded.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            template = route_template(scope)
+            HTTP_REQUEST_DURATION.labels(method, template).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, template, str(status)).inc()
+
+
+def mongo_command_listener():
+    """
+    Builds the command listener recording the latency of every command the driver sends.
+    Defined on demand so importing this module does not import pymongo.
+    """
+    from pymongo import monitoring
+
+    class MongoCommandMetrics(monitoring.CommandListener):
+        # Called synchronously by pymongo, so it only does a histogram observation
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            MONGO_COMMAND_DURATION.labels(event.command_name, "ok").observe(event.duration_micros / 1e6)
+
+        def failed(self, event):
+            MONGO_COMMAND_DURATION.labels(event.command_name, "error").observe(event.duration_micros / 1e6)
+
+    return MongoCommandMetrics()
+
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL_SECONDS):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+
+def render_metrics():
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
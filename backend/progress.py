@@ -0,0 +1,302 @@
+import os
+import logging
+from datetime import datetime
+from database import analyses_collection, user_stats_collection
+from schemas import SCORE_DIMENSIONS
+from text_metrics import METRICS_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Progress Rollup Configuration
+PROGRESS_DAILY_BUCKETS = int(os.getenv("PROGRESS_DAILY_BUCKETS", "90"))
+PROGRESS_WEEKLY_BUCKETS = int(os.getenv("PROGRESS_WEEKLY_BUCKETS", "52"))
+
+# Tracked metrics as paths inside an analysis, which are also their paths inside the rollup
+PROGRESS_METRICS = ["overall_score", "confidence_score"] + [f"scores.{dimension}" for dimension in SCORE_DIMENSIONS]
+# Model-generated fields; values the model fell back on would drag the averages down
+MODEL_METRIC_FIELDS = {"overall_score", "scores"}
+# Only counted from analyses computed by the current METRICS_VERSION
+VERSIONED_METRICS = {"confidence_score"}
+
+KEY_PROJECTION = {"daily_keys": 1, "weekly_keys": 1}
+
+
+def _lookup(document: dict, path: str):
+    for part in path.split("."):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(part)
+    return document
+
+def _assign(document: dict, path: str, value):
+    *parents, leaf = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[leaf] = value
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _day(at: datetime) -> str:
+    return at.strftime("%Y-%m-%d")
+
+def _week(day: str) -> str:
+    year, week, _ = datetime.strptime(day, "%Y-%m-%d").isocalendar()
+    return f"{year}-W{week:02d}"
+
+def _latest(at: datetime, values: dict) -> dict:
+    return {
+        "at": at,
+        "overall_score": values.get("overall_score"),
+        "confidence_score": values.get("confidence_score"),
+        "scores": {d: values[f"scores.{d}"] for d in SCORE_DIMENSIONS if f"scores.{d}" in values},
+    }
+
+
+def analysis_rollup(analysis: dict, created_at: datetime, new: bool = True) -> dict:
+    """
+    One day's contribution of an analysis to its user's rollup. `new` counts the
+    analysis itself; sections filled in later only add their metrics.
+    """
+    fallback = set(analysis.get("fallback_fields") or [])
+    current_metrics = analysis.get("metrics_version") == METRICS_VERSION
+    values = {}
+    for metric in PROGRESS_METRICS:
+        if metric.split(".")[0] in fallback or (metric in VERSIONED_METRICS and not current_metrics):
+            continue
+        value = _lookup(analysis, metric)
+        if _is_number(value):
+            values[metric] = value
+    row = {
+        "day": _day(created_at),
+        "count": 1 if new else 0,
+        "totals": values,
+        "samples": {metric: 1 for metric in values},
+        "best": dict(values),
+    }
+    if "overall_score" in values:
+        row["latest"] = _latest(created_at, values)
+    return row
+
+def rollup_update(rows: list) -> dict:
+    """
+    Folds day rows (from analysis_rollup or the backfill pipeline) into one update of a
+    user's rollup: $inc for counts and sums, $max for best scores. The latest snapshot
+    is left to advance_latest.
+    """
+    inc, best = {"version": 1}, {}
+    days, weeks = set(), set()
+
+    def add(path, amount):
+        inc[path] = inc.get(path, 0) + amount
+
+    for row in rows:
+        day = row["day"]
+        week = _week(day)
+        days.add(day)
+        weeks.add(week)
+        prefixes = ("", f"daily.{day}.", f"weekly.{week}.")
+        if row["count"]:
+            add("analyses", row["count"])
+            add(f"daily.{day}.count", row["count"])
+            add(f"weekly.{week}.count", row["count"])
+        for metric, total in row["totals"].items():
+            for prefix in prefixes:
+                add(f"{prefix}totals.{metric}", total)
+                add(f"{prefix}samples.{metric}", row["samples"][metric])
+        for metric, value in row["best"].items():
+            best[f"best.{metric}"] = max(best.get(f"best.{metric}", value), value)
+
+    update = {"$inc": inc, "$set": {"updated_at": datetime.utcnow()}}
+    if best:
+        update["$max"] = best
+    if days:
+        update["$addToSet"] = {"daily_keys": {"$each": sorted(days)}, "weekly_keys": {"$each": sorted(weeks)}}
+    return update
+
+async def advance_latest(user_id: str, rows: list):
+    """
+    Replaces the rollup's latest snapshot with the newest one among `rows`, unless the
+    stored one is as recent. The guard in the filter keeps concurrent saves in order.
+    """
+    snapshots = [row["latest"] for row in rows if row.get("latest")]
+    if not snapshots:
+        return
+    latest = max(snapshots, key=lambda snapshot: snapshot["at"])
+    await user_stats_collection.update_one(
+        {"_id": user_id, "$or": [{"latest.at": {"$lt": latest["at"]}}, {"latest": {"$exists": False}}]},
+        {"$set": {"latest": latest}},
+    )
+
+async def _trim_buckets(stats: dict):
+    # Bucket keys sort chronologically; only the newest ones are kept
+    unset, pull = {}, {}
+    for name, keep in (("daily", PROGRESS_DAILY_BUCKETS), ("weekly", PROGRESS_WEEKLY_BUCKETS)):
+        keys = sorted(stats.get(f"{name}_keys", []))
+        expired = keys[:max(0, len(keys) - keep)]
+        if expired:
+            unset.update({f"{name}.{key}": "" for key in expired})
+            pull[f"{name}_keys"] = {"$in": expired}
+    if unset:
+        await user_stats_collection.update_one({"_id": stats["_id"]}, {"$unset": unset, "$pull": pull})
+
+async def record_analyses(user_id: str, documents: list, new: bool = True):
+    """
+    Adds stored analyses (dicts with `analysis` and `created_at`) to the user's rollup
+    with one atomic update. With new=False only metrics of sections filled in later
+    are added, and only to rollups that already cover the analysis. Failures are
+    logged, never raised: the rollup must not fail an analysis.
+    """
+    from pymongo import ReturnDocument
+
+    rows = [analysis_rollup(document["analysis"], document["created_at"], new) for document in documents]
+    rows = [row for row in rows if row["count"] or row["totals"]]
+    if not rows:
+        return
+
+    created_at = min(document["created_at"] for document in documents)
+    query = {"_id": user_id}
+    update = rollup_update(rows)
+    if new:
+        # Analyses older than this are left to the backfill
+        update["$setOnInsert"] = {"tracked_since": created_at, "backfilled": False}
+    else:
+        query["$or"] = [{"tracked_since": {"$lte": created_at}}, {"backfilled": True}]
+    try:
+        stats = await user_stats_collection.find_one_and_update(
+            query, update, projection=KEY_PROJECTION, upsert=new, return_document=ReturnDocument.AFTER
+        )
+        if stats:
+            await advance_latest(user_id, rows)
+            await _trim_buckets(stats)
+    except Exception as e:
+        logger.warning(f"Could not update progress rollup of user {user_id}: {e}")
+
+
+def _averages(totals: dict, samples: dict) -> dict:
+    averages = {}
+    for metric in PROGRESS_METRICS:
+        count = _lookup(samples, metric)
+        if count:
+            _assign(averages, metric, round(_lookup(totals, metric) / count, 2))
+    return averages
+
+def _buckets(buckets: dict) -> list:
+    return [
+        {"period": period, "count": bucket.get("count", 0),
+         **_averages(bucket.get("totals", {}), bucket.get("samples", {}))}
+        for period, bucket in sorted(buckets.items())
+    ]
+
+async def get_progress(user_id: str) -> dict:
+    """
+    Reads a user's rollup as served by /user/me/progress: one document, whatever the
+    size of their history. `version` changes with every update.
+    """
+    stats = await user_stats_collection.find_one({"_id": user_id}, {"daily_keys": 0, "weekly_keys": 0})
+    if not stats:
+        return {"version": 0}
+    latest = stats.get("latest")
+    return {
+        "version": stats.get("version", 0),
+        "analyses": stats.get("analyses", 0),
+        "scored_analyses": _lookup(stats, "samples.overall_score") or 0,
+        "average": _averages(stats.get("totals", {}), stats.get("samples", {})),
+        "best": stats.get("best", {}),
+        "latest": {field: value for field, value in latest.items() if value is not None} if latest else None,
+        "daily": _buckets(stats.get("daily", {})),
+        "weekly": _buckets(stats.get("weekly", {})),
+        "backfilled": stats.get("backfilled", False),
+        "updated_at": stats.get("updated_at"),
+    }
+
+
+def _alias(metric: str) -> str:
+    # Accumulator names cannot contain dots
+    return metric.replace(".", "__")
+
+def backfill_pipeline(user_id: str, cutoff: datetime) -> list:
+    """
+    Aggregation grouping a user's analyses created before `cutoff` into one row per
+    day with the count, and per metric the sum, sample count and best value, plus
+    the latest scored snapshot. Uses the (user_id, created_at) index.
+    """
+    fallback = {"$ifNull": ["$analysis.fallback_fields", []]}
+    values = {}
+    for metric in PROGRESS_METRICS:
+        path = f"$analysis.{metric}"
+        value = {"$cond": [{"$isNumber": path}, path, None]}
+        if metric.split(".")[0] in MODEL_METRIC_FIELDS:
+            value = {"$cond": [{"$in": [metric.split(".")[0], fallback]}, None, value]}
+        if metric in VERSIONED_METRICS:
+            value = {"$cond": [{"$eq": ["$analysis.metrics_version", METRICS_VERSION]}, value, None]}
+        values[_alias(metric)] = value
+
+    group = {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, "count": {"$sum": 1}}
+    for alias in values:
+        value = f"$values.{alias}"
+        group[f"total_{alias}"] = {"$sum": value}
+        group[f"samples_{alias}"] = {"$sum": {"$cond": [{"$isNumber": value}, 1, 0]}}
+        group[f"best_{alias}"] = {"$max": value}
+    group["latest"] = {"$max": {"$cond": [
+        {"$isNumber": "$values.overall_score"},
+        {
+            "at": "$created_at",
+            "overall_score": "$values.overall_score",
+            "confidence_score": "$values.confidence_score",
+            "scores": {d: f"$values.{_alias(f'scores.{d}')}" for d in SCORE_DIMENSIONS},
+        },
+        None,
+    ]}}
+    return [
+        {"$match": {"user_id": user_id, "created_at": {"$lt": cutoff}}},
+        {"$project": {"created_at": 1, "values": values}},
+        {"$group": group},
+    ]
+
+def _pipeline_row(result: dict) -> dict:
+    row = {"day": result["_id"], "count": result["count"], "totals": {}, "samples": {}, "best": {}}
+    for metric in PROGRESS_METRICS:
+        alias = _alias(metric)
+        if result.get(f"samples_{alias}"):
+            row["totals"][metric] = result[f"total_{alias}"]
+            row["samples"][metric] = result[f"samples_{alias}"]
+            row["best"][metric] = result[f"best_{alias}"]
+    if result.get("latest"):
+        latest = result["latest"]
+        latest["scores"] = {d: v for d, v in (latest.get("scores") or {}).items() if v is not None}
+        row["latest"] = latest
+    return row
+
+async def backfill_user(user_id: str, started_at: datetime, dry_run: bool = False):
+    """
+    Adds a user's analyses from before their rollup started tracking (or before
+    `started_at` if it has not) to the rollup, once. Returns the number of analyses
+    added, or None if the rollup was already backfilled.
+    """
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+
+    stats = await user_stats_collection.find_one({"_id": user_id}, {"tracked_since": 1, "backfilled": 1})
+    if stats and stats.get("backfilled"):
+        return None
+    cutoff = stats["tracked_since"] if stats else started_at
+    rows = [_pipeline_row(result) async for result in analyses_collection.aggregate(backfill_pipeline(user_id, cutoff))]
+    added = sum(row["count"] for row in rows)
+    if dry_run:
+        return added
+
+    update = rollup_update(rows)
+    update["$set"]["backfilled"] = True
+    update["$setOnInsert"] = {"tracked_since": cutoff}
+    try:
+        stats = await user_stats_collection.find_one_and_update(
+            {"_id": user_id, "backfilled": {"$ne": True}}, update,
+            projection=KEY_PROJECTION, upsert=True, return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Another run backfilled this user in the meantime
+        return None
+    await advance_latest(user_id, rows)
+    await _trim_buckets(stats)
+    return added
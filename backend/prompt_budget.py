@@ -0,0 +1,295 @@
+import os
+import re
+import math
+import logging
+from functools import lru_cache
+from dataclasses import dataclass
+from typing import List, Tuple
+from schemas import ANALYSIS_SECTIONS
+from text_metrics import tokenize, component_matcher
+from ai_providers import GEMINI_GENERATION_CONFIG
+from metrics import PROMPT_TOKENS, PROMPT_COMPACTION_RATIO, PROMPT_BUDGET_ACTIONS
+
+logger = logging.getLogger(__name__)
+
+# Prompt Budget Configuration
+PROMPT_BUDGET_ENABLED = os.getenv("PROMPT_BUDGET_ENABLED", "true").lower() == "true"
+# Pitch tokens inlined into a prompt before the pitch is compacted (~4 characters each)
+PROMPT_PITCH_TOKEN_BUDGET = int(os.getenv("PROMPT_PITCH_TOKEN_BUDGET", "2000"))
+PROMPT_CHARS_PER_TOKEN = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4"))
+# Ceiling for max_output_tokens when it is raised for long pitches
+PROMPT_MAX_OUTPUT_TOKENS = int(os.getenv("PROMPT_MAX_OUTPUT_TOKENS", "8192"))
+# Generation time a full analysis should fit in; optional sections are dropped to get there
+PROMPT_LATENCY_TARGET_SECONDS = float(os.getenv("PROMPT_LATENCY_TARGET_SECONDS", "30"))
+# Provider throughput the generation time is predicted from
+MODEL_BASE_LATENCY_SECONDS = float(os.getenv("MODEL_BASE_LATENCY_SECONDS", "0.5"))
+MODEL_PREFILL_TOKENS_PER_SECOND = float(os.getenv("MODEL_PREFILL_TOKENS_PER_SECOND", "5000"))
+MODEL_OUTPUT_TOKENS_PER_SECOND = float(os.getenv("MODEL_OUTPUT_TOKENS_PER_SECOND", "150"))
+# Sections left out of an oversized full analysis, in this order; they are generated when first read
+PROMPT_OPTIONAL_SECTIONS = [
+    section.strip() for section in os.getenv("PROMPT_OPTIONAL_SECTIONS", "coaching,slides,summaries").split(",")
+    if section.strip() in ANALYSIS_SECTIONS
+]
+
+DEFAULT_MAX_OUTPUT_TOKENS = GEMINI_GENERATION_CONFIG["max_output_tokens"]
+# Output tokens are estimated with this much room to spare before max_output_tokens is set
+OUTPUT_TOKEN_HEADROOM = 1.25
+# Typical output tokens per generated field as prompted; improved_pitch grows with the pitch
+FIELD_OUTPUT_TOKENS = {
+    "scores": 80, "overall_score": 8, "strengths": 60, "weaknesses": 60, "suggestions": 80,
+    "improved_pitch": 40, "improvement_metrics": 30, "checklist": 90, "slides": 300,
+    "summaries": 250, "suggested_resources": 160, "practice_questions": 80, "personalized_roadmap": 150,
+}
+# Inserted where key-sentence extraction left text out
+ELISION = "[...]"
+
+SPACES = re.compile(r"[^\S\n]+")
+LINE_BREAKS = re.compile(r"\n{3,}")
+# Like text_metrics.SENTENCE_BREAK, but keeping the punctuation with each sentence
+SENTENCES = re.compile(r".+?(?:[.!?]+(?=\s|$)|$)", re.MULTILINE)
+DIGIT = re.compile(r"\d")
+# Page numbers, separator rules and legal footers that decks and exports repeat on every page
+BOILERPLATE_LINE = re.compile(
+    r"^(?:(?:page|slide)\s*)?\d+(?:\s*(?:of|/)\s*\d+)?$|^[\W_]+$|confidential|all rights reserved|copyright|^©",
+    re.IGNORECASE,
+)
+BOILERPLATE_MAX_WORDS = 8
+# Shorter sentences ("Why now?") may legitimately repeat
+REPEATED_SENTENCE_MIN_WORDS = 4
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can for from has have in is it its of on or our so that the "
+    "their they this to was we were will with you your which who what how".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / PROMPT_CHARS_PER_TOKEN)
+
+
+@dataclass(frozen=True)
+class Compaction:
+    text: str
+    original_tokens: int
+    tokens: int
+    stages: Tuple[str, ...] = ()
+
+    @property
+    def ratio(self) -> float:
+        return round(self.tokens / self.original_tokens, 4) if self.original_tokens else 1.0
+
+
+def _normalize_whitespace(text: str) -> str:
+    lines = [SPACES.sub(" ", line).strip() for line in text.strip().splitlines()]
+    return LINE_BREAKS.sub("\n\n", "\n".join(lines))
+
+def _drop_boilerplate(text: str) -> str:
+    # Repeated lines (headers and footers of every slide) and repeated sentences are kept once
+    seen, seen_sentences, kept = set(), set(), []
+    for line in text.split("\n"):
+        key = " ".join(tokenize(line))
+        if line and (key in seen or (len(key.split()) <= BOILERPLATE_MAX_WORDS and BOILERPLATE_LINE.search(line))):
+            continue
+        if key:
+            seen.add(key)
+        sentences = []
+        for match in SENTENCES.finditer(line):
+            sentence_key = " ".join(tokenize(match.group()))
+            if sentence_key.count(" ") >= REPEATED_SENTENCE_MIN_WORDS - 1:
+                if sentence_key in seen_sentences:
+                    continue
+                seen_sentences.add(sentence_key)
+            sentences.append(match.group().strip())
+        if sentences or not line:
+            kept.append(" ".join(sentences))
+    return LINE_BREAKS.sub("\n\n", "\n".join(kept)).strip()
+
+def _key_sentences(text: str, budget: int) -> str:
+    """
+    Keeps the highest-scoring sentences that fit `budget` tokens, in their original
+    order. Sentences score by the pitch-wide frequency of their content words, plus a
+    bonus for mentioning a pitch component (problem, traction, ask, ...) few other
+    sentences cover, and for figures. The opening and closing sentences always stay.
+    """
+    sentences = [match.group().strip() for match in SENTENCES.finditer(text)]
+    sentences = [sentence for sentence in sentences if sentence]
+    tokens = [tokenize(sentence) for sentence in sentences]
+    words = [[token for token in sentence_tokens if token not in STOPWORDS and len(token) > 2] for sentence_tokens in tokens]
+    components = [{component for component, _ in component_matcher.count(sentence_tokens)} for sentence_tokens in tokens]
+
+    frequency, mentions = {}, {}
+    for sentence_words, sentence_components in zip(words, components):
+        for word in set(sentence_words):
+            frequency[word] = frequency.get(word, 0) + 1
+        for component in sentence_components:
+            mentions[component] = mentions.get(component, 0) + 1
+
+    salience = [sum(frequency[word] for word in sentence_words) / (len(sentence_words) + 1) for sentence_words in words]
+    top_salience = max(salience, default=0) or 1
+
+    def score(i):
+        coverage = sum(1 / mentions[component] for component in components[i])
+        figures = 0.5 if DIGIT.search(sentences[i]) else 0.0
+        return salience[i] / top_salience + 2 * coverage + figures
+
+    forced = {0, len(sentences) - 1}
+    ranked = sorted(forced) + sorted((i for i in range(len(sentences)) if i not in forced), key=score, reverse=True)
+    chosen, used = set(), 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost > budget and i not in forced:
+            continue
+        chosen.add(i)
+        used += cost
+
+    parts, previous = [], -1
+    for i in sorted(chosen):
+        if i > previous + 1:
+            parts.append(ELISION)
+        parts.append(sentences[i])
+        previous = i
+    return " ".join(parts)
+
+@lru_cache(maxsize=256)
+def compact_pitch(pitch_text: str, budget: int = PROMPT_PITCH_TOKEN_BUDGET) -> Compaction:
+    """
+    Fits a pitch into `budget` tokens for inlining into a prompt, applying only as many
+    stages as needed: collapsing whitespace, dropping repeated and boilerplate lines,
+    then extracting key sentences. Cached, so repair prompts reuse the result.
+    """
+    original = estimate_tokens(pitch_text)
+    if not PROMPT_BUDGET_ENABLED or original <= budget:
+        return Compaction(pitch_text, original, original)
+
+    text, stages = pitch_text, []
+    for stage, compact in (
+        ("whitespace", _normalize_whitespace),
+        ("boilerplate", _drop_boilerplate),
+        ("key_sentences", lambda text: _key_sentences(text, budget)),
+    ):
+        compacted = compact(text)
+        if compacted != text:
+            text = compacted
+            stages.append(stage)
+        if estimate_tokens(text) <= budget:
+            break
+    return Compaction(text, original, estimate_tokens(text), tuple(stages))
+
+
+@dataclass
+class OutputBudget:
+    fields: List[str]
+    prompt_tokens: int
+    output_tokens: int  # expected
+    max_output_tokens: int
+    estimated_seconds: float
+    dropped_sections: List[str]
+    scaled: bool = False  # max_output_tokens raised above the requested limit
+
+def expected_output_tokens(fields: list, pitch_tokens: int) -> int:
+    # The refined pitch comes out about as long as the pitch it was refined from
+    return sum(FIELD_OUTPUT_TOKENS.get(field, 0) for field in fields) + (pitch_tokens if "improved_pitch" in fields else 0)
+
+def estimated_seconds(prompt_tokens: int, output_tokens: int) -> float:
+    return (MODEL_BASE_LATENCY_SECONDS + prompt_tokens / MODEL_PREFILL_TOKENS_PER_SECOND
+            + output_tokens / MODEL_OUTPUT_TOKENS_PER_SECOND)
+
+def plan_output(prompt: str, pitch_tokens: int, fields: list, optional: bool = False,
+                max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS) -> OutputBudget:
+    """
+    Sizes max_output_tokens for generating `fields` from `prompt`: the given limit,
+    raised (up to PROMPT_MAX_OUTPUT_TOKENS) when the expected output would not fit it.
+    With `optional`, sections in PROMPT_OPTIONAL_SECTIONS are dropped while the output
+    would exceed that ceiling or the predicted time PROMPT_LATENCY_TARGET_SECONDS.
+    """
+    prompt_tokens = estimate_tokens(prompt)
+    fields, dropped = list(fields), []
+
+    def over_budget():
+        output = expected_output_tokens(fields, pitch_tokens)
+        return (output * OUTPUT_TOKEN_HEADROOM > PROMPT_MAX_OUTPUT_TOKENS
+                or estimated_seconds(prompt_tokens, output) > PROMPT_LATENCY_TARGET_SECONDS)
+
+    if PROMPT_BUDGET_ENABLED and optional:
+        for section in PROMPT_OPTIONAL_SECTIONS:
+            if not over_budget():
+                break
+            if set(ANALYSIS_SECTIONS[section]) <= set(fields):
+                fields = [field for field in fields if field not in ANALYSIS_SECTIONS[section]]
+                dropped.append(section)
+
+    output = expected_output_tokens(fields, pitch_tokens)
+    limit = max_output_tokens
+    if PROMPT_BUDGET_ENABLED:
+        limit = max(max_output_tokens, min(PROMPT_MAX_OUTPUT_TOKENS, math.ceil(output * OUTPUT_TOKEN_HEADROOM)))
+    return OutputBudget(
+        fields, prompt_tokens, output, limit, round(estimated_seconds(prompt_tokens, output), 2), dropped,
+        scaled=limit > max_output_tokens,
+    )
+
+
+class PromptBudgetStats:
+    """
+    Estimated prompt and output tokens, compaction ratios and budget actions per kind of
+    request, and the characters per token the provider actually reported, to check
+    PROMPT_CHARS_PER_TOKEN against.
+    """
+    def __init__(self):
+        self.requests = {}
+        self.compacted = 0
+        self.original_tokens = 0
+        self.compacted_tokens = 0
+        self.stages = {}
+        self.output_scaled = 0
+        self.dropped_sections = {}
+        self.prompt_chars = 0
+        self.reported_prompt_tokens = 0
+
+    def record(self, kind: str, budget: OutputBudget, compaction: Compaction = None):
+        # Prompts without the pitch inlined (revisions) have no compaction
+        compaction = compaction or Compaction("", 0, 0)
+        self.requests[kind] = self.requests.get(kind, 0) + 1
+        PROMPT_TOKENS.labels(kind, "prompt").observe(budget.prompt_tokens)
+        PROMPT_TOKENS.labels(kind, "output").observe(budget.output_tokens)
+        if compaction.original_tokens:
+            PROMPT_COMPACTION_RATIO.labels(kind).observe(compaction.ratio)
+        if compaction.stages:
+            self.compacted += 1
+            self.original_tokens += compaction.original_tokens
+            self.compacted_tokens += compaction.tokens
+            for stage in compaction.stages:
+                self.stages[stage] = self.stages.get(stage, 0) + 1
+            PROMPT_BUDGET_ACTIONS.labels("compacted").inc()
+        if budget.scaled:
+            self.output_scaled += 1
+            PROMPT_BUDGET_ACTIONS.labels("output_scaled").inc()
+        for section in budget.dropped_sections:
+            self.dropped_sections[section] = self.dropped_sections.get(section, 0) + 1
+            PROMPT_BUDGET_ACTIONS.labels("section_dropped").inc()
+        if compaction.stages or budget.dropped_sections:
+            logger.info(
+                f"Prompt budget ({kind}): pitch {compaction.original_tokens} -> {compaction.tokens} tokens "
+                f"via {list(compaction.stages)}, ~{budget.prompt_tokens} prompt + {budget.output_tokens} output tokens "
+                f"(max {budget.max_output_tokens}, ~{budget.estimated_seconds}s), dropped {budget.dropped_sections}."
+            )
+
+    def record_usage(self, prompt: str, prompt_tokens: int):
+        if prompt_tokens:
+            self.prompt_chars += len(prompt)
+            self.reported_prompt_tokens += prompt_tokens
+
+    def stats(self) -> dict:
+        return {
+            "enabled": PROMPT_BUDGET_ENABLED,
+            "pitch_token_budget": PROMPT_PITCH_TOKEN_BUDGET,
+            "latency_target_seconds": PROMPT_LATENCY_TARGET_SECONDS,
+            "requests": dict(self.requests),
+            "compacted": self.compacted,
+            "compaction_ratio": round(self.compacted_tokens / self.original_tokens, 4) if self.original_tokens else 1.0,
+            "compaction_stages": dict(self.stages),
+            "output_scaled": self.output_scaled,
+            "dropped_sections": dict(self.dropped_sections),
+            "observed_chars_per_token": round(self.prompt_chars / self.reported_prompt_tokens, 2) if self.reported_prompt_tokens else None,
+        }
+
+
+prompt_budget_stats = PromptBudgetStats()
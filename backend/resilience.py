@@ -0,0 +1,349 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from ai_providers import get_provider, GenerationRequest, GenerationResponse, ProviderError, RateLimitedError
+from metrics import MODEL_CALL_DURATION, MODEL_RETRIES, MODEL_TIMEOUTS
+from fairshare import model_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Circuit Breaker Configuration
+MODEL_BREAKER_WINDOW_SECONDS = float(os.getenv("MODEL_BREAKER_WINDOW_SECONDS", "60"))
+MODEL_BREAKER_MIN_CALLS = int(os.getenv("MODEL_BREAKER_MIN_CALLS", "10"))
+MODEL_BREAKER_FAILURE_RATE = float(os.getenv("MODEL_BREAKER_FAILURE_RATE", "0.5"))
+MODEL_BREAKER_COOLDOWN_SECONDS = float(os.getenv("MODEL_BREAKER_COOLDOWN_SECONDS", "30"))
+MODEL_BREAKER_HALF_OPEN_CALLS = int(os.getenv("MODEL_BREAKER_HALF_OPEN_CALLS", "1"))
+
+# Timeout and Retry Configuration
+MODEL_TIMEOUT_MIN_SECONDS = float(os.getenv("MODEL_TIMEOUT_MIN_SECONDS", "5"))
+MODEL_TIMEOUT_MAX_SECONDS = float(os.getenv("MODEL_TIMEOUT_MAX_SECONDS", "45"))
+MODEL_TIMEOUT_P99_MULTIPLIER = float(os.getenv("MODEL_TIMEOUT_P99_MULTIPLIER", "2"))
+MODEL_LATENCY_MIN_SAMPLES = int(os.getenv("MODEL_LATENCY_MIN_SAMPLES", "20"))
+MODEL_CALL_DEADLINE_SECONDS = float(os.getenv("MODEL_CALL_DEADLINE_SECONDS", "60"))
+MODEL_MAX_ATTEMPTS = int(os.getenv("MODEL_MAX_ATTEMPTS", "2"))
+MODEL_BACKOFF_BASE_SECONDS = float(os.getenv("MODEL_BACKOFF_BASE_SECONDS", "0.5"))
+MODEL_BACKOFF_MAX_SECONDS = float(os.getenv("MODEL_BACKOFF_MAX_SECONDS", "8"))
+MODEL_STREAM_CHUNK_TIMEOUT_SECONDS = float(os.getenv("MODEL_STREAM_CHUNK_TIMEOUT_SECONDS", "45"))
+
+# Hedging sends a duplicate request once the p95 latency has elapsed; it costs extra calls
+MODEL_HEDGING_ENABLED = os.getenv("MODEL_HEDGING_ENABLED", "false").lower() == "true"
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(ProviderError):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Model circuit breaker is open, retry in {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Opens when the failure rate over a sliding time window crosses a threshold, rejects
+    calls while open, then lets a few probe calls through (half-open) to decide whether
+    to close again.
+    """
+    def __init__(self, window_seconds: float, min_calls: int, failure_rate: float,
+                 cooldown_seconds: float, half_open_calls: int):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.half_open_calls = half_open_calls
+        self.state = BREAKER_CLOSED
+        self._outcomes = deque()
+        self._opened_at = 0.0
+        self._probes = 0
+        self.opened = 0
+        self.rejected = 0
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.cooldown_seconds - time.monotonic())
+
+    def before_call(self):
+        """
+        Raises CircuitOpenError when the call must not reach the provider.
+        """
+        if self.state == BREAKER_OPEN:
+            if self.retry_after() > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.retry_after())
+            self.state = BREAKER_HALF_OPEN
+            self._probes = 0
+            logger.info("Model circuit breaker half-open, probing the provider.")
+        if self.state == BREAKER_HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.cooldown_seconds)
+            self._probes += 1
+
+    def record_success(self):
+        if self.state == BREAKER_HALF_OPEN:
+            self.state = BREAKER_CLOSED
+            self._outcomes.clear()
+            logger.info("Model circuit breaker closed.")
+        self._record(True)
+
+    def release(self):
+        """
+        Returns the probe slot of a call that was cancelled before it had an outcome.
+        """
+        if self.state == BREAKER_HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record_failure(self):
+        if self.state == BREAKER_HALF_OPEN:
+            self._open()
+            return
+        self._record(False)
+        if self.state == BREAKER_CLOSED and len(self._outcomes) >= self.min_calls \
+                and self.current_failure_rate() >= self.failure_rate:
+            self._open()
+
+    def _record(self, ok: bool):
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        self._trim(now)
+
+    def _open(self):
+        self.state = BREAKER_OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        logger.warning(f"Model circuit breaker opened for {self.cooldown_seconds}s.")
+
+    def current_failure_rate(self) -> float:
+        self._trim(time.monotonic())
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def stats(self) -> dict:
+        if self.state == BREAKER_OPEN and self.retry_after() <= 0:
+            state = BREAKER_HALF_OPEN
+        else:
+            state = self.state
+        return {
+            "state": state,
+            "failure_rate": round(self.current_failure_rate(), 3),
+            "window_calls": len(self._outcomes),
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_after_seconds": round(self.retry_after(), 1) if state == BREAKER_OPEN else 0.0,
+        }
+
+
+class LatencyTracker:
+    """
+    Sliding window of successful call latencies used to derive timeouts and hedge delays.
+    """
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def ready(self) -> bool:
+        return len(self._samples) >= MODEL_LATENCY_MIN_SAMPLES
+
+    def percentile(self, pct: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def timeout(self) -> float:
+        # Until enough samples exist the static ceiling applies
+        if not self.ready():
+            return MODEL_TIMEOUT_MAX_SECONDS
+        adaptive = self.percentile(99) * MODEL_TIMEOUT_P99_MULTIPLIER
+        return min(MODEL_TIMEOUT_MAX_SECONDS, max(MODEL_TIMEOUT_MIN_SECONDS, adaptive))
+
+    def stats(self) -> dict:
+        return {
+            "samples": len(self._samples),
+            "p50_seconds": round(self.percentile(50), 3),
+            "p95_seconds": round(self.percentile(95), 3),
+            "p99_seconds": round(self.percentile(99), 3),
+            "timeout_seconds": round(self.timeout(), 2),
+        }
+
+
+class ResilientModelClient:
+    """
+    Wraps the configured provider with a circuit breaker, per-kind adaptive timeouts,
+    retries with jittered exponential backoff that honour 429 retry hints, an overall
+    deadline and optional request hedging.
+    """
+    def __init__(self, breaker: CircuitBreaker, hedging: bool = MODEL_HEDGING_ENABLED):
+        self.breaker = breaker
+        self.hedging = hedging
+        self._latency = {}
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+        self.hedges = 0
+        self.hedges_skipped = 0
+        self.hedge_wins = 0
+
+    def latency(self, kind: str) -> LatencyTracker:
+        if kind not in self._latency:
+            self._latency[kind] = LatencyTracker()
+        return self._latency[kind]
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        # "Full jitter": a random delay up to the exponential cap spreads retries out
+        return random.uniform(0, min(MODEL_BACKOFF_MAX_SECONDS, MODEL_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    async def generate(self, request: GenerationRequest, attempts: int = MODEL_MAX_ATTEMPTS) -> GenerationResponse:
+        """
+        Returns the provider response. Raises CircuitOpenError without calling the
+        provider while the breaker is open, asyncio.TimeoutError when the final attempt
+        timed out, and the provider's error when the final attempt failed.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + MODEL_CALL_DEADLINE_SECONDS
+        tracker = self.latency(request.kind)
+        self.calls += 1
+
+        for attempt in range(attempts):
+            # Backoff sleeps happen outside the slot, so waiting users get it meanwhile
+            async with model_scheduler.slot():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    # Spent the whole deadline queued: overload here, not a provider failure
+                    raise asyncio.TimeoutError()
+                self.breaker.before_call()
+                started = loop.time()
+                try:
+                    response = await self._attempt(request, tracker, min(tracker.timeout(), remaining))
+                except asyncio.CancelledError:
+                    self.breaker.release()
+                    raise
+                except asyncio.TimeoutError as e:
+                    self.timeouts += 1
+                    MODEL_TIMEOUTS.labels(request.kind).inc()
+                    logger.error(f"AI Provider Timeout (Attempt {attempt+1})")
+                    error, delay, outcome = e, self.backoff(attempt), "timeout"
+                except RateLimitedError as e:
+                    self.rate_limited += 1
+                    logger.warning(f"AI Provider rate limited (Attempt {attempt+1}), retry hint {e.retry_after}s")
+                    error, delay, outcome = e, max(e.retry_after or 0.0, self.backoff(attempt)), "rate_limited"
+                except Exception as e:
+                    logger.error(f"AI Provider Error: {e}")
+                    error, delay, outcome = e, self.backoff(attempt), "error"
+                else:
+                    elapsed = loop.time() - started
+                    self.breaker.record_success()
+                    tracker.record(elapsed)
+                    MODEL_CALL_DURATION.labels(request.kind, "ok").observe(elapsed)
+                    return response
+
+                MODEL_CALL_DURATION.labels(request.kind, outcome).observe(loop.time() - started)
+                self.breaker.record_failure()
+            # Give up early when the next attempt could not start before the deadline
+            if attempt == attempts - 1 or loop.time() + delay >= deadline - MODEL_TIMEOUT_MIN_SECONDS:
+                raise error
+            self.retries += 1
+            MODEL_RETRIES.labels(request.kind).inc()
+            await asyncio.sleep(delay)
+
+    async def _attempt(self, request: GenerationRequest, tracker: LatencyTracker, timeout: float) -> GenerationResponse:
+        provider = get_provider()
+        if not (self.hedging and tracker.ready()):
+            return await asyncio.wait_for(provider.generate(request), timeout=timeout)
+
+        primary = asyncio.ensure_future(provider.generate(request))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=min(tracker.percentile(95), timeout))
+            # The hedge needs a slot of its own; with none free it would take capacity from queued calls
+            if not done and model_scheduler.try_acquire():
+                self.hedges += 1
+                hedge = asyncio.ensure_future(provider.generate(request))
+                hedge.add_done_callback(lambda _: model_scheduler.release())
+                tasks.append(hedge)
+            elif not done:
+                self.hedges_skipped += 1
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout - min(tracker.percentile(95), timeout)
+            pending = set(tasks)
+            error = None
+            # The first successful response wins; a failed one leaves the other racing
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stream(self, request: GenerationRequest):
+        """
+        Yields the provider's text chunks behind the circuit breaker, with a timeout per chunk.
+        The stream holds a model slot until it ends.
+        """
+        async with model_scheduler.slot():
+            self.breaker.before_call()
+            self.calls += 1
+            chunks = get_provider().stream(request).__aiter__()
+            try:
+                while True:
+                    try:
+                        text = await asyncio.wait_for(chunks.__anext__(), timeout=MODEL_STREAM_CHUNK_TIMEOUT_SECONDS)
+                    except StopAsyncIteration:
+                        break
+                    yield text
+            except (asyncio.CancelledError, GeneratorExit):
+                self.breaker.release()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.stats(),
+            "calls": self.calls,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "rate_limited": self.rate_limited,
+            "hedging_enabled": self.hedging,
+            "hedges": self.hedges,
+            "hedges_skipped": self.hedges_skipped,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": round(self.hedge_wins / self.hedges, 3) if self.hedges else 0.0,
+            "latency": {kind: tracker.stats() for kind, tracker in sorted(self._latency.items())},
+        }
+
+
+model_client = ResilientModelClient(
+    CircuitBreaker(
+        window_seconds=MODEL_BREAKER_WINDOW_SECONDS,
+        min_calls=MODEL_BREAKER_MIN_CALLS,
+        failure_rate=MODEL_BREAKER_FAILURE_RATE,
+        cooldown_seconds=MODEL_BREAKER_COOLDOWN_SECONDS,
+        half_open_calls=MODEL_BREAKER_HALF_OPEN_CALLS,
+    )
+)
@@ -0,0 +1,147 @@
+import os
+import re
+import heapq
+import hashlib
+import difflib
+from text_metrics import tokenize, METRICS_VERSION
+from metrics import REVISION_LOOKUPS, REVISION_RESEMBLANCE, REVISION_SIMILARITY
+
+# Revision Reuse Configuration
+REVISION_REUSE_ENABLED = os.getenv("REVISION_REUSE_ENABLED", "true").lower() == "true"
+# Estimated share of word trigrams an earlier pitch must have in common to be diffed at all
+REVISION_MIN_RESEMBLANCE = float(os.getenv("REVISION_MIN_RESEMBLANCE", "0.5"))
+# Share of words two pitches must have in common, from a word-level diff, to reuse the earlier analysis
+REVISION_MIN_SIMILARITY = float(os.getenv("REVISION_MIN_SIMILARITY", "0.85"))
+# Earlier analyses sharing a sketch value that are compared per lookup
+REVISION_CANDIDATES = int(os.getenv("REVISION_CANDIDATES", "20"))
+
+# Bottom-k MinHash: the k smallest trigram hashes of a pitch. Pitches with a high
+# resemblance almost surely share some of them, which is what the index looks up.
+SKETCH_SIZE = 32
+SHINGLE_SIZE = 3  # word trigrams; minhash_sketch mixes exactly three word hashes
+# Lookups this close below a threshold are counted as near misses, to help tune it
+NEAR_MISS_MARGIN = 0.1
+DIFF_CONTEXT_WORDS = 6
+
+HASH_MASK = (1 << 63) - 1  # 63 bits so every value fits a signed BSON int64
+
+WORDS = re.compile(r"\S+")
+
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+def minhash_sketch(text: str) -> list:
+    """
+    Bottom-k MinHash sketch of the word trigrams of a pitch, in ascending order. Each
+    distinct word is hashed once and trigram hashes are mixed from those, so a
+    15k-character pitch takes about 3 ms.
+    """
+    tokens = tokenize(text)
+    word_hashes = {token: _token_hash(token) for token in set(tokens)}
+    hashes = [word_hashes[token] for token in tokens]
+    if len(hashes) < SHINGLE_SIZE:
+        hashes += [0] * (SHINGLE_SIZE - len(hashes))
+    shingles = {
+        ((a * 0x9E3779B97F4A7C15) ^ (b * 0xC2B2AE3D27D4EB4F) ^ c) & HASH_MASK
+        for a, b, c in zip(hashes, hashes[1:], hashes[2:])
+    }
+    return heapq.nsmallest(SKETCH_SIZE, shingles)
+
+def resemblance(a: list, b: list) -> float:
+    """
+    Estimated Jaccard similarity of the trigram sets behind two sketches: the share of
+    the k smallest values of their union that both sketches contain.
+    """
+    if not a or not b:
+        return 0.0
+    both = set(a) & set(b)
+    union = heapq.nsmallest(SKETCH_SIZE, set(a) | set(b))
+    return sum(1 for value in union if value in both) / len(union)
+
+
+def pitch_diff(old_text: str, new_text: str) -> dict:
+    """
+    Word-level diff of two pitch versions: the similarity ratio, the number of words
+    changed and a compact listing of the changes with some surrounding context.
+    """
+    old_words, new_words = WORDS.findall(old_text), WORDS.findall(new_text)
+    matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+    lines, changed = [], 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        changed += max(i2 - i1, j2 - j1)
+        before = " ".join(new_words[max(0, j1 - DIFF_CONTEXT_WORDS):j1])
+        after = " ".join(new_words[j2:j2 + DIFF_CONTEXT_WORDS])
+        lines.append(f"@ ...{before} [HERE] {after}...")
+        if i2 > i1:
+            lines.append(f"- {' '.join(old_words[i1:i2])}")
+        if j2 > j1:
+            lines.append(f"+ {' '.join(new_words[j1:j2])}")
+    return {"similarity": matcher.ratio(), "changed_words": changed, "text": "\n".join(lines)}
+
+def _difference(new, old):
+    if isinstance(new, (int, float)) and isinstance(old, (int, float)):
+        return round(new - old, 2)
+    return None
+
+def revision_delta(previous: dict, analysis: dict) -> dict:
+    """
+    Change of the headline metrics from the previous version of a pitch to this one.
+    The confidence score is only compared when the previous one was computed by the
+    same METRICS_VERSION.
+    """
+    same_metrics = previous.get("metrics_version") == METRICS_VERSION
+    delta = {
+        "overall_score": _difference(analysis.get("overall_score"), previous.get("overall_score")),
+        "confidence_score": _difference(analysis.get("confidence_score"), previous.get("confidence_score")) if same_metrics else None,
+        "scores": {
+            dimension: _difference(value, previous.get("scores", {}).get(dimension))
+            for dimension, value in analysis.get("scores", {}).items()
+            if _difference(value, previous.get("scores", {}).get(dimension)) is not None
+        },
+    }
+    for metric in ("word_count", "filler_count"):
+        delta[metric] = _difference(
+            analysis.get("text_metrics", {}).get(metric), (previous.get("text_metrics") or {}).get(metric)
+        )
+    return {metric: value for metric, value in delta.items() if value is not None}
+
+
+class RevisionStats:
+    """
+    Outcomes of revision lookups. Near misses (best candidate just below a threshold) are
+    counted separately so REVISION_MIN_RESEMBLANCE and REVISION_MIN_SIMILARITY can be tuned.
+    """
+    def __init__(self):
+        self.outcomes = {}
+        self.near_misses = {"resemblance": 0, "similarity": 0}
+
+    def _observe(self, name: str, value: float, threshold: float, histogram):
+        histogram.observe(value)
+        if threshold - NEAR_MISS_MARGIN <= value < threshold:
+            self.near_misses[name] += 1
+
+    def record(self, outcome: str, resemblance: float = None, similarity: float = None):
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        REVISION_LOOKUPS.labels(outcome).inc()
+        if resemblance is not None:
+            self._observe("resemblance", resemblance, REVISION_MIN_RESEMBLANCE, REVISION_RESEMBLANCE)
+        if similarity is not None:
+            self._observe("similarity", similarity, REVISION_MIN_SIMILARITY, REVISION_SIMILARITY)
+
+    def stats(self) -> dict:
+        lookups = sum(self.outcomes.values())
+        return {
+            "enabled": REVISION_REUSE_ENABLED,
+            "min_resemblance": REVISION_MIN_RESEMBLANCE,
+            "min_similarity": REVISION_MIN_SIMILARITY,
+            "lookups": lookups,
+            "reuse_rate": round(self.outcomes.get("reused", 0) / lookups, 4) if lookups else 0.0,
+            "outcomes": dict(self.outcomes),
+            "near_misses": dict(self.near_misses),
+        }
+
+
+revision_stats = RevisionStats()
@@ -1,14 +1,41 @@
-from fastapi import APIRouter, HTTPException, Path, Depends
+from fastapi import APIRouter, HTTPException, Path, Query, Depends, BackgroundTasks, Request
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from schemas import (
     PitchRequest, AnalysisResponse, AnalysisResult, 
-    UserCreate, UserLogin, UserOut, Token
+    UserCreate, UserLogin, UserOut, Token, JobAccepted, JobStatus, AnalysisPage, UserProgress, ANALYSIS_SECTIONS
 )
-from database import analyses_collection, users_collection
-from ai_service import analyze_pitch_with_gemini
-from auth import get_password_hash, verify_password, create_access_token, decode_token
+from database import users_collection
+from ai_service import (
+    analyze_pitch_with_gemini, analyze_pitch_sections, stream_pitch_analysis, iter_pitch_sections,
+    analyze_pitch_revision, analysis_flights, analysis_leases, generation_stats
+)
+from analysis_store import (
+    save_analysis, list_analysis_summaries, get_analysis_document, get_analysis_revision,
+    missing_sections, required_sections, find_revision_base
+)
+from revisions import revision_stats
+from prompt_budget import prompt_budget_stats
+from export import stream_export, EXPORTABLE_FIELDS, DEFAULT_EXPORT_FIELDS, EXPORT_MEDIA_TYPES
+from jobs import analysis_jobs, QueueFullError
+from batch import parse_batch_items, validate_batch_items, run_analysis_batch, BatchFormatError
+from cache import analysis_cache
+from resilience import model_client
+from auth import (
+    get_password_hash_async, verify_password_async, password_needs_rehash,
+    password_hasher, create_access_token, decode_token, build_token_claims,
+    principal_cache, invalidate_principal, DEFAULT_ROLE, ADMIN_ROLE
+)
+from startup import startup_state
+from progress import get_progress
+from fairshare import model_scheduler, user_quotas, set_model_user, QuotaExceededError
+from utils import encode_cursor, decode_cursor, json_parse_stats, make_etag, etag_matches
 from bson import ObjectId
+from typing import Optional
 from datetime import datetime
+import os
+import math
+import json
 import logging
 
 router = APIRouter()
@@ -16,16 +43,99 @@ logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Complete analyses never change again; partial ones gain sections (and a new version) later
+CACHE_CONTROL_IMMUTABLE = "private, max-age=31536000, immutable"
+CACHE_CONTROL_REVALIDATE = "private, no-cache"
+
+SECTIONS_QUERY_DESCRIPTION = f"Comma-separated subset of sections to generate: {', '.join(ANALYSIS_SECTIONS)}."
+
+def parse_sections(value: Optional[str]) -> Optional[list]:
+    """
+    Parses the `sections` query parameter. None means the full analysis.
+    """
+    if not value:
+        return None
+    sections = [section.strip() for section in value.split(",") if section.strip()]
+    unknown = [section for section in sections if section not in ANALYSIS_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}.")
+    if set(sections) >= set(ANALYSIS_SECTIONS):
+        return None
+    return [section for section in ANALYSIS_SECTIONS if section in sections]
+
+PROJECTABLE_FIELDS = ["original_pitch"] + list(AnalysisResult.model_fields)
+
+def parse_fields(value: Optional[str]) -> Optional[list]:
+    """
+    Parses the `fields` projection parameter. None means every field.
+    """
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in PROJECTABLE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}.")
+    return fields
+
+def parse_export_fields(value: Optional[str]) -> list:
+    if not value:
+        return DEFAULT_EXPORT_FIELDS
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in EXPORTABLE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}.")
+    return fields
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     payload = decode_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     email = payload.get("sub")
-    user = await users_collection.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    user["id"] = str(user["_id"])
-    return user
+    uid = payload.get("uid")
+    version = payload.get("ver", 0)
+
+    user = principal_cache.get(email)
+    # Tokens carrying a uid claim must match the cached account (guards re-registered emails).
+    # A token newer than the cached principal was issued after a change made on another worker.
+    if user is None or (uid is not None and user["id"] != uid) or version > user["token_version"]:
+        if uid and ObjectId.is_valid(uid):
+            user = await users_collection.find_one({"_id": ObjectId(uid), "email": email})
+        else:
+            user = await users_collection.find_one({"email": email})
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        user.pop("password", None)
+        user["id"] = str(user["_id"])
+        user.setdefault("role", DEFAULT_ROLE)
+        user.setdefault("token_version", 0)
+        principal_cache.set(email, user)
+
+    if version < user["token_version"]:
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    # Model calls made for this request are scheduled and charged to this user
+    set_model_user(user["id"], user["role"])
+    return dict(user)
+
+async def require_admin(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != ADMIN_ROLE:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+async def charge_analysis_quota(user: dict, cost: int = 1):
+    """
+    Charges analysis requests to the user's quota, or raises 429 with Retry-After.
+    Requests costing more than the quota can ever hold are refused with 413.
+    """
+    if cost > user_quotas.max_cost:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{cost} analyses exceed the {user_quotas.max_cost:g} that can be charged at once; split the batch.",
+        )
+    try:
+        await user_quotas.check(user["id"], cost)
+    except QuotaExceededError as e:
+        logger.warning(f"User {user['email']} over {e.scope} quota, retry after {e.retry_after:.0f}s.")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
 
 # --- Auth Routes ---
 @router.post("/auth/register", response_model=UserOut, status_code=201)
@@ -34,17 +144,32 @@ async def register(user_data: UserCreate):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     user_dict = user_data.dict()
     user_dict["password"] = hashed_password
+    user_dict["role"] = DEFAULT_ROLE
+    user_dict["token_version"] = 0
     user_dict["created_at"] = datetime.utcnow()
     
     result = await users_collection.insert_one(user_dict)
+    invalidate_principal(user_dict["email"])
     user_dict["id"] = str(result.inserted_id)
     return user_dict
 
+async def _upgrade_password_hash(user_id, email: str, password: str):
+    """
+    Re-hashes a password with the current bcrypt cost after a successful login.
+    """
+    try:
+        new_hash = await get_password_hash_async(password)
+        await users_collection.update_one({"_id": user_id}, {"$set": {"password": new_hash}})
+        invalidate_principal(email)
+        logger.info(f"Upgraded password hash cost for user {user_id}.")
+    except Exception as e:
+        logger.warning(f"Password hash upgrade failed for user {user_id}: {e}")
+
 @router.post("/auth/login", response_model=Token)
-async def login(user_data: UserLogin):
+async def login(user_data: UserLogin, background_tasks: BackgroundTasks):
     logger.info(f"Login attempt for: {user_data.email}")
     try:
         user = await users_collection.find_one({"email": user_data.email})
@@ -52,12 +177,15 @@ async def login(user_data: UserLogin):
             logger.warning(f"Login failed: User {user_data.email} not found")
             raise HTTPException(status_code=401, detail="Invalid email or password")
             
-        if not verify_password(user_data.password, user["password"]):
+        if not await verify_password_async(user_data.password, user["password"]):
             logger.warning(f"Login failed: Incorrect password for {user_data.email}")
             raise HTTPException(status_code=401, detail="Invalid email or password")
+
+        if password_needs_rehash(user["password"]):
+            background_tasks.add_task(_upgrade_password_hash, user["_id"], user["email"], user_data.password)
         
         logger.info(f"User {user_data.email} authenticated successfully. Creating token...")
-        access_token = create_access_token(data={"sub": user["email"]})
+        access_token = create_access_token(data=build_token_claims(user))
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException:
         raise
@@ -65,63 +193,396 @@ async def login(user_data: UserLogin):
         logger.error(f"Login process failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Login error: {str(e)}")
 
+@router.post("/auth/revoke", status_code=204)
+async def revoke_tokens(current_user: dict = Depends(get_current_user)):
+    """
+    Signs the user out everywhere: tokens issued before this call stop working on every
+    worker within PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+    await users_collection.update_one({"_id": current_user["_id"]}, {"$inc": {"token_version": 1}})
+    invalidate_principal(current_user["email"])
+    return Response(status_code=204)
+
 @router.get("/user/me", response_model=UserOut)
 async def get_me(current_user: dict = Depends(get_current_user)):
     return current_user
 
+@router.get("/user/me/quota")
+async def get_my_quota(current_user: dict = Depends(get_current_user)):
+    """
+    The user's remaining analysis rate, today's model token usage and recent waits for a model slot.
+    """
+    return {**await user_quotas.usage(current_user["id"]), "queue_wait": model_scheduler.user_wait(current_user["id"])}
+
+@router.get("/user/me/progress", response_model=UserProgress)
+async def get_my_progress(
+    raw_request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    The user's score trends: running averages, best and latest scores, and daily and
+    weekly buckets. Served from one rollup document maintained as analyses are saved,
+    so the cost does not grow with the history. Supports If-None-Match revalidation.
+    """
+    progress = await get_progress(current_user["id"])
+    etag = make_etag(current_user["id"], "progress", progress.pop("version"))
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL_REVALIDATE, "Vary": "Authorization"}
+    if etag_matches(raw_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return progress
+
 # --- Pitch Routes ---
-@router.post("/analyze", response_model=AnalysisResponse, status_code=201)
-async def analyze_pitch(request: PitchRequest, current_user: dict = Depends(get_current_user)):
+@router.post(
+    "/analyze",
+    response_model=AnalysisResponse,
+    status_code=201,
+    responses={
+        202: {"model": JobAccepted},
+        429: {"description": "Analysis quota exceeded"},
+        503: {"description": "Analysis queue is full"},
+    },
+)
+async def analyze_pitch(
+    request: PitchRequest,
+    bypass_cache: bool = Query(False, description="Skip cached results and run a fresh analysis."),
+    async_job: bool = Query(False, description="Queue the analysis and return 202 with a job id to poll."),
+    sections: Optional[str] = Query(None, description=SECTIONS_QUERY_DESCRIPTION),
+    incremental: bool = Query(True, description="Derive the analysis from the user's analysis of an earlier version of this pitch when one is close enough."),
+    current_user: dict = Depends(get_current_user),
+):
     """
     Analyzes a pitch and attributes it to the logged-in user.
+    With async_job the analysis is queued instead and polled via /jobs/{id}.
+    With sections only those sections are generated, as concurrent model calls;
+    the rest is filled in when the analysis is fetched with /analysis/{id}.
+    A revision of a pitch the user analyzed before is analyzed incrementally from the
+    diff, and carries `revision` with the deltas to the previous version.
     """
     logger.info(f"User {current_user['email']} requested pitch analysis.")
+    requested_sections = parse_sections(sections)
+    await charge_analysis_quota(current_user)
+
+    if async_job:
+        try:
+            job = await analysis_jobs.enqueue(
+                current_user["id"], request.pitch_text, request.target_audience, requested_sections
+            )
+        except QueueFullError as e:
+            # Nothing was queued, so the request must not count against the quota
+            await user_quotas.refund(current_user["id"])
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+        status_url = f"/api/jobs/{job['id']}"
+        return JSONResponse(
+            status_code=202,
+            content=JobAccepted(job_id=job["id"], status=job["status"], status_url=status_url).model_dump(),
+            headers={"Location": status_url},
+        )
     
     try:
-        analysis_data = await analyze_pitch_with_gemini(request.pitch_text, request.target_audience)
+        if requested_sections:
+            analysis_data = await analyze_pitch_sections(
+                request.pitch_text, request.target_audience, requested_sections, bypass_cache=bypass_cache
+            )
+        else:
+            base = None
+            if incremental and not bypass_cache:
+                base = await find_revision_base(current_user["id"], request.pitch_text, request.target_audience)
+            if base:
+                analysis_data = await analyze_pitch_revision(request.pitch_text, request.target_audience, base)
+            else:
+                analysis_data = await analyze_pitch_with_gemini(
+                    request.pitch_text, request.target_audience, bypass_cache=bypass_cache
+                )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"AI Service Failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-    document = {
-        "user_id": current_user["id"],
-        "original_pitch": request.pitch_text,
-        "analysis": analysis_data,
-        "created_at": datetime.utcnow()
-    }
-    
-    result = await analyses_collection.insert_one(document)
-    document["id"] = str(result.inserted_id)
-    return document
+    return await save_analysis(current_user["id"], request.pitch_text, analysis_data, request.target_audience)
+
+def _sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
-@router.get("/my-analyses", response_model=list[AnalysisResponse])
-async def get_user_analyses(current_user: dict = Depends(get_current_user)):
+async def _stream_sections(pitch_text: str, target_audience: str, sections: list):
+    # Adapts section fan-out to the (field, value) stream, sending each section as it completes
+    fallback_fields = []
+    async for section, data, section_fallbacks in iter_pitch_sections(pitch_text, target_audience, sections):
+        fallback_fields.extend(section_fallbacks)
+        for field, value in data.items():
+            yield field, value
+    yield "used_fallback", bool(fallback_fields)
+    yield "fallback_fields", fallback_fields
+    yield "sections", sections
+
+@router.post("/analyze/stream")
+async def analyze_pitch_stream(
+    request: PitchRequest,
+    sections: Optional[str] = Query(None, description=SECTIONS_QUERY_DESCRIPTION),
+    current_user: dict = Depends(get_current_user),
+):
     """
-    Retrieves all analyses for the current logged-in user.
+    Streams the analysis as Server-Sent Events: one `field` event per top-level field of
+    AnalysisResult as soon as it is generated, then a `complete` event carrying the
+    persisted AnalysisResponse.
     """
-    cursor = analyses_collection.find({"user_id": current_user["id"]}).sort("created_at", -1)
-    analyses = []
-    async for doc in cursor:
-        doc["id"] = str(doc["_id"])
-        analyses.append(doc)
-    return analyses
+    logger.info(f"User {current_user['email']} requested streaming pitch analysis.")
+    requested_sections = parse_sections(sections)
+    await charge_analysis_quota(current_user)
+
+    async def event_stream():
+        analysis_data = {}
+        if requested_sections:
+            fields = _stream_sections(request.pitch_text, request.target_audience, requested_sections)
+        else:
+            fields = stream_pitch_analysis(request.pitch_text, request.target_audience)
+        try:
+            async for field, value in fields:
+                analysis_data[field] = value
+                yield _sse_event("field", {"field": field, "value": value})
+
+            AnalysisResult.model_validate(analysis_data)
+            document = await save_analysis(
+                current_user["id"], request.pitch_text, analysis_data, request.target_audience
+            )
+            response = AnalysisResponse.model_validate(document)
+            yield _sse_event("complete", response.model_dump(mode="json"))
+        except HTTPException as e:
+            yield _sse_event("error", {"detail": e.detail})
+        except Exception as e:
+            logger.error(f"Streaming analysis failed: {e}", exc_info=True)
+            yield _sse_event("error", {"detail": "Failed to analyze pitch."})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/analyze/batch")
+async def analyze_pitch_batch(
+    raw_request: Request,
+    sections: Optional[str] = Query(None, description=SECTIONS_QUERY_DESCRIPTION),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Analyzes many pitches in one call. The body is a JSON array or NDJSON
+    (application/x-ndjson) of PitchRequest items. Results stream back as NDJSON in
+    completion order: one line per item carrying its `index` and either `result` or
+    `detail`, then a final `done` line with the counts.
+    """
+    requested_sections = parse_sections(sections)
+    ndjson = "ndjson" in raw_request.headers.get("content-type", "")
+    try:
+        items = parse_batch_items(await raw_request.body(), ndjson)
+    except BatchFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"User {current_user['email']} requested a batch analysis of {len(items)} pitches.")
+    # Invalid items are answered with an error line and never run, so only valid ones are charged
+    items = validate_batch_items(items)
+    accepted = sum(1 for item in items if isinstance(item, PitchRequest))
+    if accepted:
+        await charge_analysis_quota(current_user, accepted)
+
+    return StreamingResponse(
+        run_analysis_batch(current_user["id"], items, requested_sections),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(
+    job_id: str = Path(..., title="The ID of the analysis job"),
+    wait: float = Query(0, ge=0, le=30, description="Seconds to long-poll for the job to finish."),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Returns the status of a queued analysis job, including the analysis once it is done.
+    """
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Invalid job ID format.")
+
+    if wait:
+        job = await analysis_jobs.wait(job_id, current_user["id"], timeout=wait)
+    else:
+        job = await analysis_jobs.get(job_id, current_user["id"])
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    if job.get("analysis_id"):
+        document = await get_analysis_document(ObjectId(job["analysis_id"]), fill=False)
+        if document:
+            document["id"] = str(document["_id"])
+            job["result"] = document
+    return job
+
+@router.get("/my-analyses", response_model=AnalysisPage)
+async def get_user_analyses(
+    raw_request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of analyses to return."),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page."),
+    q: Optional[str] = Query(None, max_length=100, description="Only analyses whose pitch preview or target audience contains this."),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Lists the current user's analyses newest first as lightweight summaries, optionally
+    filtered by `q`. Fetch the full analysis with /analysis/{id}. Supports If-None-Match
+    revalidation.
+    """
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    # Read one extra row to learn whether another page exists
+    search = q.strip() if q else None
+    items = await list_analysis_summaries(current_user["id"], limit + 1, after, search)
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1]["created_at"], ObjectId(items[-1]["id"]))
+
+    # The page changes only when analyses are added or gain sections (bumping their version)
+    etag = make_etag(current_user["id"], limit, cursor, search, *[f"{item['id']}.{item['version']}" for item in items])
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL_REVALIDATE, "Vary": "Authorization"}
+    if etag_matches(raw_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}},
+)
+async def export_analyses(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson or csv."),
+    fields: Optional[str] = Query(None, description=f"Comma-separated fields to export besides id and created_at. Default: {','.join(DEFAULT_EXPORT_FIELDS)}."),
+    since: Optional[datetime] = Query(None, description="Only analyses created at or after this time."),
+    until: Optional[datetime] = Query(None, description="Only analyses created before this time."),
+    cursor: Optional[str] = Query(None, description="`cursor` of the last row received, to resume an interrupted export."),
+    limit: int = Query(0, ge=0, description="Maximum number of rows (0 = no limit)."),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Streams the user's analysis history oldest first as NDJSON or CSV, in constant
+    memory whatever its size. Every row ends with a `cursor`; pass the last one
+    received to continue an interrupted (or limited) export where it stopped.
+    """
+    export_fields = parse_export_fields(fields)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+    logger.info(f"User {current_user['email']} started a {export_format} export.")
+
+    filename = f"analyses-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+    return StreamingResponse(
+        stream_export(current_user["id"], export_format, export_fields, since, until, after, limit),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+def _analysis_etag(document: dict, fields: Optional[list]) -> str:
+    # Documents written before versioning count as revision 0
+    return make_etag(document["_id"], f"v{document.get('version', 0)}", ",".join(sorted(fields or [])))
 
 @router.get("/analysis/{id}", response_model=AnalysisResponse)
-async def get_analysis(id: str = Path(..., title="The ID of the analysis to retrieve")):
+async def get_analysis(
+    raw_request: Request,
+    response: Response,
+    id: str = Path(..., title="The ID of the analysis to retrieve"),
+    sections: Optional[str] = Query(None, description=f"Sections to make sure are present. {SECTIONS_QUERY_DESCRIPTION}"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. scores,overall_score,original_pitch."),
+    current_user: dict = Depends(get_current_user),
+):
     """
-    Retrieves a stored analysis by its ID.
+    Retrieves one of the user's stored analyses by its ID, optionally only the
+    requested fields. Sections that were not generated when the analysis was created
+    are generated now (charged to the user's quota) and stored with it. Responses
+    carry an ETag of the id and version, and a matching If-None-Match is answered
+    with 304 after reading only the version.
     """
+    requested_sections = parse_sections(sections)
+    requested_fields = parse_fields(fields)
     if not ObjectId.is_valid(id):
         raise HTTPException(status_code=400, detail="Invalid analysis ID format.")
     
     try:
-        document = await analyses_collection.find_one({"_id": ObjectId(id)})
+        # Analyses of other users are reported as missing
+        revision = await get_analysis_revision(ObjectId(id), current_user["id"])
+        if not revision:
+            raise HTTPException(status_code=404, detail="Analysis not found.")
+        # A copy is current unless sections this read needs still have to be generated
+        if missing_sections(revision, required_sections(requested_fields, requested_sections)):
+            await charge_analysis_quota(current_user)
+        elif etag_matches(raw_request.headers.get("if-none-match"), _analysis_etag(revision, requested_fields)):
+            cache_control = CACHE_CONTROL_REVALIDATE if missing_sections(revision) else CACHE_CONTROL_IMMUTABLE
+            headers = {"ETag": _analysis_etag(revision, requested_fields), "Cache-Control": cache_control, "Vary": "Authorization"}
+            return Response(status_code=304, headers=headers)
+
+        document = await get_analysis_document(ObjectId(id), requested_fields, requested_sections, user_id=current_user["id"])
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Database Query Failed: {e}")
         raise HTTPException(status_code=500, detail="Database error.")
         
     if not document:
         raise HTTPException(status_code=404, detail="Analysis not found.")
-    
+
+    headers = {
+        "ETag": _analysis_etag(document, requested_fields),
+        "Cache-Control": CACHE_CONTROL_REVALIDATE if missing_sections(document) else CACHE_CONTROL_IMMUTABLE,
+        "Vary": "Authorization",
+    }
     document["id"] = str(document["_id"])
+    if requested_fields:
+        # Only what was read is returned, instead of defaults for the fields left out
+        projected = AnalysisResponse.model_validate(document)
+        return JSONResponse(content=projected.model_dump(mode="json", exclude_unset=True), headers=headers)
+    response.headers.update(headers)
     return document
+
+# --- System Routes ---
+@router.get("/system/stats", dependencies=[Depends(require_admin)])
+async def get_system_stats():
+    """
+    Exposes runtime counters for the backend's performance components. Admins only.
+    """
+    return {
+        # Counters are per worker process; /metrics aggregates across workers
+        "worker_pid": os.getpid(),
+        "analysis_cache": analysis_cache.stats(),
+        "analysis_single_flight": analysis_flights.stats(),
+        "analysis_leases": analysis_leases.stats(),
+        "analysis_jobs": await analysis_jobs.stats(),
+        "password_hasher": password_hasher.stats(),
+        "principal_cache": principal_cache.stats(),
+        "json_parsing": json_parse_stats.stats(),
+        "model_generation": generation_stats.stats(),
+        "model_client": model_client.stats(),
+        "model_scheduler": model_scheduler.stats(),
+        "user_quotas": user_quotas.stats(),
+        "revisions": revision_stats.stats(),
+        "prompt_budget": prompt_budget_stats.stats(),
+    }
+
+@router.get("/system/startup", dependencies=[Depends(require_admin)])
+async def get_startup_report():
+    """
+    Reports how long each startup phase took (app import, client and provider
+    construction, database checks) and whether warmup has finished. Admins only.
+    """
+    return startup_state.report()
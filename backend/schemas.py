@@ -66,13 +66,68 @@ class FillerWord(BaseModel):
     word: str
     count: int
 
+class TextMetrics(BaseModel):
+    # Computed from the pitch text by text_metrics.py, not by the model
+    word_count: int = 0
+    sentence_count: int = 0
+    avg_sentence_length: float = 0.0
+    max_sentence_length: int = 0
+    long_sentences: int = 0
+    flesch_reading_ease: float = 0.0
+    flesch_kincaid_grade: float = 0.0
+    filler_count: int = 0
+    filler_rate: float = 0.0  # per 100 words
+    hedging_count: int = 0
+    hedging_rate: float = 0.0  # per 100 words
+    hedging_phrases: Dict[str, int] = {}
+    keyword_coverage: Dict[str, List[str]] = {}
+    coverage_ratio: float = 0.0
+    missing_components: List[str] = []
+
+SCORE_DIMENSIONS = [
+    "clarity", "problem_definition", "solution_explanation", "technical_depth",
+    "innovation", "impact", "logical_flow", "persuasiveness"
+]
+
+# Independently generated modules of an analysis and the fields each one produces
+ANALYSIS_SECTIONS = {
+    "scores": ["scores", "overall_score", "strengths", "weaknesses"],
+    "improved_pitch": ["improved_pitch", "improvement_metrics", "suggestions"],
+    "checklist": ["checklist"],
+    "slides": ["slides"],
+    "summaries": ["summaries"],
+    "coaching": ["practice_questions", "personalized_roadmap", "suggested_resources"],
+    # Computed locally from the pitch text, never by the model
+    "delivery": ["filler_words", "confidence_score", "text_metrics"],
+}
+LOCAL_SECTIONS = {"delivery"}
+
+class RevisionDelta(BaseModel):
+    # Current minus previous version; metrics missing from either side are left out
+    overall_score: Optional[float] = None
+    confidence_score: Optional[float] = None
+    scores: Dict[str, float] = {}
+    word_count: Optional[int] = None
+    filler_count: Optional[int] = None
+
+class RevisionInfo(BaseModel):
+    base_analysis_id: str
+    similarity: float  # word-level, 0-1
+    changed_words: int
+    updated_fields: List[str] = []  # re-evaluated by the model
+    carried_fields: List[str] = []  # taken over from the previous version unchanged
+    delta: RevisionDelta = RevisionDelta()
+
 class AnalysisResult(BaseModel):
-    scores: Dict[str, int]
-    overall_score: float
-    strengths: List[str]
-    weaknesses: List[str]
-    suggestions: List[str]
-    improved_pitch: str
+    # Core fields default to empty so analyses generated for only some sections validate
+    scores: Dict[str, int] = Field(
+        {}, json_schema_extra={"properties": {d: {"type": "integer"} for d in SCORE_DIMENSIONS}}
+    )
+    overall_score: float = 0.0
+    strengths: List[str] = []
+    weaknesses: List[str] = []
+    suggestions: List[str] = []
+    improved_pitch: str = ""
     # Advanced Evolution Fields
     improvement_metrics: Optional[ImprovementMetrics] = None
     checklist: List[ChecklistItem] = []
@@ -80,18 +135,79 @@ class AnalysisResult(BaseModel):
     summaries: Optional[Summaries] = None
     confidence_score: int = 0
     filler_words: List[FillerWord] = []
+    text_metrics: Optional[TextMetrics] = None
     suggested_resources: List[Resource] = []
     practice_questions: List[str] = []
     personalized_roadmap: List[RoadmapStep] = []
+    # Set when parts of the analysis came from fallback data instead of the model
+    used_fallback: bool = False
+    fallback_fields: List[str] = []
+    # Sections present in this analysis; documents without it predate sectioned analyses
+    sections: List[str] = Field(default_factory=lambda: list(ANALYSIS_SECTIONS))
+    # Set when the analysis was derived incrementally from the user's previous version of the pitch
+    revision: Optional[RevisionInfo] = None
 
 class AnalysisResponse(BaseModel):
     id: str
-    original_pitch: str
+    # Empty when a field projection left it out
+    original_pitch: str = ""
     analysis: AnalysisResult
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class AnalysisSummary(BaseModel):
+    id: str
+    created_at: datetime
+    overall_score: float
+    scores: Dict[str, int] = {}
+    pitch_preview: str
+
+class AnalysisPage(BaseModel):
+    items: List[AnalysisSummary]
+    next_cursor: Optional[str] = None
+
+# --- Progress Schemas ---
+class ProgressScores(BaseModel):
+    overall_score: Optional[float] = None
+    confidence_score: Optional[float] = None
+    scores: Dict[str, float] = {}
+
+class ProgressLatest(ProgressScores):
+    at: datetime
+
+class ProgressBucket(ProgressScores):
+    period: str  # YYYY-MM-DD for daily, YYYY-Www (ISO week) for weekly buckets
+    count: int = 0
+
+class UserProgress(BaseModel):
+    analyses: int = 0
+    scored_analyses: int = 0
+    average: ProgressScores = ProgressScores()
+    best: ProgressScores = ProgressScores()
+    latest: Optional[ProgressLatest] = None
+    daily: List[ProgressBucket] = []
+    weekly: List[ProgressBucket] = []
+    backfilled: bool = False
+    updated_at: Optional[datetime] = None
+
+# --- Job Schemas ---
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+class JobStatus(BaseModel):
+    id: str
+    status: str # queued, running, done, failed
+    attempts: int = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    analysis_id: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[AnalysisResponse] = None
+
 class ErrorResponse(BaseModel):
     detail: str
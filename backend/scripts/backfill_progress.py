@@ -0,0 +1,80 @@
+"""
+Backfill of the per-user progress rollups (user_stats) from existing analyses.
+
+Rollups are maintained as analyses are saved, starting from each user's first analysis
+after the feature shipped. This job adds everything older: for each user it runs one
+aggregation pipeline over their analyses created before the rollup started tracking
+and merges the daily results into the rollup with $inc/$max, so it is safe to run
+while the API is serving. Each user is backfilled once; rerunning skips them.
+
+Usage (from backend/):
+    python scripts/backfill_progress.py --dry-run
+    python scripts/backfill_progress.py --concurrency 8 --pause-ms 50
+    python scripts/backfill_progress.py --user 6650c0ffee0000000000abcd
+"""
+import os
+import sys
+import asyncio
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import users_collection
+from progress import backfill_user
+
+
+async def backfill(user_ids: list, concurrency: int, pause_ms: float, limit: int, dry_run: bool):
+    started_at = datetime.utcnow()
+    scanned = backfilled = skipped = analyses = 0
+    last_id = None
+
+    while True:
+        if user_ids is not None:
+            batch = user_ids[scanned:scanned + concurrency]
+        else:
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            users = await users_collection.find(query, {"_id": 1}).sort("_id", 1).limit(concurrency).to_list(length=concurrency)
+            batch = [str(user["_id"]) for user in users]
+            if users:
+                last_id = users[-1]["_id"]
+        if not batch:
+            break
+
+        results = await asyncio.gather(*[backfill_user(user_id, started_at, dry_run) for user_id in batch])
+        scanned += len(batch)
+        for added in results:
+            if added is None:
+                skipped += 1
+            else:
+                backfilled += 1
+                analyses += added
+        print(f"scanned {scanned} users, backfilled {backfilled}, already done {skipped}, {analyses} analyses")
+
+        if limit and scanned >= limit:
+            break
+        # Leave room for production traffic between batches
+        await asyncio.sleep(pause_ms / 1000)
+
+    if dry_run:
+        print(f"Dry run: {analyses} analyses of {backfilled} users would be added to their rollups.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", action="append", help="Only backfill this user id (repeatable).")
+    parser.add_argument("--concurrency", type=int, default=4, help="Users backfilled at once.")
+    parser.add_argument("--pause-ms", type=float, default=100, help="Pause between batches.")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many users (0 = all).")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be added.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    asyncio.run(backfill(args.user, args.concurrency, args.pause_ms, args.limit, args.dry_run))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Online migration of analyses_collection to the compressed storage layout (version 2).
+
+Walks legacy documents in _id order, compresses original_pitch, improved_pitch,
+slides and summaries into `blobs` and drops the inline copies. The API keeps serving
+throughout: both layouts are readable, and every document is rewritten with a
+guarded update that skips it if it changed after it was read (e.g. a lazy section
+fill), so a later run picks it up again.
+
+Usage (from backend/):
+    python scripts/migrate_analysis_storage.py --dry-run
+    python scripts/migrate_analysis_storage.py --batch-size 200 --pause-ms 50
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne
+from database import analyses_collection
+from analysis_store import (
+    COMPRESSED_ANALYSIS_FIELDS, PITCH_PREVIEW_CHARS, STORAGE_VERSION, compress_value,
+)
+
+
+def migration_update(document: dict):
+    """
+    Returns the guarded UpdateOne converting one legacy document, with the bytes saved.
+    """
+    analysis = document.get("analysis", {})
+    pitch_text = document.get("original_pitch", "")
+    blobs = {"original_pitch": compress_value(pitch_text)}
+    unset = {"original_pitch": ""}
+    before = len(pitch_text.encode("utf-8"))
+    for field in COMPRESSED_ANALYSIS_FIELDS:
+        if field in analysis:
+            blobs[field] = compress_value(analysis[field])
+            unset[f"analysis.{field}"] = ""
+            before += len(json.dumps(analysis[field]).encode("utf-8"))
+    after = sum(len(blob) for blob in blobs.values())
+
+    update = {
+        "$set": {
+            "blobs": blobs,
+            "storage_version": STORAGE_VERSION,
+            "pitch_preview": document.get("pitch_preview", pitch_text[:PITCH_PREVIEW_CHARS]),
+        },
+        "$unset": unset,
+    }
+    # `version` is bumped by every section fill; a missing field matches None
+    guard = {"_id": document["_id"], "storage_version": {"$exists": False}, "version": document.get("version")}
+    return UpdateOne(guard, update), before - after
+
+
+async def migrate(batch_size: int, pause_ms: float, limit: int, dry_run: bool):
+    query = {"storage_version": {"$exists": False}}
+    last_id = None
+    scanned = migrated = skipped = saved_bytes = 0
+
+    while True:
+        page_query = dict(query, _id={"$gt": last_id}) if last_id else query
+        documents = await analyses_collection.find(page_query).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not documents:
+            break
+        last_id = documents[-1]["_id"]
+
+        operations = []
+        for document in documents:
+            operation, saved = migration_update(document)
+            operations.append(operation)
+            saved_bytes += saved
+        scanned += len(documents)
+
+        if not dry_run:
+            result = await analyses_collection.bulk_write(operations, ordered=False)
+            migrated += result.modified_count
+            skipped += len(operations) - result.modified_count
+        print(f"scanned {scanned}, migrated {migrated}, skipped {skipped}, ~{saved_bytes / 1024:.0f} KiB saved")
+
+        if limit and scanned >= limit:
+            break
+        # Leave room for production traffic between batches
+        await asyncio.sleep(pause_ms / 1000)
+
+    if dry_run:
+        print(f"Dry run: {scanned} documents would be migrated, ~{saved_bytes / 1024:.0f} KiB saved.")
+    elif skipped:
+        print(f"{skipped} documents changed while migrating; run again to convert them.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=100, help="Documents converted per bulk write.")
+    parser.add_argument("--pause-ms", type=float, default=100, help="Pause between batches.")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many documents (0 = all).")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be migrated.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    asyncio.run(migrate(args.batch_size, args.pause_ms, args.limit, args.dry_run))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Import-time report for the backend, built on `python -X importtime`.
+
+Imports `main` in a fresh interpreter and lists the modules that cost the most, by
+cumulative and by self time, so regressions in cold-start time can be traced to the
+import that caused them. The running server's phase timings are at /api/system/startup.
+
+Usage (from backend/):
+    python scripts/startup_report.py
+    python scripts/startup_report.py --top 30 --module routes
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def collect_import_times(module: str) -> list:
+    """
+    Returns (module, self_us, cumulative_us) for every module imported by `module`.
+    """
+    env = dict(os.environ)
+    # database.py refuses to load without a URI; the client is not created at import time
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def print_table(title: str, rows: list, top: int):
+    print(f"\n{title}")
+    print(f"{'module':<50} {'self ms':>9} {'cumul. ms':>10}")
+    for name, self_us, cumulative_us in rows[:top]:
+        print(f"{name:<50} {self_us / 1000:>9.1f} {cumulative_us / 1000:>10.1f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="Module to import.")
+    parser.add_argument("--top", type=int, default=20, help="Rows per table.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = collect_import_times(args.module)
+    total = next((cumulative for name, _, cumulative in rows if name == args.module), 0)
+    print(f"Importing {args.module}: {total / 1000:.1f} ms across {len(rows)} modules")
+    print_table("Slowest by cumulative time", sorted(rows, key=lambda row: row[2], reverse=True), args.top)
+    print_table("Slowest by self time", sorted(rows, key=lambda row: row[1], reverse=True), args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import os
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight task.
+    Waiters are shielded from each other: cancelling one (e.g. a client disconnect)
+    never cancels the shared call, and every waiter sees the same result or error.
+    """
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.deduplicated = 0
+        self.errors = 0
+
+    async def do(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.deduplicated += 1
+            logger.info("Joined an in-flight analysis for an identical request.")
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve the exception so it is not reported as unhandled when every waiter left
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+            "errors": self.errors,
+        }
+
+
+class SharedFlight:
+    """
+    Extends single-flight across worker processes through a lease document per key.
+    The worker that takes the lease runs the call; the others poll `lookup` (the shared
+    result store) until the result appears, and run the call themselves if the lease is
+    released without a stored result or expires because its holder died.
+    """
+    def __init__(self, collection, lease_seconds: float, poll_interval: float, enabled: bool = True):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.enabled = enabled
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.leases = 0
+        self.joined = 0
+        self.takeovers = 0
+        self.errors = 0
+
+    async def do(self, key, factory, lookup):
+        if not self.enabled:
+            return await factory()
+
+        acquired = await self._acquire(key)
+        if not acquired:
+            result = await self._wait(key, lookup)
+            if result is not None:
+                self.joined += 1
+                return result
+            self.takeovers += 1
+            acquired = await self._acquire(key)
+
+        try:
+            return await factory()
+        finally:
+            if acquired:
+                await self._release(key)
+
+    async def _acquire(self, key) -> bool:
+        # pymongo is loaded with the client by now; a top-level import would slow down startup
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.utcnow()
+        try:
+            # Inserts a new lease or takes over an expired one; a live lease makes the upsert collide
+            await self.collection.update_one(
+                {"_id": key, "expires_at": {"$lte": now}},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            # Never fail the call because coordination is unavailable
+            self.errors += 1
+            logger.warning(f"Could not take lease {key}: {e}")
+            return False
+        self.leases += 1
+        return True
+
+    async def _wait(self, key, lookup):
+        while True:
+            result = await lookup()
+            if result is not None:
+                return result
+            try:
+                lease = await self.collection.find_one({"_id": key})
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Could not read lease {key}: {e}")
+                return None
+            if lease is None or lease["expires_at"] <= datetime.utcnow():
+                # Released without a stored result (e.g. fallback data) or abandoned; check once more
+                return await lookup()
+            await asyncio.sleep(self.poll_interval)
+
+    async def _release(self, key):
+        try:
+            await self.collection.delete_one({"_id": key, "owner": self.owner})
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Could not release lease {key}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "leases": self.leases,
+            "joined": self.joined,
+            "takeovers": self.takeovers,
+            "errors": self.errors,
+        }
@@ -0,0 +1,91 @@
+import os
+import time
+import asyncio
+import logging
+from database import get_client, check_database_connection, ensure_indexes
+from ai_providers import get_provider
+from jobs import analysis_jobs
+
+logger = logging.getLogger(__name__)
+
+# Startup Configuration
+READINESS_PING_TIMEOUT_SECONDS = float(os.getenv("READINESS_PING_TIMEOUT_SECONDS", "2"))
+
+
+class StartupState:
+    """
+    Tracks how long each startup phase took and whether the process is ready to serve
+    traffic that needs the database. Liveness never depends on this.
+    """
+    def __init__(self):
+        self.phases = {}
+        self.errors = {}
+        self.warmed = False
+        self.database_ok = False
+
+    def record(self, phase: str, started: float, error: Exception = None):
+        self.phases[phase] = round((time.perf_counter() - started) * 1000, 1)
+        if error is not None:
+            self.errors[phase] = str(error)
+            logger.error(f"Startup phase {phase} failed after {self.phases[phase]}ms: {error}")
+        else:
+            logger.info(f"Startup phase {phase} took {self.phases[phase]}ms.")
+
+    def report(self) -> dict:
+        return {
+            "warmed": self.warmed,
+            "database_ok": self.database_ok,
+            "phases_ms": dict(self.phases),
+            "errors": dict(self.errors),
+        }
+
+
+startup_state = StartupState()
+
+async def _timed(phase: str, func):
+    started = time.perf_counter()
+    try:
+        # Driver and SDK imports are blocking, so they run off the event loop
+        await asyncio.to_thread(func)
+        startup_state.record(phase, started)
+    except Exception as e:
+        startup_state.record(phase, started, e)
+
+async def warmup():
+    """
+    Runs after the server has bound its port: builds the Mongo client and the AI
+    provider in threads, checks the database and creates indexes, then starts the job
+    workers. Requests arriving before this finishes initialize what they need on demand.
+    """
+    started = time.perf_counter()
+    await asyncio.gather(_timed("mongo_client", get_client), _timed("ai_provider", get_provider))
+
+    phase_started = time.perf_counter()
+    try:
+        await check_database_connection()
+        await ensure_indexes()
+        startup_state.database_ok = True
+        startup_state.record("database", phase_started)
+    except Exception as e:
+        logger.critical(f"Failed to connect to database: {e}")
+        startup_state.record("database", phase_started, e)
+
+    await analysis_jobs.start()
+    startup_state.warmed = True
+    startup_state.record("warmup", started)
+
+async def readiness() -> tuple:
+    """
+    Returns (ready, report). Ready once warmup has finished and Mongo answers a ping.
+    """
+    report = startup_state.report()
+    if not startup_state.warmed:
+        return False, report
+    try:
+        await asyncio.wait_for(get_client().admin.command("ping"), timeout=READINESS_PING_TIMEOUT_SECONDS)
+        startup_state.database_ok = True
+    except Exception as e:
+        startup_state.database_ok = False
+        report["errors"]["readiness_ping"] = str(e) or type(e).__name__
+    report["database_ok"] = startup_state.database_ok
+    return startup_state.database_ok, report
@@ -0,0 +1,9 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# The Mongo client is built on first use, so importing the backend needs only a URI
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/vakyaai_test")
+os.environ.setdefault("AI_PROVIDER", "local")
@@ -0,0 +1,30 @@
+import asyncio
+
+import prompt_budget
+import ai_service
+from schemas import ANALYSIS_SECTIONS
+
+PITCH = "Small clinics lose hours every week reconciling paper records. " * 40
+
+
+def generation_request():
+    return asyncio.run(ai_service._generation_request(PITCH, "Investor"))
+
+
+def test_full_prompt_when_nothing_is_dropped(monkeypatch):
+    monkeypatch.setattr(prompt_budget, "PROMPT_LATENCY_TARGET_SECONDS", 1e9)
+    request = generation_request()
+    assert request.fields == ai_service.GENERATED_FIELDS
+    assert "Response Schema:" in request.prompt
+
+
+def test_dropped_sections_are_not_asked_for(monkeypatch):
+    monkeypatch.setattr(prompt_budget, "PROMPT_LATENCY_TARGET_SECONDS", 0)
+    request = generation_request()
+    dropped = [field for section in prompt_budget.PROMPT_OPTIONAL_SECTIONS for field in ANALYSIS_SECTIONS[section]]
+    assert dropped
+    assert set(request.fields) == set(ai_service.GENERATED_FIELDS) - set(dropped)
+    for field in dropped:
+        assert field not in request.prompt
+    for field in request.fields:
+        assert field in request.prompt
@@ -0,0 +1,200 @@
+import os
+import re
+from functools import lru_cache
+
+# Lexicon Configuration: comma-separated phrases replacing the defaults
+TEXT_METRICS_FILLER_LEXICON = os.getenv("TEXT_METRICS_FILLER_LEXICON", "")
+TEXT_METRICS_HEDGING_LEXICON = os.getenv("TEXT_METRICS_HEDGING_LEXICON", "")
+
+DEFAULT_FILLER_WORDS = [
+    "um", "umm", "uh", "uhm", "er", "erm", "ah", "hmm", "like", "basically", "actually",
+    "literally", "honestly", "obviously", "totally", "really", "very", "just", "you know",
+    "i mean", "sort of", "kind of", "you see", "so yeah", "or something", "and stuff",
+    "anyway", "whatever",
+]
+DEFAULT_HEDGING_PHRASES = [
+    "maybe", "perhaps", "might", "may", "could", "possibly", "probably", "hopefully",
+    "somewhat", "fairly", "quite", "seems", "seem", "appears", "potentially", "i think",
+    "i believe", "i guess", "i feel", "we think", "we believe", "we hope", "we hope to",
+    "try to", "trying to", "attempt to", "sort of", "kind of", "a bit", "a little",
+    "not sure", "in theory",
+]
+# Keywords showing that a pitch covers each standard component
+PITCH_COMPONENT_KEYWORDS = {
+    "problem": ["problem", "problems", "pain", "pain point", "struggle", "struggles", "challenge",
+                "challenges", "lose", "lost", "waste", "wasted", "costly", "inefficient", "frustrating"],
+    "solution": ["solution", "we built", "we build", "our platform", "our product", "our app",
+                 "our tool", "we solve", "solves", "introducing", "we help", "helps"],
+    "market": ["market", "tam", "sam", "som", "billion", "million", "segment", "industry", "customers"],
+    "traction": ["traction", "revenue", "users", "grew", "growth", "pilot", "pilots", "mrr", "arr",
+                 "signed", "waitlist", "clients", "month over month", "retention"],
+    "business_model": ["pricing", "subscription", "business model", "revenue model", "per month",
+                       "per seat", "per user", "fee", "fees", "license", "licensing", "monetize", "saas"],
+    "competition": ["competitor", "competitors", "competition", "alternatives", "unlike",
+                    "incumbents", "differentiator", "moat", "advantage"],
+    "team": ["team", "founder", "founders", "co-founder", "cofounder", "experience", "background",
+             "previously", "we built at", "engineers"],
+    "ask": ["raising", "raise", "invest", "investment", "funding", "seed", "series a", "join us",
+            "partner with", "our ask", "we ask", "looking for"],
+}
+
+LONG_SENTENCE_WORDS = 25
+# Stored with analyses whose confidence_score comes from confidence_from_metrics; bump when it changes.
+# Older analyses carry a model-predicted score that is not comparable.
+METRICS_VERSION = 1
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:['’-][a-z0-9]+)*")
+# Sentence ends: terminal punctuation followed by whitespace (so "1.5M" stays whole) or a line break
+SENTENCE_BREAK = re.compile(r"[.!?]+(?=\s|$)|\n")
+VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+
+_END = None
+
+
+def tokenize(text: str) -> list:
+    return WORD_PATTERN.findall(text.lower())
+
+
+class PhraseMatcher:
+    """
+    Multi-pattern matcher over word tokens: all phrases are compiled once into a token
+    trie, and one left-to-right pass counts leftmost-longest, non-overlapping matches,
+    so "kind of" is counted once rather than also as "kind". Runs in linear time in
+    the number of words. `phrases` may map each phrase to the key its matches are
+    counted under, which lets one pass serve several keyword groups.
+    """
+    def __init__(self, phrases):
+        self.root = {}
+        keys = phrases if isinstance(phrases, dict) else {phrase: None for phrase in phrases}
+        for phrase, key in keys.items():
+            tokens = tokenize(phrase)
+            if not tokens:
+                continue
+            node = self.root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[_END] = key if key is not None else " ".join(tokens)
+
+    def count(self, tokens: list) -> dict:
+        counts = {}
+        root = self.root
+        i, n = 0, len(tokens)
+        while i < n:
+            node = root.get(tokens[i])
+            if node is None:
+                i += 1
+                continue
+            match, match_end = node.get(_END), i + 1
+            j = i + 1
+            while j < n:
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                j += 1
+                if _END in node:
+                    match, match_end = node[_END], j
+            if match is None:
+                i += 1
+                continue
+            counts[match] = counts.get(match, 0) + 1
+            i = match_end
+        return counts
+
+
+def _lexicon(configured: str, default: list) -> list:
+    phrases = [phrase.strip() for phrase in configured.split(",") if phrase.strip()]
+    return phrases or default
+
+
+filler_matcher = PhraseMatcher(_lexicon(TEXT_METRICS_FILLER_LEXICON, DEFAULT_FILLER_WORDS))
+hedging_matcher = PhraseMatcher(_lexicon(TEXT_METRICS_HEDGING_LEXICON, DEFAULT_HEDGING_PHRASES))
+component_matcher = PhraseMatcher({
+    word: (component, " ".join(tokenize(word)))
+    for component, words in PITCH_COMPONENT_KEYWORDS.items() for word in words
+})
+
+
+@lru_cache(maxsize=65536)
+def count_syllables(word: str) -> int:
+    # Vowel-group heuristic; good enough for readability scores
+    syllables = len(VOWEL_GROUPS.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and syllables > 1:
+        syllables -= 1
+    return max(1, syllables)
+
+
+def _per_100_words(count: int, words: int) -> float:
+    return round(count * 100 / words, 2) if words else 0.0
+
+
+def confidence_from_metrics(filler_rate: float, hedging_rate: float, avg_sentence_length: float, long_share: float) -> int:
+    """
+    Delivery confidence 0-100: filler words and hedging read as uncertainty, and
+    overlong sentences are hard to deliver with conviction.
+    """
+    penalty = (
+        filler_rate * 6
+        + hedging_rate * 5
+        + max(0.0, avg_sentence_length - 20) * 1.5
+        + long_share * 20
+    )
+    return int(round(min(100.0, max(0.0, 100.0 - penalty))))
+
+
+def analyze_text(pitch_text: str) -> dict:
+    """
+    Computes the deterministic delivery metrics of a pitch. Returns the AnalysisResult
+    fields filler_words, confidence_score and text_metrics.
+    """
+    tokens = tokenize(pitch_text)
+    word_count = len(tokens)
+    sentence_lengths = [
+        length for length in (len(WORD_PATTERN.findall(sentence.lower())) for sentence in SENTENCE_BREAK.split(pitch_text))
+        if length
+    ]
+    sentence_count = len(sentence_lengths) or (1 if word_count else 0)
+    syllables = sum(count_syllables(token) for token in tokens)
+
+    words_per_sentence = word_count / sentence_count if sentence_count else 0.0
+    syllables_per_word = syllables / word_count if word_count else 0.0
+    long_sentences = sum(1 for length in sentence_lengths if length > LONG_SENTENCE_WORDS)
+    long_share = long_sentences / sentence_count if sentence_count else 0.0
+
+    fillers = filler_matcher.count(tokens)
+    hedges = hedging_matcher.count(tokens)
+    matched = component_matcher.count(tokens)
+    coverage = {component: [] for component in PITCH_COMPONENT_KEYWORDS}
+    for (component, keyword), _ in sorted(matched.items(), key=lambda item: -item[1]):
+        if len(coverage[component]) < 5:
+            coverage[component].append(keyword)
+    covered = [component for component, keywords in coverage.items() if keywords]
+
+    filler_count = sum(fillers.values())
+    hedging_count = sum(hedges.values())
+    filler_rate = _per_100_words(filler_count, word_count)
+    hedging_rate = _per_100_words(hedging_count, word_count)
+
+    return {
+        "filler_words": [
+            {"word": word, "count": count}
+            for word, count in sorted(fillers.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        "confidence_score": confidence_from_metrics(filler_rate, hedging_rate, words_per_sentence, long_share),
+        "text_metrics": {
+            "word_count": word_count,
+            "sentence_count": sentence_count,
+            "avg_sentence_length": round(words_per_sentence, 1),
+            "max_sentence_length": max(sentence_lengths, default=0),
+            "long_sentences": long_sentences,
+            "flesch_reading_ease": round(206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word, 1) if word_count else 0.0,
+            "flesch_kincaid_grade": round(0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59, 1) if word_count else 0.0,
+            "filler_count": filler_count,
+            "filler_rate": filler_rate,
+            "hedging_count": hedging_count,
+            "hedging_rate": hedging_rate,
+            "hedging_phrases": dict(sorted(hedges.items(), key=lambda item: -item[1])),
+            "keyword_coverage": coverage,
+            "coverage_ratio": round(len(covered) / len(coverage), 2),
+            "missing_components": [component for component in coverage if component not in covered],
+        },
+    }
@@ -1,8 +1,16 @@
 import re
 import json
+import time
+import base64
+import hashlib
 import logging
+from datetime import datetime
+from bson import ObjectId
 
 from json_repair import repair_json
+from metrics import JSON_PARSES
+
+logger = logging.getLogger(__name__)
 
 def clean_json_string(text: str) -> str:
     """
@@ -24,6 +32,115 @@ def clean_json_string(text: str) -> str:
     except Exception:
         return extracted
 
+class JSONParseStats:
+    """
+    Hit counts and cumulative time for each tier of parse_model_json.
+    """
+    TIERS = ("direct", "extracted", "repaired", "failed")
+
+    def __init__(self):
+        self.counts = {tier: 0 for tier in self.TIERS}
+        self.seconds = {tier: 0.0 for tier in self.TIERS}
+
+    def record(self, tier: str, elapsed: float):
+        JSON_PARSES.labels(tier).inc()
+        self.counts[tier] += 1
+        self.seconds[tier] += elapsed
+
+    def stats(self) -> dict:
+        total = sum(self.counts.values())
+        return {
+            tier: {
+                "count": self.counts[tier],
+                "hit_rate": round(self.counts[tier] / total, 4) if total else 0.0,
+                "avg_ms": round(self.seconds[tier] / self.counts[tier] * 1000, 3) if self.counts[tier] else 0.0,
+            }
+            for tier in self.TIERS
+        }
+
+
+json_parse_stats = JSONParseStats()
+
+def _loads_object(text: str) -> dict:
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise json.JSONDecodeError("Expected a JSON object", text, 0)
+    return data
+
+def parse_model_json(text: str) -> dict:
+    """
+    Parses a model response into a dict using the cheapest tier that works:
+    1. direct json.loads of the raw text (the normal case with a JSON mime type),
+    2. slice from the first '{' to the last '}' to drop fences and preambles,
+    3. json_repair on the sliced text, for truncated or malformed output.
+    Raises json.JSONDecodeError when no tier yields a JSON object.
+    """
+    started = time.perf_counter()
+    try:
+        data = _loads_object(text)
+        json_parse_stats.record("direct", time.perf_counter() - started)
+        return data
+    except json.JSONDecodeError:
+        pass
+
+    start = text.find("{")
+    end = text.rfind("}")
+    candidate = text[start:] if start != -1 else text
+    if start != -1 and end > start:
+        try:
+            data = _loads_object(text[start:end + 1])
+            json_parse_stats.record("extracted", time.perf_counter() - started)
+            return data
+        except json.JSONDecodeError:
+            pass
+
+    try:
+        # Repair from the first brace onwards: a truncated document has no final '}'
+        data = _loads_object(repair_json(re.sub(r"```(?:json)?", "", candidate)))
+        json_parse_stats.record("repaired", time.perf_counter() - started)
+        return data
+    except Exception as e:
+        json_parse_stats.record("failed", time.perf_counter() - started)
+        raise json.JSONDecodeError("Unparseable model output", text, 0) from e
+
+def encode_cursor(created_at: datetime, object_id: ObjectId) -> str:
+    """
+    Encodes a (created_at, _id) keyset position as an opaque URL-safe token.
+    """
+    raw = f"{created_at.isoformat()}|{object_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str):
+    """
+    Decodes a token from encode_cursor. Raises ValueError for malformed tokens.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created_at, object_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), ObjectId(object_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag from the parts identifying one representation, e.g. (id, version).
+    """
+    raw = "-".join(str(part) for part in parts if part not in (None, ""))
+    if len(raw) > 64:
+        raw = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+    return f'"{raw}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    If-None-Match check using the weak comparison RFC 9110 prescribes for GET.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
 def calculate_overall_score(scores: dict) -> float:
     """
     Calculates the average score from a dictionary of scores.
@@ -39,8 +156,79 @@ def validate_scores(scores: dict):
     for key, value in scores.items():
         if not isinstance(value, (int, float)):
              scores[key] = 0
+             continue
         if value < 0:
             scores[key] = 0
         if value > 10:
              scores[key] = 10
     return scores
+
+class IncrementalJSONObjectParser:
+    """
+    Incrementally scans a growing JSON object and returns each top-level member
+    as soon as its value closes, without waiting for the rest of the document.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+        self.done = False
+
+    def feed(self, chunk: str) -> list:
+        """
+        Appends a chunk of model output and returns the (key, value) pairs completed by it.
+        """
+        self.buffer += chunk
+        completed = []
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer) and not self.done:
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif self._depth == 0:
+                # Skip any preamble or markdown fence before the root object
+                if char == "{":
+                    self._depth = 1
+                    self._member_start = i + 1
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._close_member(buffer[self._member_start:i], completed)
+                    self.done = True
+            elif char == "," and self._depth == 1:
+                self._close_member(buffer[self._member_start:i], completed)
+                self._member_start = i + 1
+            i += 1
+        self._pos = i
+        return completed
+
+    def _close_member(self, member: str, completed: list):
+        if not member.strip():
+            return
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            try:
+                parsed = json.loads(repair_json("{" + member + "}"))
+            except Exception:
+                logger.warning(f"Could not parse streamed member: {member[:80]}")
+                return
+        if not isinstance(parsed, dict):
+            return
+        for key, value in parsed.items():
+            self.fields[key] = value
+            completed.append((key, value))
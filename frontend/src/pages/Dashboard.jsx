@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
-import { getMyAnalyses } from '../services/api';
+import { getMyAnalyses, getMyProgress, getAnalysis } from '../services/api';
 import { useAuth } from '../context/AuthContext';
 import { 
     BookOpen, TrendingUp, Award, Calendar, ChevronRight, 
@@ -11,9 +11,12 @@ import ResultsDashboard from '../components/ResultsDashboard';
 
 const Dashboard = () => {
     const [analyses, setAnalyses] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [searchTerm, setSearchTerm] = useState('');
     const [selectedAnalysis, setSelectedAnalysis] = useState(null);
+    const [progress, setProgress] = useState(null);
     const { user } = useAuth();
 
     useEffect(() => {
@@ -25,28 +28,58 @@ const Dashboard = () => {
         return () => { document.body.style.overflow = 'unset'; };
     }, [selectedAnalysis]);
 
+    // Search runs on the server so it covers the whole history, not just loaded pages
     useEffect(() => {
+        let cancelled = false;
         const fetchAnalyses = async () => {
             try {
-                const data = await getMyAnalyses();
-                setAnalyses(data);
+                const data = await getMyAnalyses(null, 20, searchTerm.trim());
+                if (cancelled) return;
+                setAnalyses(data.items);
+                setNextCursor(data.next_cursor);
             } catch (err) {
                 console.error("Failed to fetch analyses", err);
             } finally {
-                setLoading(false);
+                if (!cancelled) setLoading(false);
             }
         };
-        fetchAnalyses();
+        const timer = setTimeout(fetchAnalyses, searchTerm ? 300 : 0);
+        return () => { cancelled = true; clearTimeout(timer); };
+    }, [searchTerm]);
+
+    useEffect(() => {
+        getMyProgress()
+            .then(setProgress)
+            .catch(err => console.error("Failed to fetch progress", err));
     }, []);
 
-    const filteredAnalyses = analyses.filter(a => 
-        a.original_pitch.toLowerCase().includes(searchTerm.toLowerCase())
-    );
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const data = await getMyAnalyses(nextCursor, 20, searchTerm.trim());
+            setAnalyses(prev => [...prev, ...data.items]);
+            setNextCursor(data.next_cursor);
+        } catch (err) {
+            console.error("Failed to fetch more analyses", err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
 
+    // History rows are summaries; the full report is fetched when a scroll is opened
+    const openAnalysis = async (summary) => {
+        try {
+            setSelectedAnalysis(await getAnalysis(summary.id));
+        } catch (err) {
+            console.error("Failed to fetch analysis", err);
+        }
+    };
+
+    // Totals come from the progress rollup, which covers every analysis rather than the loaded pages
     const stats = [
-        { label: 'Total Analyzed', value: analyses.length, icon: BookOpen, color: 'text-blue-400' },
-        { label: 'Avg Scrutiny', value: analyses.length ? (analyses.reduce((acc, curr) => acc + curr.analysis.overall_score, 0) / analyses.length).toFixed(1) : 0, icon: TrendingUp, color: 'text-accent' },
-        { label: 'Best Score', value: analyses.length ? Math.max(...analyses.map(a => a.analysis.overall_score)) : 0, icon: Award, color: 'text-green-400' },
+        { label: 'Total Analyzed', value: progress?.analyses ?? 0, icon: BookOpen, color: 'text-blue-400' },
+        { label: 'Avg Scrutiny', value: (progress?.average?.overall_score ?? 0).toFixed(1), icon: TrendingUp, color: 'text-accent' },
+        { label: 'Best Score', value: progress?.best?.overall_score ?? 0, icon: Award, color: 'text-green-400' },
     ];
 
     return (
@@ -90,6 +123,24 @@ const Dashboard = () => {
                     ))}
                 </div>
 
+                {/* Weekly Progress */}
+                {progress?.weekly?.length > 0 && (
+                    <div className="glass-card p-6 md:p-8 rounded-2xl border border-accent/10 bg-white/5">
+                        <p className="text-parchment/40 text-[10px] md:text-sm font-bold uppercase tracking-widest mb-4">Weekly Progress</p>
+                        <div className="flex items-end gap-2 h-24">
+                            {progress.weekly.slice(-12).map(week => (
+                                <div key={week.period} className="flex-1 flex flex-col items-center justify-end h-full gap-1" title={`${week.period}: ${week.count} analyzed`}>
+                                    <div
+                                        className="w-full bg-accent/60 rounded-t"
+                                        style={{ height: `${(week.overall_score ?? 0) * 10}%` }}
+                                    />
+                                    <span className="text-parchment/40 text-[9px] md:text-[10px]">{week.period.split('-')[1]}</span>
+                                </div>
+                            ))}
+                        </div>
+                    </div>
+                )}
+
                 {/* Main Content Area */}
                 <div className="space-y-6">
                     <div className="flex flex-col md:flex-row md:items-center justify-between gap-4">
@@ -112,9 +163,9 @@ const Dashboard = () => {
                                 <div key={n} className="h-48 rounded-2xl bg-white/5 animate-pulse border border-accent/5"></div>
                             ))}
                         </div>
-                    ) : filteredAnalyses.length > 0 ? (
+                    ) : analyses.length > 0 ? (
                         <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
-                            {filteredAnalyses.map((analysis, idx) => (
+                            {analyses.map((analysis, idx) => (
                                 <motion.div 
                                     key={analysis.id}
                                     initial={{ opacity: 0, scale: 0.95 }}
@@ -128,9 +179,9 @@ const Dashboard = () => {
                                                 <Calendar className="w-3 h-3" />
                                                 {new Date(analysis.created_at).toLocaleDateString()}
                                             </div>
-                                            <div className="text-xl md:text-2xl font-heading text-accent">{analysis.analysis.overall_score}</div>
+                                            <div className="text-xl md:text-2xl font-heading text-accent">{analysis.overall_score}</div>
                                         </div>
-                                        <p className="text-parchment/90 font-medium line-clamp-2 italic mb-3 md:mb-4 text-sm md:text-base">"{analysis.original_pitch}"</p>
+                                        <p className="text-parchment/90 font-medium line-clamp-2 italic mb-3 md:mb-4 text-sm md:text-base">"{analysis.pitch_preview}"</p>
                                     </div>
                                     <div className="flex items-center justify-between pt-4 border-t border-accent/5">
                                         <div className="flex -space-x-2">
@@ -138,7 +189,7 @@ const Dashboard = () => {
                                             <div className="w-5 h-5 md:w-6 md:h-6 rounded-full bg-accent/20 border border-accent/20"></div>
                                         </div>
                                         <button 
-                                            onClick={() => setSelectedAnalysis(analysis)}
+                                            onClick={() => openAnalysis(analysis)}
                                             className="text-accent group-hover:text-accent-light flex items-center gap-1 font-bold text-xs md:text-sm transition-colors"
                                         >
                                             View Scroll <ChevronRight className="w-3 h-3 md:w-4 md:h-4" />
@@ -155,6 +206,18 @@ const Dashboard = () => {
                             <Link to="/" className="text-accent underline underline-offset-4 font-bold">Initiate first analysis</Link>
                         </div>
                     )}
+
+                    {!loading && nextCursor && (
+                        <div className="flex justify-center">
+                            <button
+                                onClick={loadMore}
+                                disabled={loadingMore}
+                                className="text-accent hover:text-accent-light font-bold text-sm transition-colors disabled:opacity-40"
+                            >
+                                {loadingMore ? 'Unrolling...' : 'Load older manuscripts'}
+                            </button>
+                        </div>
+                    )}
                 </div>
             </div>
 
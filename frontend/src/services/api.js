@@ -47,16 +47,68 @@ export const getMe = async () => {
 };
 
 // Pitch Endpoints
-export const analyzePitch = async (pitchText, targetAudience = "General Investor") => {
+// sections: optional subset, e.g. ['scores', 'summaries']; the rest is filled on getAnalysis
+export const analyzePitch = async (pitchText, targetAudience = "General Investor", sections = null) => {
+    const params = sections ? { sections: sections.join(',') } : {};
     const response = await api.post('/analyze', { 
         pitch_text: pitchText,
         target_audience: targetAudience
-    });
+    }, { params });
     return response.data;
 };
 
-export const getMyAnalyses = async () => {
-    const response = await api.get('/my-analyses');
+// Streams the analysis over SSE, calling onField(field, value) as each section arrives.
+// Resolves with the persisted analysis once the `complete` event is received.
+export const analyzePitchStream = async (pitchText, targetAudience = "General Investor", onField = () => {}) => {
+    const token = localStorage.getItem('vakyaToken');
+    const response = await fetch(`${API_URL}/analyze/stream`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            ...(token ? { Authorization: `Bearer ${token}` } : {}),
+        },
+        body: JSON.stringify({ pitch_text: pitchText, target_audience: targetAudience }),
+    });
+    if (!response.ok) {
+        throw new Error(`Streaming analysis failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+            const event = raw.match(/^event: (.*)$/m)?.[1];
+            const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || 'null');
+            if (event === 'field') onField(data.field, data.value);
+            if (event === 'complete') return data;
+            if (event === 'error') throw new Error(data.detail);
+        }
+    }
+    throw new Error('Stream ended before the analysis completed');
+};
+
+export const getMyAnalyses = async (cursor = null, limit = 20, search = '') => {
+    const params = { limit };
+    if (cursor) params.cursor = cursor;
+    if (search) params.q = search;
+    const response = await api.get('/my-analyses', { params });
+    return response.data; // { items, next_cursor }
+};
+
+export const getMyProgress = async () => {
+    const response = await api.get('/user/me/progress');
+    return response.data; // { average, best, latest, daily, weekly, ... }
+};
+
+export const getAnalysis = async (id, sections = null) => {
+    const params = sections ? { sections: sections.join(',') } : {};
+    const response = await api.get(`/analysis/${id}`, { params });
     return response.data;
 };
 